@@ -2,10 +2,9 @@ from fastapi import APIRouter, Depends
 from pydantic import BaseModel
 from typing import Dict, Any, List
 from datetime import datetime
-import httpx
 import time
-import asyncio
 
+from app.services.health_service import HealthProber
 from app.services.model_service import ModelService
 from app.core.config import settings
 from app.core.dependencies import get_current_user, get_admin_user
@@ -37,15 +36,13 @@ async def health_check():
 async def detailed_health_check():
     """
     Detailed health check with memory usage, uptime, and service dependencies.
+    Dependencies come from the background prober's last snapshot.
     Requires authentication.
     """
     start_time = time.time()
     
-    # Check service dependencies
-    service_statuses = await check_service_dependencies()
-    
-    # Check OpenAI API
-    openai_status = await check_openai_api()
+    # Service dependencies and the OpenAI API, as last probed
+    snapshot = HealthProber.get_snapshot()
     
     # Get system info
     import psutil
@@ -66,8 +63,10 @@ async def detailed_health_check():
             "vms": memory_info.vms / (1024 * 1024),  # MB
         },
         "dependencies": {
-            "services": service_statuses,
-            "openai": openai_status
+            "services": snapshot["services"],
+            "openai": snapshot["openai"],
+            "checked_at": snapshot["checked_at"],
+            "stale": snapshot["stale"]
         },
         "response_time": time.time() - start_time
     }
@@ -90,75 +89,6 @@ async def health_metrics():
         }
     }
 
-async def check_service_dependencies() -> Dict[str, Dict[str, Any]]:
-    """
-    Check connectivity with dependent services
-    """
-    services = {
-        "auth-service": settings.AUTH_SERVICE_URL,
-        "journal-service": settings.JOURNAL_SERVICE_URL,
-        "recommender-service": settings.RECOMMENDER_SERVICE_URL,
-        "lyfbot-service": settings.LYFBOT_SERVICE_URL,
-        "notification-service": settings.NOTIFICATION_SERVICE_URL
-    }
-    
-    results = {}
-    
-    async def check_service(name: str, url: str):
-        try:
-            start_time = time.time()
-            health_url = f"{url}/health"
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.get(health_url, timeout=5.0)
-                latency = time.time() - start_time
-                
-                results[name] = {
-                    "status": "ok" if response.status_code == 200 else "error",
-                    "latency": latency,
-                    "status_code": response.status_code
-                }
-        except Exception as e:
-            results[name] = {
-                "status": "error",
-                "error": str(e),
-                "latency": time.time() - start_time
-            }
-    
-    # Check services concurrently
-    await asyncio.gather(*[check_service(name, url) for name, url in services.items()])
-    return results
-
-async def check_openai_api() -> Dict[str, Any]:
-    """
-    Check OpenAI API connectivity
-    """
-    if not settings.OPENAI_API_KEY:
-        return {"status": "not_configured"}
-    
-    try:
-        # Import here to avoid importing OpenAI on service startup
-        import openai
-        
-        start_time = time.time()
-        openai.api_key = settings.OPENAI_API_KEY
-        
-        # Just check models endpoint which is lightweight
-        models = openai.Model.list()
-        latency = time.time() - start_time
-        
-        return {
-            "status": "ok",
-            "latency": latency,
-            "model_count": len(models.data) if hasattr(models, 'data') else 0
-        }
-    except Exception as e:
-        return {
-            "status": "error",
-            "error": str(e),
-            "latency": time.time() - start_time if 'start_time' in locals() else None
-        }
-
 @router.get("", response_model=HealthStatus)
 async def get_health_status():
     """
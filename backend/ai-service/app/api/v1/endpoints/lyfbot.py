@@ -3,8 +3,16 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
-from app.core.dependencies import get_current_user, get_db
-from app.schemas.lyfbot import ChatMessage, ChatResponse
+from app.core.dependencies import get_current_user, get_db, get_service_caller
+from app.schemas.lyfbot import (
+    ChatMessage,
+    ChatResponse,
+    MessageAnalysisRequest,
+    BatchMessageAnalysisRequest,
+    BatchMessageAnalysisResponse,
+    CrisisDetectionRequest,
+    CrisisDetectionResult
+)
 from app.services.model_service import ModelService, ModelFeature
 from app.services.training_service import ModelTrainingService
 from app.utils.compliance import check_consent, log_data_access
@@ -49,7 +57,8 @@ async def chat_with_lyfbot(
             user_id=current_user.id,
             message=message.content,
             chat_history=message.history,
-            context=message.context
+            context=message.context,
+            context_prompt=message.context_prompt
         )
         
         # Collect training data asynchronously if content is approved for training
@@ -80,6 +89,83 @@ async def chat_with_lyfbot(
             detail=f"Failed to generate response: {str(e)}"
         )
 
+@router.post("/analyze", response_model=Dict[str, Any])
+async def analyze_message(
+    request: MessageAnalysisRequest,
+    current_user = Depends(get_current_user)
+):
+    """
+    Analyze a single LyfBot message for sentiment, emotion and topics.
+    """
+    response = await analyze_messages_batch(
+        BatchMessageAnalysisRequest(messages=[request]),
+        current_user=current_user
+    )
+    result = response.results[0]
+    if result.error:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Message analysis failed"
+        )
+    analysis = result.analysis
+    if analysis is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User has not provided consent for AI chat processing"
+        )
+    return analysis
+
+@router.post("/analyze/batch", response_model=BatchMessageAnalysisResponse)
+async def analyze_messages_batch(
+    request: BatchMessageAnalysisRequest,
+    current_user = Depends(get_current_user)
+):
+    """
+    Analyze many LyfBot messages, possibly from different users, in as few
+    model calls as possible. Messages from users without consent for AI chat
+    processing are returned without an analysis; messages the model failed
+    to analyze are returned with an error, to be retried.
+    """
+    try:
+        consented = [
+            message for message in request.messages
+            if check_consent(message.user_id, "ai_chat_processing")
+        ]
+        
+        for user_id in {message.user_id for message in consented}:
+            log_data_access(
+                user_id=user_id,
+                data_type="chat_message",
+                access_reason="lyfbot_message_analysis",
+                data_categories=["user_input"]
+            )
+        
+        analyses, metrics = await model_service.analyze_messages(
+            [message.dict() for message in consented]
+        )
+        consented_ids = {message.message_id for message in consented}
+        
+        return BatchMessageAnalysisResponse(
+            results=[
+                {
+                    "message_id": message.message_id,
+                    "analysis": analyses.get(message.message_id),
+                    "error": (
+                        "analysis failed"
+                        if message.message_id in consented_ids and message.message_id not in analyses
+                        else None
+                    )
+                }
+                for message in request.messages
+            ],
+            metrics=metrics
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to analyze messages: {str(e)}"
+        )
+
 @router.post("/reset-conversation")
 async def reset_lyfbot_conversation(
     current_user = Depends(get_current_user)
@@ -139,4 +225,30 @@ async def detect_crisis(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to perform crisis detection: {str(e)}"
-        ) 
\ No newline at end of file
+        )
+
+@router.post("/detect-crisis", response_model=CrisisDetectionResult)
+async def detect_crisis_for_service(
+    request: CrisisDetectionRequest,
+    caller = Depends(get_service_caller)
+):
+    """
+    Crisis detection for the LyfBot service, for messages its local screen
+    couldn't decide. Answers within CRISIS_DETECTION_TIMEOUT seconds or
+    fails with 503, never with a default "no crisis".
+    """
+    try:
+        is_crisis, crisis_type = await model_service.detect_crisis(request.content)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Crisis detection unavailable: {type(e).__name__}"
+        )
+    
+    log_data_access(
+        user_id=request.user_id,
+        data_type="chat_message",
+        access_reason="lyfbot_crisis_detection",
+        data_categories=["user_input"]
+    )
+    return CrisisDetectionResult(is_crisis=is_crisis, crisis_type=crisis_type)
@@ -72,10 +72,38 @@ class Settings(BaseSettings):
     TRAINING_EPOCHS: int = 10
     EVALUATION_INTERVAL: int = 1000
     
+    # Messages analyzed per model call by the batch analysis endpoint
+    MESSAGE_ANALYSIS_BATCH_SIZE: int = 20
+    
+    # Service-to-service crisis detection: one small model call, abandoned
+    # after CRISIS_DETECTION_TIMEOUT seconds so callers get an answer (or an
+    # error) before their own deadline
+    CRISIS_DETECTION_MODEL: str = "gpt-3.5-turbo"
+    CRISIS_DETECTION_TIMEOUT: float = 2.0
+    
     # Service Communication - Core Services
     AUTH_SERVICE_URL: str = "http://auth-service:3001"
     NOTIFICATION_SERVICE_URL: str = "http://notification-service:3005"
     
+    # Notification outbox: notifications are written to a local SQLite file and sent in
+    # batches (POST NOTIFICATION_BATCH_PATH, or concurrent single POSTs if the service
+    # has no bulk endpoint). Identical notifications within the dedupe window are dropped
+    NOTIFICATION_OUTBOX_PATH: str = "/var/lib/ai-service/notification-outbox.db"
+    NOTIFICATION_BATCH_PATH: str = "/api/notification/batch"
+    NOTIFICATION_BATCH_SIZE: int = 500
+    NOTIFICATION_FLUSH_INTERVAL: float = 1.0
+    NOTIFICATION_RATE_LIMIT: float = 20.0
+    NOTIFICATION_CONCURRENCY: int = 10
+    NOTIFICATION_MAX_ATTEMPTS: int = 8
+    NOTIFICATION_LEASE: float = 60.0
+    NOTIFICATION_DEDUPE_WINDOW: int = 3600
+    
+    # Dependency health (services and the OpenAI API) is probed in the background;
+    # health endpoints serve the last snapshot, marked stale past HEALTH_SNAPSHOT_MAX_AGE
+    HEALTH_PROBE_INTERVAL: float = 15.0
+    HEALTH_PROBE_TIMEOUT: float = 5.0
+    HEALTH_SNAPSHOT_MAX_AGE: float = 60.0
+    
     # Service Communication - AI Microservices
     JOURNAL_SERVICE_URL: str = "http://journal-service:8001"
     RECOMMENDER_SERVICE_URL: str = "http://recommender-service:8002"
@@ -114,6 +142,18 @@ class Settings(BaseSettings):
     MEMORY_RETENTION_DAYS: int = 30
     MAX_MEMORY_ITEMS: int = 100
     
+    # Per-user chat history in Redis: capped on every write, and swept
+    # incrementally for idle, unexpiring or oversized histories
+    CHAT_HISTORY_TTL: int = 86400
+    CHAT_HISTORY_MAX_BYTES: int = 65536
+    CHAT_HISTORY_IDLE_TIMEOUT: int = 21600
+    CHAT_HISTORY_SWEEP_INTERVAL: int = 3600
+    CHAT_HISTORY_SWEEP_BATCH: int = 500
+    CHAT_HISTORY_SWEEP_RATE: int = 2000
+    
+    # Rendered chat context kept for reuse across turns
+    CONTEXT_PROMPT_CACHE_SIZE: int = 10000
+    
     # Personalization
     DEFAULT_LYFBOT_NAME: str = "LyfeBot"
     DEFAULT_LYFBOT_TONE: str = "supportive"
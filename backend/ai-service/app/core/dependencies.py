@@ -15,6 +15,9 @@ class TokenData(BaseModel):
     email: Optional[str] = None
     roles: Optional[list] = None
 
+class ServiceData(BaseModel):
+    service: str
+
 class UserData(BaseModel):
     id: str
     email: str
@@ -62,6 +65,41 @@ async def get_token_header(token: str = Depends(oauth2_scheme)) -> TokenData:
     except JWTError:
         raise credentials_exception
 
+async def get_service_caller(token: str = Depends(oauth2_scheme)) -> ServiceData:
+    """
+    Validate a service-to-service token.
+    
+    Args:
+        token: The JWT token from the Authorization header
+        
+    Returns:
+        ServiceData naming the calling service
+        
+    Raises:
+        HTTPException: If the token is invalid, expired or not a service token
+    """
+    try:
+        payload = jwt.decode(
+            token, 
+            settings.SECRET_KEY, 
+            algorithms=[settings.ALGORITHM]
+        )
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    service = payload.get("service")
+    if not service or payload.get("role") != "service":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Service token required"
+        )
+        
+    return ServiceData(service=service)
+
 async def get_current_user(
     token_data: TokenData = Depends(get_token_header),
     db: Session = Depends(get_db)
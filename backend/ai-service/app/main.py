@@ -6,6 +6,9 @@ from prometheus_client import make_asgi_app
 
 from app.core.config import settings
 from app.api.v1.api import api_router
+from app.services.chat_history import ChatHistorySweeper
+from app.services.health_service import HealthProber
+from app.services.notification_service import notification_outbox
 from app.core.dependencies import get_token_header
 
 # Create FastAPI app
@@ -41,6 +44,19 @@ app.include_router(
     dependencies=[Depends(get_token_header)],
 )
 
+@app.on_event("startup")
+async def start_background_services():
+    # Sends notifications an earlier process left in the outbox
+    notification_outbox.start()
+    HealthProber.start()
+    ChatHistorySweeper.start()
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    await notification_outbox.stop()
+    await HealthProber.stop()
+    await ChatHistorySweeper.stop()
+
 # Health check endpoint
 @app.get("/health", tags=["health"])
 async def health_check():
@@ -11,9 +11,36 @@ class ChatMessage(BaseModel):
     content: str = Field(..., description="The message content from the user")
     history: Optional[List[Dict[str, str]]] = None
     context: Optional[Dict[str, Any]] = None
+    # Context already rendered by the caller; used instead of rendering context
+    context_prompt: Optional[str] = None
 
 class ChatResponse(BaseModel):
     message: str = Field(..., description="The response message from LyfeBot")
     success: bool = Field(..., description="Whether the request was successful")
     metrics: Optional[Dict[str, Any]] = None
-    suggestions: Optional[List[str]] = Field(default=[], description="Suggested follow-up messages")
\ No newline at end of file
+    suggestions: Optional[List[str]] = Field(default=[], description="Suggested follow-up messages")
+
+class MessageAnalysisRequest(BaseModel):
+    message_id: int = Field(..., description="ID of the message in the LyfBot service")
+    content: str = Field(..., description="The message content")
+    user_id: str = Field(..., description="ID of the user who sent the message")
+
+class BatchMessageAnalysisRequest(BaseModel):
+    messages: List[MessageAnalysisRequest] = Field(..., max_length=500, description="Messages to analyze")
+
+class MessageAnalysisResult(BaseModel):
+    message_id: int
+    analysis: Optional[Dict[str, Any]] = Field(None, description="The analysis (null when the user hasn't consented)")
+    error: Optional[str] = Field(None, description="Set when the message couldn't be analyzed; retry it")
+
+class BatchMessageAnalysisResponse(BaseModel):
+    results: List[MessageAnalysisResult]
+    metrics: Optional[Dict[str, Any]] = None
+
+class CrisisDetectionRequest(BaseModel):
+    content: str = Field(..., description="The message content")
+    user_id: str = Field(..., description="ID of the user who sent the message")
+
+class CrisisDetectionResult(BaseModel):
+    is_crisis: bool
+    crisis_type: Optional[str] = Field(None, description="suicide or self_harm, when is_crisis")
@@ -0,0 +1,236 @@
+import asyncio
+import json
+import logging
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import redis.asyncio as redis
+from prometheus_client import Counter, Gauge
+from redis.exceptions import WatchError
+
+from app.core.config import settings
+from app.utils.encryption import decrypt_data, encrypt_data
+
+logger = logging.getLogger(__name__)
+
+# Per-user chat histories, as written by ModelService (encrypted) and OpenAIService (plain JSON)
+HISTORY_KEY_PREFIX = "chat:history:"
+
+REDIS_KEYS = Gauge(
+    "ai_redis_keys",
+    "Redis keys by key class, as of the last completed sweep",
+    ["key_class"]
+)
+REDIS_MEMORY = Gauge(
+    "ai_redis_memory_bytes",
+    "Redis memory used by key class, as of the last completed sweep",
+    ["key_class"]
+)
+CHAT_HISTORY_SWEPT = Counter(
+    "ai_chat_history_swept_total",
+    "Chat histories changed by the sweeper, by reason",
+    ["reason"]
+)
+
+def history_ttl() -> int:
+    """How long a chat history lives after its last turn"""
+    return min(settings.CHAT_HISTORY_TTL, settings.MEMORY_RETENTION_DAYS * 86400)
+
+def cap_history(history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    The most recent part of a chat history that fits the caps
+    
+    At most MAX_MEMORY_ITEMS messages and CHAT_HISTORY_MAX_BYTES of JSON,
+    so the stored blob (and the work of decrypting it every turn) stays
+    bounded however long a user chats.
+    """
+    history = history[-settings.MAX_MEMORY_ITEMS:] if settings.MAX_MEMORY_ITEMS > 0 else []
+    
+    size = 2
+    keep = 0
+    for item in reversed(history):
+        size += len(json.dumps(item)) + 1
+        if size > settings.CHAT_HISTORY_MAX_BYTES:
+            break
+        keep += 1
+    return history[len(history) - keep:]
+
+def key_class(key: str) -> str:
+    """The key with its identifying last segment dropped, e.g. chat:history"""
+    parts = key.split(":")
+    return ":".join(parts[:min(2, len(parts) - 1)]) or "other"
+
+class ChatHistorySweeper:
+    """
+    Incremental sweep of the AI Service's Redis keys
+    
+    Walks the keyspace with SCAN in batches of CHAT_HISTORY_SWEEP_BATCH keys,
+    at most CHAT_HISTORY_SWEEP_RATE keys per second, so it never blocks
+    Redis or competes with chat traffic. Along the way it:
+    
+    - deletes chat histories idle for CHAT_HISTORY_IDLE_TIMEOUT seconds
+    - gives histories without an expiry one
+    - trims histories written before the caps to fit them
+    
+    and records key counts and memory usage per key class for the
+    ai_redis_* gauges.
+    """
+    
+    _task: Optional[asyncio.Task] = None
+    _client: Optional[redis.Redis] = None
+    # Key classes reported by earlier sweeps
+    _classes: Set[str] = set()
+    
+    @classmethod
+    def get_client(cls) -> redis.Redis:
+        if cls._client is None:
+            cls._client = redis.from_url(settings.REDIS_URL)
+        return cls._client
+    
+    @classmethod
+    def start(cls) -> None:
+        if cls._task is None or cls._task.done():
+            cls._task = asyncio.create_task(cls._run())
+    
+    @classmethod
+    async def stop(cls) -> None:
+        if cls._task:
+            cls._task.cancel()
+            try:
+                await cls._task
+            except asyncio.CancelledError:
+                pass
+            cls._task = None
+        if cls._client:
+            await cls._client.close()
+            cls._client = None
+    
+    @classmethod
+    async def _run(cls) -> None:
+        while True:
+            try:
+                await cls.sweep()
+            except Exception as e:
+                logger.error(f"Redis sweep failed: {str(e)}")
+            await asyncio.sleep(settings.CHAT_HISTORY_SWEEP_INTERVAL)
+    
+    @classmethod
+    async def sweep(cls) -> Dict[str, Tuple[int, int]]:
+        """
+        Sweep the whole keyspace once
+        
+        Returns:
+            Key count and memory usage by key class
+        """
+        client = cls.get_client()
+        totals: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+        cursor = 0
+        
+        while True:
+            started = time.monotonic()
+            cursor, keys = await client.scan(cursor, count=settings.CHAT_HISTORY_SWEEP_BATCH)
+            
+            if keys:
+                pipe = client.pipeline(transaction=False)
+                for key in keys:
+                    pipe.memory_usage(key)
+                    pipe.object("idletime", key)
+                    pipe.ttl(key)
+                results = await pipe.execute(raise_on_error=False)
+                
+                for index, key in enumerate(keys):
+                    usage, idle, ttl = (
+                        None if isinstance(result, Exception) else result
+                        for result in results[index * 3:index * 3 + 3]
+                    )
+                    name = key.decode("utf-8", "replace")
+                    if usage is None:
+                        # Expired or deleted since the scan
+                        continue
+                    
+                    if name.startswith(HISTORY_KEY_PREFIX):
+                        usage = await cls._sweep_history(client, key, usage, idle, ttl)
+                    
+                    totals[key_class(name)][0] += usage > 0
+                    totals[key_class(name)][1] += usage
+            
+            if cursor == 0:
+                break
+            
+            # Keep to CHAT_HISTORY_SWEEP_RATE keys per second
+            await asyncio.sleep(max(len(keys) / settings.CHAT_HISTORY_SWEEP_RATE - (time.monotonic() - started), 0))
+        
+        # Classes that have disappeared report zero rather than their last value
+        for name in cls._classes - set(totals):
+            REDIS_KEYS.labels(key_class=name).set(0)
+            REDIS_MEMORY.labels(key_class=name).set(0)
+        cls._classes |= set(totals)
+        for name, (count, usage) in totals.items():
+            REDIS_KEYS.labels(key_class=name).set(count)
+            REDIS_MEMORY.labels(key_class=name).set(usage)
+        
+        return {name: (count, usage) for name, (count, usage) in totals.items()}
+    
+    @classmethod
+    async def _sweep_history(
+        cls,
+        client: redis.Redis,
+        key: bytes,
+        usage: int,
+        idle: Optional[int],
+        ttl: Optional[int]
+    ) -> int:
+        """Apply the idle timeout, expiry and caps to one history; returns its memory usage afterwards"""
+        # OBJECT IDLETIME isn't available under an LFU eviction policy
+        if idle is not None and settings.CHAT_HISTORY_IDLE_TIMEOUT and idle > settings.CHAT_HISTORY_IDLE_TIMEOUT:
+            await client.delete(key)
+            CHAT_HISTORY_SWEPT.labels(reason="idle").inc()
+            return 0
+        
+        if ttl == -1:
+            await client.expire(key, history_ttl())
+            CHAT_HISTORY_SWEPT.labels(reason="no_expiry").inc()
+        
+        # Encryption and Redis overhead roughly double a capped history's size
+        if usage > settings.CHAT_HISTORY_MAX_BYTES * 2:
+            usage = await cls._trim(client, key, usage)
+        
+        return usage
+    
+    @staticmethod
+    async def _trim(client: redis.Redis, key: bytes, usage: int) -> int:
+        raw = await client.get(key)
+        if raw is None:
+            return 0
+        
+        text = raw.decode("utf-8")
+        encrypted = not text.startswith("[")
+        try:
+            history = json.loads(decrypt_data(text) if encrypted else text)
+        except ValueError:
+            logger.warning("Dropping a chat history that can't be read")
+            await client.delete(key)
+            CHAT_HISTORY_SWEPT.labels(reason="unreadable").inc()
+            return 0
+        
+        capped = cap_history(history)
+        if len(capped) == len(history):
+            return usage
+        
+        data = json.dumps(capped)
+        value = encrypt_data(data) if encrypted else data
+        # Only if the history wasn't replaced by a new turn meanwhile
+        async with client.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(key)
+                if await pipe.get(key) != raw:
+                    return usage
+                pipe.multi()
+                pipe.set(key, value, keepttl=True)
+                await pipe.execute()
+            except WatchError:
+                return usage
+        
+        CHAT_HISTORY_SWEPT.labels(reason="trimmed").inc()
+        return len(value)
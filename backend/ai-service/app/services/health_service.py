@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from prometheus_client import Gauge, Histogram
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROBE_LATENCY = Histogram(
+    "ai_health_probe_seconds",
+    "Latency of dependency health probes",
+    ["dependency"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0)
+)
+DEPENDENCY_UP = Gauge(
+    "ai_dependency_up",
+    "1 if the dependency's last health probe succeeded",
+    ["dependency"]
+)
+
+class HealthProber:
+    """
+    Background prober for the AI Service's dependencies
+    
+    Every HEALTH_PROBE_INTERVAL seconds the dependent services and the
+    OpenAI API are checked concurrently, each within HEALTH_PROBE_TIMEOUT.
+    Health endpoints read the last snapshot instead of probing per request.
+    """
+    
+    _snapshot: Optional[Dict[str, Any]] = None
+    _task: Optional[asyncio.Task] = None
+    _client: Optional[httpx.AsyncClient] = None
+    
+    @classmethod
+    def get_client(cls) -> httpx.AsyncClient:
+        if cls._client is None:
+            cls._client = httpx.AsyncClient(timeout=settings.HEALTH_PROBE_TIMEOUT)
+        return cls._client
+    
+    @classmethod
+    def start(cls) -> None:
+        if cls._task is None or cls._task.done():
+            cls._task = asyncio.create_task(cls._run())
+    
+    @classmethod
+    async def stop(cls) -> None:
+        if cls._task:
+            cls._task.cancel()
+            try:
+                await cls._task
+            except asyncio.CancelledError:
+                pass
+            cls._task = None
+        if cls._client:
+            await cls._client.aclose()
+            cls._client = None
+    
+    @classmethod
+    async def _run(cls) -> None:
+        while True:
+            try:
+                await cls.probe()
+            except Exception as e:
+                logger.error(f"Health probe failed: {str(e)}")
+            await asyncio.sleep(settings.HEALTH_PROBE_INTERVAL)
+    
+    @classmethod
+    def get_snapshot(cls) -> Dict[str, Any]:
+        """
+        The last probe results
+        
+        Marked stale when older than HEALTH_SNAPSHOT_MAX_AGE seconds, or when
+        no probe has finished yet.
+        """
+        snapshot = cls._snapshot
+        if snapshot is None:
+            return {"services": {}, "openai": {}, "checked_at": None, "stale": True}
+        
+        if time.time() - snapshot["checked_at"] > settings.HEALTH_SNAPSHOT_MAX_AGE:
+            return {**snapshot, "stale": True}
+        return snapshot
+    
+    @classmethod
+    async def probe(cls) -> Dict[str, Any]:
+        """Check every dependency concurrently and store the snapshot"""
+        services = {
+            "auth-service": settings.AUTH_SERVICE_URL,
+            "journal-service": settings.JOURNAL_SERVICE_URL,
+            "recommender-service": settings.RECOMMENDER_SERVICE_URL,
+            "lyfbot-service": settings.LYFBOT_SERVICE_URL,
+            "notification-service": settings.NOTIFICATION_SERVICE_URL
+        }
+        
+        results = await asyncio.gather(
+            *(cls._check_service(name, url) for name, url in services.items()),
+            cls._check_openai()
+        )
+        
+        cls._snapshot = {
+            "services": dict(zip(services, results[:-1])),
+            "openai": results[-1],
+            "checked_at": time.time(),
+            "stale": False
+        }
+        return cls._snapshot
+    
+    @classmethod
+    async def _check_service(cls, name: str, url: str) -> Dict[str, Any]:
+        start_time = time.time()
+        try:
+            response = await cls.get_client().get(f"{url}/health")
+            result = {
+                "status": "ok" if response.status_code == 200 else "error",
+                "latency": time.time() - start_time,
+                "status_code": response.status_code
+            }
+        except Exception as e:
+            result = {
+                "status": "error",
+                "error": str(e),
+                "latency": time.time() - start_time
+            }
+        
+        cls._observe(name, result)
+        return result
+    
+    @classmethod
+    async def _check_openai(cls) -> Dict[str, Any]:
+        if not settings.OPENAI_API_KEY:
+            return {"status": "not_configured"}
+        
+        start_time = time.time()
+        try:
+            # Import here to avoid importing OpenAI on service startup
+            import openai
+            
+            # The 0.x client is blocking; keep it off the event loop
+            models = await asyncio.wait_for(
+                asyncio.to_thread(openai.Model.list, api_key=settings.OPENAI_API_KEY),
+                timeout=settings.HEALTH_PROBE_TIMEOUT
+            )
+            result = {
+                "status": "ok",
+                "latency": time.time() - start_time,
+                "model_count": len(models.data) if hasattr(models, 'data') else 0
+            }
+        except Exception as e:
+            result = {
+                "status": "error",
+                "error": str(e) or type(e).__name__,
+                "latency": time.time() - start_time
+            }
+        
+        cls._observe("openai", result)
+        return result
+    
+    @staticmethod
+    def _observe(dependency: str, result: Dict[str, Any]) -> None:
+        DEPENDENCY_UP.labels(dependency=dependency).set(1 if result["status"] == "ok" else 0)
+        PROBE_LATENCY.labels(dependency=dependency).observe(result["latency"])
@@ -1,4 +1,5 @@
 from typing import Dict, Any, List, Optional, Tuple
+import asyncio
 import os
 import logging
 import json
@@ -8,6 +9,7 @@ import numpy as np
 from datetime import datetime
 from enum import Enum
 import hashlib
+from collections import OrderedDict
 import openai
 from pydantic import BaseModel
 from tenacity import retry, stop_after_attempt, wait_random_exponential
@@ -15,6 +17,7 @@ from tenacity import retry, stop_after_attempt, wait_random_exponential
 from app.core.config import settings
 from app.utils.encryption import encrypt_data, decrypt_data
 from app.utils.compliance import sanitize_phi, audit_log
+from app.services.chat_history import cap_history, history_ttl
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +28,7 @@ class ModelProvider(str, Enum):
 class ModelFeature(str, Enum):
     CHAT = "chat"
     JOURNAL_ANALYSIS = "journal_analysis"
+    MESSAGE_ANALYSIS = "message_analysis"
     MOOD_PREDICTION = "mood_prediction"
     RECOMMENDATION = "recommendation"
     PERSONALIZATION = "personalization"
@@ -37,6 +41,9 @@ class ModelVersionInfo(BaseModel):
     metrics: Dict[str, float]
 
 class ModelService:
+    # Rendered context by content digest, least recently used first
+    _context_prompts: "OrderedDict[str, str]" = OrderedDict()
+    
     def __init__(self):
         # OpenAI configuration
         openai.api_key = settings.OPENAI_API_KEY
@@ -165,7 +172,8 @@ class ModelService:
         user_id: str, 
         message: str, 
         chat_history: Optional[List[Dict[str, str]]] = None,
-        context: Optional[Dict[str, Any]] = None
+        context: Optional[Dict[str, Any]] = None,
+        context_prompt: Optional[str] = None
     ) -> Tuple[str, Dict[str, Any]]:
         """Generate response for chat feature"""
         # Sanitize incoming data to remove any PHI that shouldn't be processed
@@ -191,7 +199,8 @@ class ModelService:
                     user_id=user_id,
                     message=sanitized_message,
                     chat_history=chat_history,
-                    context=context
+                    context=context,
+                    context_prompt=context_prompt
                 )
                 metrics["model"] = self.default_model
             else:
@@ -220,7 +229,8 @@ class ModelService:
                     user_id=user_id,
                     message=sanitized_message,
                     chat_history=chat_history,
-                    context=context
+                    context=context,
+                    context_prompt=context_prompt
                 )
                 metrics["fallback"] = True
             else:
@@ -250,7 +260,8 @@ class ModelService:
         user_id: str, 
         message: str, 
         chat_history: List[Dict[str, str]],
-        context: Optional[Dict[str, Any]] = None
+        context: Optional[Dict[str, Any]] = None,
+        context_prompt: Optional[str] = None
     ) -> str:
         """Generate response using OpenAI's models"""
         # Prepare the messages for the OpenAI API
@@ -269,23 +280,10 @@ class ModelService:
             """
         }
         
-        # Add context if provided
-        if context:
-            system_content_additions = []
-            if "user_profile" in context:
-                profile = context["user_profile"]
-                system_content_additions.append(
-                    f"The user's name is {profile.get('name', 'the user')}. "
-                    f"Their therapy goals include: {', '.join(profile.get('therapy_goals', ['general well-being']))}."
-                )
-            
-            if "recent_mood" in context:
-                system_content_additions.append(
-                    f"The user's recent mood tracking shows: {context['recent_mood']}."
-                )
-                
-            if system_content_additions:
-                system_message["content"] += " " + " ".join(system_content_additions)
+        # Add context if provided; the LyfBot service sends it already rendered
+        context_prompt = context_prompt or self._render_context(context)
+        if context_prompt:
+            system_message["content"] += " " + context_prompt
         
         messages.append(system_message)
         
@@ -315,6 +313,39 @@ class ModelService:
         
         return response.choices[0].message["content"].strip()
     
+    def _render_context(self, context: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Render the profile and mood context, reusing the last rendering of the same values"""
+        if not context or not ("user_profile" in context or "recent_mood" in context):
+            return None
+        
+        key = self._hash_content({
+            "user_profile": context.get("user_profile"),
+            "recent_mood": context.get("recent_mood")
+        })
+        rendered = self._context_prompts.get(key)
+        if rendered is not None:
+            self._context_prompts.move_to_end(key)
+            return rendered
+        
+        additions = []
+        if "user_profile" in context:
+            profile = context["user_profile"]
+            additions.append(
+                f"The user's name is {profile.get('name', 'the user')}. "
+                f"Their therapy goals include: {', '.join(profile.get('therapy_goals', ['general well-being']))}."
+            )
+        
+        if "recent_mood" in context:
+            additions.append(
+                f"The user's recent mood tracking shows: {context['recent_mood']}."
+            )
+        
+        rendered = " ".join(additions)
+        self._context_prompts[key] = rendered
+        while len(self._context_prompts) > settings.CONTEXT_PROMPT_CACHE_SIZE:
+            self._context_prompts.popitem(last=False)
+        return rendered
+    
     async def _generate_custom_chat_response(
         self, 
         user_id: str, 
@@ -345,17 +376,15 @@ class ModelService:
             return []
         
         # Decrypt the stored history
-        decrypted_history = decrypt_data(history_json)
-        return json.loads(decrypted_history)
+        decrypted_history = decrypt_data(history_json.decode("utf-8"))
+        return cap_history(json.loads(decrypted_history))
     
     async def _save_chat_history(self, user_id: str, history: List[Dict[str, str]]) -> None:
         """Save chat history to Redis with encryption."""
         history_key = self._get_chat_history_key(user_id)
         # Encrypt the history before storing
-        encrypted_history = encrypt_data(json.dumps(history))
-        self.redis_client.set(history_key, encrypted_history)
-        # Set expiry to 24 hours
-        self.redis_client.expire(history_key, 60 * 60 * 24)
+        encrypted_history = encrypt_data(json.dumps(cap_history(history)))
+        self.redis_client.set(history_key, encrypted_history, ex=history_ttl())
     
     async def reset_conversation(self, user_id: str) -> None:
         """Reset the conversation history for a user."""
@@ -500,6 +529,176 @@ class ModelService:
             "suggested_coping_strategies": ["placeholder strategy"]
         }
     
+    async def analyze_messages(
+        self,
+        messages: List[Dict[str, Any]]
+    ) -> Tuple[Dict[int, Dict[str, Any]], Dict[str, Any]]:
+        """
+        Analyze chat messages for sentiment, emotion and topics
+        
+        Messages are sent to the model MESSAGE_ANALYSIS_BATCH_SIZE at a time,
+        as one list per call, instead of one call per message. The model
+        answers each message by its ID, so a skipped or reordered answer
+        can't be attributed to the wrong message.
+        
+        Args:
+            messages: Dicts with message_id, content and user_id
+            
+        Returns:
+            Analysis by message ID, and metrics. Messages whose chunk failed
+            or that the model didn't answer are left out, so the caller can
+            retry them.
+        """
+        start_time = time.time()
+        batch_size = max(settings.MESSAGE_ANALYSIS_BATCH_SIZE, 1)
+        
+        analyses: Dict[int, Dict[str, Any]] = {}
+        metrics = {"model": self.default_model, "message_count": len(messages), "model_calls": 0}
+        
+        for offset in range(0, len(messages), batch_size):
+            chunk = {
+                message["message_id"]: sanitize_phi(message["content"])
+                for message in messages[offset:offset + batch_size]
+            }
+            metrics["model_calls"] += 1
+            
+            try:
+                results = await self._analyze_messages_with_openai(chunk)
+            except Exception as e:
+                logger.error(f"Error analyzing {len(chunk)} messages: {str(e)}")
+                continue
+            
+            for message_id, content in chunk.items():
+                if message_id in results:
+                    analyses[message_id] = {
+                        "sentiment": "neutral",
+                        "emotion": "unknown",
+                        "topics": [],
+                        **results[message_id],
+                        "word_count": len(content.split())
+                    }
+        
+        metrics["failed"] = len(messages) - len(analyses)
+        execution_time = (time.time() - start_time) * 1000
+        metrics["execution_time_ms"] = execution_time
+        
+        self._log_model_usage(
+            user_id="batch",
+            feature=ModelFeature.MESSAGE_ANALYSIS,
+            provider=ModelProvider.OPENAI,
+            input_hash=self._hash_content([message["content"] for message in messages]),
+            output_hash=self._hash_content(analyses),
+            metrics=metrics,
+            execution_time=execution_time
+        )
+        
+        return analyses, metrics
+    
+    async def _analyze_messages_with_openai(self, contents: Dict[int, str]) -> Dict[int, Dict[str, Any]]:
+        """Analyze messages, keyed by ID, with one OpenAI call; returns the analyses by ID"""
+        listed = "\n".join(
+            json.dumps({"id": message_id, "content": content})
+            for message_id, content in contents.items()
+        )
+        prompt = f"""
+        Analyze each of the following chat messages sent to a mental health support assistant.
+        Do not include any medical diagnoses or clinical assessments.
+        
+        Messages, one JSON object per line:
+        {listed}
+        
+        Respond with a JSON array containing one object per message, with the message's id:
+        [
+            {{
+                "id": 123,
+                "sentiment": "positive/negative/neutral/mixed",
+                "emotion": "the dominant emotion",
+                "topics": ["topic1", "topic2"]
+            }}
+        ]
+        """
+        
+        response = openai.ChatCompletion.create(
+            model=self.default_model,
+            messages=[
+                {"role": "system", "content": "You are a mental health analysis assistant."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.2,
+            max_tokens=90 * len(contents) + 100
+        )
+        
+        response_text = response.choices[0].message["content"].strip()
+        start_idx = response_text.find('[')
+        end_idx = response_text.rfind(']')
+        if start_idx < 0 or end_idx <= start_idx:
+            raise ValueError("No JSON array in message analysis response")
+        
+        analyses = {}
+        for result in json.loads(response_text[start_idx:end_idx+1]):
+            if not isinstance(result, dict):
+                continue
+            try:
+                message_id = int(result.pop("id"))
+            except (KeyError, TypeError, ValueError):
+                continue
+            if message_id in contents:
+                analyses[message_id] = result
+        return analyses
+    
+    async def detect_crisis(self, content: str) -> Tuple[bool, Optional[str]]:
+        """
+        Classify one message as a crisis (suicide or self_harm) or not
+        
+        The model call is abandoned after CRISIS_DETECTION_TIMEOUT seconds.
+        Errors and timeouts are raised rather than answered with "no crisis",
+        so the caller's fail-safe decides instead.
+        
+        Args:
+            content: The message content
+            
+        Returns:
+            Whether the message is a crisis, and its type if it is
+        """
+        prompt = f"""
+        Decide whether the following message, sent to a mental health support assistant,
+        shows that the sender may be at risk of suicide or self-harm, including indirect,
+        euphemistic or negated statements. Figures of speech about everyday things are not a crisis.
+        
+        Message:
+        {json.dumps(sanitize_phi(content))}
+        
+        Respond with JSON only:
+        {{"is_crisis": true/false, "crisis_type": "suicide/self_harm/null"}}
+        """
+        
+        response = await asyncio.wait_for(
+            openai.ChatCompletion.acreate(
+                model=settings.CRISIS_DETECTION_MODEL,
+                messages=[
+                    {"role": "system", "content": "You are a crisis triage assistant."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0,
+                max_tokens=30,
+                request_timeout=settings.CRISIS_DETECTION_TIMEOUT
+            ),
+            timeout=settings.CRISIS_DETECTION_TIMEOUT
+        )
+        
+        response_text = response.choices[0].message["content"].strip()
+        start_idx = response_text.find('{')
+        end_idx = response_text.rfind('}')
+        if start_idx < 0 or end_idx <= start_idx:
+            raise ValueError("No JSON object in crisis detection response")
+        
+        result = json.loads(response_text[start_idx:end_idx+1])
+        is_crisis = bool(result.get("is_crisis"))
+        crisis_type = result.get("crisis_type")
+        if crisis_type not in ("suicide", "self_harm"):
+            crisis_type = "suicide" if is_crisis else None
+        return is_crisis, crisis_type if is_crisis else None
+    
     async def generate_recommendations(
         self, 
         user_id: str, 
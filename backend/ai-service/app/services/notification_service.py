@@ -1,13 +1,17 @@
-import httpx
 import logging
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from enum import Enum
 
+from mindlyf_shared.notification_outbox import NotificationOutbox
+
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# One outbox per process; its dispatcher starts with the first notification
+notification_outbox = NotificationOutbox("ai-service", settings)
+
 class AINotificationType(str, Enum):
     # Model training notifications
     MODEL_TRAINING_STARTED = "model_training_started"
@@ -80,7 +84,34 @@ class AINotificationService:
     def __init__(self):
         self.notification_service_url = settings.NOTIFICATION_SERVICE_URL
         self.timeout = 5.0
+    
+    def build_payload(
+        self,
+        notification_type: AINotificationType,
+        recipient_id: str,
+        channels: List[str],
+        variables: Dict[str, Any],
+        priority: str = "normal",
+        scheduled_for: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """Build the Notification Service request body"""
+        payload = {
+            "type": notification_type.value,
+            "recipientId": recipient_id,
+            "channels": channels,
+            "variables": {
+                **variables,
+                "timestamp": datetime.utcnow().isoformat(),
+            },
+            "priority": priority,
+            "serviceSource": "ai-service"
+        }
+        
+        if scheduled_for:
+            payload["scheduledFor"] = scheduled_for.isoformat()
         
+        return payload
+    
     async def send_notification(
         self,
         notification_type: AINotificationType,
@@ -90,41 +121,31 @@ class AINotificationService:
         priority: str = "normal",
         scheduled_for: Optional[datetime] = None
     ) -> bool:
-        """Send notification to the notification service"""
+        """
+        Queue a notification for the notification service
+        
+        Written to the local outbox and sent in a batch by its dispatcher;
+        returns False only if it couldn't be queued.
+        """
         try:
-            payload = {
-                "type": notification_type.value,
-                "recipientId": recipient_id,
-                "channels": channels,
-                "variables": {
-                    **variables,
-                    "timestamp": datetime.utcnow().isoformat(),
-                },
-                "priority": priority,
-                "serviceSource": "ai-service"
-            }
-            
-            if scheduled_for:
-                payload["scheduledFor"] = scheduled_for.isoformat()
+            payload = self.build_payload(
+                notification_type,
+                recipient_id,
+                channels,
+                variables,
+                priority=priority,
+                scheduled_for=scheduled_for
+            )
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.notification_service_url}/api/notification",
-                    json=payload,
-                    headers={
-                        "X-Service-Name": "ai-service",
-                        "Content-Type": "application/json"
-                    },
-                    timeout=self.timeout
-                )
-                
-                if response.status_code == 200:
-                    logger.info(f"AI notification sent: {notification_type.value} to user {recipient_id}")
-                    return True
-                else:
-                    logger.warning(f"Failed to send notification: HTTP {response.status_code}")
-                    return False
-                    
+            if await notification_outbox.add([payload]):
+                logger.info(f"AI notification queued: {notification_type.value} to user {recipient_id}")
+            return True
+        
+        except Exception as e:
+            logger.error(f"Failed to queue AI notification: {str(e)}")
+            # Don't raise - notifications are non-critical
+            return False
+        
         except Exception as e:
             logger.error(f"Failed to send AI notification: {str(e)}")
             # Don't raise - notifications are non-critical
@@ -5,6 +5,7 @@ from typing import List, Dict, Any, Optional
 from tenacity import retry, stop_after_attempt, wait_random_exponential
 
 from app.core.config import settings
+from app.services.chat_history import cap_history, history_ttl
 
 class OpenAIService:
     def __init__(self):
@@ -27,14 +28,12 @@ class OpenAIService:
         if not history_json:
             return []
         
-        return json.loads(history_json)
+        return cap_history(json.loads(history_json))
     
     async def _save_chat_history(self, user_id: str, history: List[Dict[str, str]]) -> None:
         """Save chat history to Redis."""
         history_key = self._get_chat_history_key(user_id)
-        self.redis_client.set(history_key, json.dumps(history))
-        # Set expiry to 24 hours
-        self.redis_client.expire(history_key, 60 * 60 * 24)
+        self.redis_client.set(history_key, json.dumps(cap_history(history)), ex=history_ttl())
     
     @retry(wait=wait_random_exponential(min=1, max=60), stop=stop_after_attempt(3))
     async def generate_chat_response(
@@ -1,18 +1,27 @@
+import hashlib
 from typing import List, Optional
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
 from sqlalchemy.orm import Session
+from mindlyf_shared.context_events import ContextEventPublisher
 
 from app.api.dependencies import get_db
+from app.core.config import settings
 from app.core.security import validate_token
 from app.models.journal import Journal
 from app.schemas.journal import JournalCreate, JournalUpdate, JournalResponse
 from app.services.journal_service import JournalService
-from app.services.ai_service import AIService
+from app.services.job_service import JobService
 
 router = APIRouter()
 journal_service = JournalService()
-ai_service = AIService()
+event_publisher = ContextEventPublisher("journal", settings)
+job_service = JobService()
+
+def analysis_job_key(journal_id: int, content: str) -> str:
+    """Idempotency key of an analysis job; edited content is analyzed again"""
+    digest = hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+    return f"journal.analyze:{journal_id}:{digest}"
 
 @router.post("", response_model=JournalResponse, status_code=status.HTTP_201_CREATED)
 async def create_journal(
@@ -31,13 +40,19 @@ async def create_journal(
         # Create journal entry
         journal_entry = await journal_service.create_journal(db, user_id, journal)
         
-        # Analyze journal content in the background
+        # Announce the new entry to services caching journal data
         background_tasks.add_task(
-            ai_service.analyze_journal,
-            journal_id=journal_entry.id,
-            content=journal_entry.content,
-            user_id=user_id,
-            db=db
+            event_publisher.publish,
+            "journal.created",
+            user_id,
+            {"journal_id": journal_entry.id}
+        )
+        
+        # Analyze journal content in the job worker
+        await job_service.enqueue(
+            "journal.analyze",
+            {"journal_id": journal_entry.id, "content": journal_entry.content, "user_id": user_id},
+            idempotency_key=analysis_job_key(journal_entry.id, journal_entry.content)
         )
         
         return journal_entry
@@ -142,14 +157,20 @@ async def update_journal(
         # Update journal entry
         updated_journal = await journal_service.update_journal(db, journal_id, journal)
         
+        # Announce the change to services caching journal data
+        background_tasks.add_task(
+            event_publisher.publish,
+            "journal.updated",
+            user_id,
+            {"journal_id": journal_id}
+        )
+        
         # Re-analyze journal content if content changed
         if journal.content and journal.content != existing_journal.content:
-            background_tasks.add_task(
-                ai_service.analyze_journal,
-                journal_id=journal_id,
-                content=journal.content,
-                user_id=user_id,
-                db=db
+            await job_service.enqueue(
+                "journal.analyze",
+                {"journal_id": journal_id, "content": journal.content, "user_id": user_id},
+                idempotency_key=analysis_job_key(journal_id, journal.content)
             )
             
         return updated_journal
@@ -164,6 +185,7 @@ async def update_journal(
 @router.delete("/{journal_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_journal(
     journal_id: int,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user = Depends(validate_token)
 ):
@@ -186,6 +208,14 @@ async def delete_journal(
         # Delete journal entry
         await journal_service.delete_journal(db, journal_id)
         
+        # Announce the deletion to services caching journal data
+        background_tasks.add_task(
+            event_publisher.publish,
+            "journal.deleted",
+            user_id,
+            {"journal_id": journal_id}
+        )
+        
         return None
     except HTTPException:
         raise
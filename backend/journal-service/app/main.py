@@ -6,6 +6,7 @@ from prometheus_client import make_asgi_app
 
 from app.core.config import settings
 from app.api.v1.api import api_router
+from app.services.notification_service import notification_outbox
 from app.core.security import validate_token
 
 # Create FastAPI app
@@ -41,6 +42,15 @@ app.include_router(
     dependencies=[Depends(validate_token)],
 )
 
+@app.on_event("startup")
+async def start_background_services():
+    # Sends notifications an earlier process left in the outbox
+    notification_outbox.start()
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    await notification_outbox.stop()
+
 # Health check endpoint
 @app.get("/health", tags=["health"])
 async def health_check():
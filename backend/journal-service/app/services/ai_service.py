@@ -3,6 +3,7 @@ import logging
 import json
 from typing import Dict, Any, Optional
 from sqlalchemy.orm import Session
+from mindlyf_shared.context_events import ContextEventPublisher
 
 from app.core.config import settings
 from app.core.security import get_service_token
@@ -15,6 +16,7 @@ class AIService:
     
     def __init__(self):
         self.analysis_service = AnalysisService()
+        self.event_publisher = ContextEventPublisher("journal", settings)
     
     async def analyze_text(
         self, 
@@ -102,6 +104,13 @@ class AIService:
                 analysis_data=analysis
             )
             
+            # Journal insights changed, let context caches refresh
+            await self.event_publisher.publish(
+                "journal.analyzed",
+                user_id,
+                {"journal_id": journal_id}
+            )
+            
             return stored_analysis
             
         except Exception as e:
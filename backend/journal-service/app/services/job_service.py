@@ -0,0 +1,70 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from mindlyf_shared.job_queue import JobQueue, create_job_queue
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.ai_service import AIService
+
+logger = logging.getLogger(__name__)
+
+ai_service = AIService()
+
+# Job type -> handler, run by the worker (app.worker)
+JOB_HANDLERS: Dict[str, Callable[..., Awaitable[Any]]] = {}
+
+def job_handler(job_type: str):
+    """Register a coroutine as the handler of a job type"""
+    def register(handler: Callable[..., Awaitable[Any]]):
+        JOB_HANDLERS[job_type] = handler
+        return handler
+    return register
+
+@job_handler("journal.analyze")
+async def analyze_journal(journal_id: int, content: str, user_id: str) -> None:
+    # Jobs get their own session; the request's is closed by the time they run
+    db = SessionLocal()
+    try:
+        await ai_service.analyze_journal(
+            journal_id=journal_id,
+            content=content,
+            user_id=user_id,
+            db=db
+        )
+    finally:
+        db.close()
+
+class JobService:
+    """Enqueues follow-up work for the worker process"""
+    
+    # Jobs run in-process because the queue was unreachable
+    _local_jobs: Set[asyncio.Task] = set()
+    
+    def __init__(self, queue: Optional[JobQueue] = None):
+        self.queue = queue or create_job_queue(settings)
+    
+    async def enqueue(
+        self,
+        job_type: str,
+        payload: Dict[str, Any],
+        idempotency_key: Optional[str] = None
+    ) -> None:
+        """
+        Enqueue a job
+        
+        If the queue is unavailable the job runs in this process instead.
+        
+        Args:
+            job_type: A type registered with job_handler
+            payload: Keyword arguments for the handler (JSON-serializable)
+            idempotency_key: Key that makes enqueueing the same job twice a no-op
+        """
+        try:
+            await self.queue.enqueue(job_type, payload, idempotency_key)
+        except Exception as e:
+            logger.error(f"Failed to enqueue {job_type}, running it in-process: {str(e)}")
+            task = asyncio.create_task(JOB_HANDLERS[job_type](**payload))
+            self._local_jobs.add(task)
+            task.add_done_callback(self._local_jobs.discard)
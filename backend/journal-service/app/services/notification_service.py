@@ -1,13 +1,17 @@
-import httpx
 import logging
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from enum import Enum
 
+from mindlyf_shared.notification_outbox import NotificationOutbox
+
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# One outbox per process; its dispatcher starts with the first notification
+notification_outbox = NotificationOutbox("journal-service", settings)
+
 class JournalNotificationType(str, Enum):
     # Journal entry notifications
     ENTRY_CREATED = "journal_entry_created"
@@ -66,7 +70,34 @@ class JournalNotificationService:
     def __init__(self):
         self.notification_service_url = settings.NOTIFICATION_SERVICE_URL
         self.timeout = 5.0
+    
+    def build_payload(
+        self,
+        notification_type: JournalNotificationType,
+        recipient_id: str,
+        channels: List[str],
+        variables: Dict[str, Any],
+        priority: str = "normal",
+        scheduled_for: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """Build the Notification Service request body"""
+        payload = {
+            "type": notification_type.value,
+            "recipientId": recipient_id,
+            "channels": channels,
+            "variables": {
+                **variables,
+                "timestamp": datetime.utcnow().isoformat(),
+            },
+            "priority": priority,
+            "serviceSource": "journal-service"
+        }
+        
+        if scheduled_for:
+            payload["scheduledFor"] = scheduled_for.isoformat()
         
+        return payload
+    
     async def send_notification(
         self,
         notification_type: JournalNotificationType,
@@ -76,43 +107,28 @@ class JournalNotificationService:
         priority: str = "normal",
         scheduled_for: Optional[datetime] = None
     ) -> bool:
-        """Send notification to the notification service"""
+        """
+        Queue a notification for the notification service
+        
+        Written to the local outbox and sent in a batch by its dispatcher;
+        returns False only if it couldn't be queued.
+        """
         try:
-            payload = {
-                "type": notification_type.value,
-                "recipientId": recipient_id,
-                "channels": channels,
-                "variables": {
-                    **variables,
-                    "timestamp": datetime.utcnow().isoformat(),
-                },
-                "priority": priority,
-                "serviceSource": "journal-service"
-            }
+            payload = self.build_payload(
+                notification_type,
+                recipient_id,
+                channels,
+                variables,
+                priority=priority,
+                scheduled_for=scheduled_for
+            )
             
-            if scheduled_for:
-                payload["scheduledFor"] = scheduled_for.isoformat()
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.notification_service_url}/api/notification",
-                    json=payload,
-                    headers={
-                        "X-Service-Name": "journal-service",
-                        "Content-Type": "application/json"
-                    },
-                    timeout=self.timeout
-                )
-                
-                if response.status_code == 200:
-                    logger.info(f"Journal notification sent: {notification_type.value} to user {recipient_id}")
-                    return True
-                else:
-                    logger.warning(f"Failed to send notification: HTTP {response.status_code}")
-                    return False
-                    
+            if await notification_outbox.add([payload]):
+                logger.info(f"Journal notification queued: {notification_type.value} to user {recipient_id}")
+            return True
+        
         except Exception as e:
-            logger.error(f"Failed to send journal notification: {str(e)}")
+            logger.error(f"Failed to queue journal notification: {str(e)}")
             # Don't raise - notifications are non-critical
             return False
     
@@ -153,7 +169,7 @@ class JournalNotificationService:
         channels = ["in_app"]
         if streak_count > 0 and streak_count % 7 == 0:  # Weekly streak
             channels.append("push")
-            
+        
         await self.send_notification(
             JournalNotificationType.MOOD_LOGGED,
             user_id,
@@ -481,11 +497,13 @@ class JournalNotificationService:
         reminder_times: List[Dict[str, Any]],
         timezone: str = "UTC"
     ):
-        """Schedule daily reflection reminders"""
-        for reminder_time in reminder_times:
-            scheduled_time = datetime.fromisoformat(reminder_time["time"])
-            
-            await self.send_notification(
+        """
+        Schedule daily reflection reminders
+        
+        The whole schedule is written to the outbox in one transaction.
+        """
+        payloads = [
+            self.build_payload(
                 JournalNotificationType.DAILY_REFLECTION_REMINDER,
                 user_id,
                 ["push"],
@@ -495,5 +513,13 @@ class JournalNotificationService:
                     "scheduledReminder": True
                 },
                 priority="normal",
-                scheduled_for=scheduled_time
-            ) 
\ No newline at end of file
+                scheduled_for=datetime.fromisoformat(reminder_time["time"])
+            )
+            for reminder_time in reminder_times
+        ]
+        
+        try:
+            queued = await notification_outbox.add(payloads)
+            logger.info(f"Scheduled {queued} of {len(payloads)} reflection reminders for user {user_id}")
+        except Exception as e:
+            logger.error(f"Failed to schedule reflection reminders: {str(e)}") 
\ No newline at end of file
@@ -0,0 +1,52 @@
+"""
+Background job worker for the Journal service
+
+Runs the jobs enqueued by the API (journal analysis) in a separate process:
+
+    python -m app.worker
+"""
+import asyncio
+import logging
+import os
+import signal
+import socket
+
+from mindlyf_shared.job_queue import create_job_queue
+from mindlyf_shared.job_worker import JobWorker, LaneLimits
+from prometheus_client import start_http_server
+
+from app.core.config import settings
+from app.services.job_service import JOB_HANDLERS
+
+logger = logging.getLogger(__name__)
+
+worker = JobWorker("journal", JOB_HANDLERS, settings)
+
+async def run_worker() -> None:
+    """Claim and run jobs until SIGTERM/SIGINT, at most JOB_WORKER_CONCURRENCY at a time"""
+    queue = create_job_queue(settings)
+    consumer = f"{socket.gethostname()}-{os.getpid()}"
+    limits = LaneLimits(
+        max_attempts=settings.JOB_MAX_ATTEMPTS,
+        timeout=settings.JOB_TIMEOUT,
+        retry_base_delay=settings.JOB_RETRY_BASE_DELAY,
+        max_retry_delay=300
+    )
+    
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stopping.set)
+    
+    depth_reporter = asyncio.create_task(worker.report_depth("jobs", queue))
+    logger.info(f"Worker {consumer} started with concurrency {settings.JOB_WORKER_CONCURRENCY}")
+    
+    await worker.run_lane(queue, settings.JOB_WORKER_CONCURRENCY, limits, consumer, stopping)
+    
+    depth_reporter.cancel()
+    logger.info(f"Worker {consumer} stopped")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    start_http_server(settings.JOB_WORKER_METRICS_PORT)
+    asyncio.run(run_worker())
@@ -1,7 +1,9 @@
-from typing import Generator
+from typing import Any, Dict, Generator
+from fastapi import Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import SessionLocal
+from app.core.security import validate_token
+from app.db.session import ReadSessionLocal, SessionLocal
 
 async def get_db() -> Generator[AsyncSession, None, None]:
     """
@@ -14,4 +16,37 @@ async def get_db() -> Generator[AsyncSession, None, None]:
     try:
         yield session
     finally:
-        await session.close() 
\ No newline at end of file
+        await session.close() 
+
+async def get_read_db() -> Generator[AsyncSession, None, None]:
+    """
+    Get a database session for a read-mostly request
+    
+    Reads go to the replica when one is configured and caught up; anything
+    after the session's first write goes to the primary.
+    
+    Yields:
+        AsyncSession: Database session
+    """
+    session = ReadSessionLocal()
+    try:
+        yield session
+    finally:
+        await session.close()
+
+async def require_admin(current_user: Dict[str, Any] = Depends(validate_token)) -> Dict[str, Any]:
+    """
+    Check that the current user has admin privileges
+    
+    Returns:
+        The current user
+    
+    Raises:
+        HTTPException: If the user is not an admin
+    """
+    if "admin" not in (current_user.get("roles") or []):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Insufficient permissions"
+        )
+    return current_user
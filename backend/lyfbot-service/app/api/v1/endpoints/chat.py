@@ -0,0 +1,40 @@
+import asyncio
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, status
+
+from app.core.config import settings
+from app.core.security import verify_token
+from app.services.chat_connection import ChatConnection
+from app.services.message_pipeline import MessagePipeline
+
+# Mounted without the router-wide bearer dependency: the token is sent in the
+# first frame because browsers can't set headers on WebSocket requests
+router = APIRouter()
+message_pipeline = MessagePipeline()
+
+@router.websocket("/ws/chat")
+async def chat_socket(websocket: WebSocket):
+    """
+    Chat with LyfBot over a single authenticated connection
+    
+    The first frame must be {"type": "auth", "token": "<JWT>"}; see
+    ChatConnection for the frames that follow.
+    """
+    await websocket.accept()
+    
+    user = None
+    try:
+        frame = await asyncio.wait_for(websocket.receive_json(), timeout=settings.WS_AUTH_TIMEOUT)
+        if isinstance(frame, dict) and frame.get("type") == "auth" and frame.get("token"):
+            user = await verify_token(frame["token"])
+    except WebSocketDisconnect:
+        return
+    except (asyncio.TimeoutError, HTTPException, ValueError):
+        pass
+    
+    if not user:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    await websocket.send_json({"type": "ready", "user_id": user["id"]})
+    await ChatConnection(websocket, user, message_pipeline).serve()
@@ -35,6 +35,19 @@ async def get_user_context(
             detail=f"Failed to get context: {str(e)}"
         )
 
+@router.post("/prewarm", status_code=status.HTTP_202_ACCEPTED)
+async def prewarm_user_context(
+    current_user = Depends(validate_token)
+):
+    """
+    Start loading the user context in the background
+    
+    Clients call this when a chat screen opens, so the first message
+    doesn't wait for the other services.
+    """
+    ContextService.prewarm(current_user["id"], trigger="request")
+    return {"status": "accepted"}
+
 @router.post("/reload", response_model=Dict[str, Any])
 async def reload_user_context(
     conversation_id: int = None,
@@ -1,16 +1,20 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.dependencies import get_db
+from app.api.dependencies import get_db, get_read_db
 from app.core.security import validate_token
 from app.schemas.conversation import (
     Conversation,
     ConversationDetail,
     ConversationCreate,
-    ConversationUpdate
+    ConversationUpdate,
+    ConversationPage,
+    MessageSearchPage
 )
-from app.services.conversation_service import ConversationService
+from app.services.context_service import ContextService
+from app.services.conversation_service import ConversationService, InvalidCursor
 
 router = APIRouter()
 conversation_service = ConversationService()
@@ -45,41 +49,92 @@ async def create_conversation(
             detail=f"Failed to create conversation: {str(e)}"
         )
 
-@router.get("", response_model=List[Conversation])
+@router.get("", response_model=ConversationPage)
 async def get_conversations(
-    skip: int = 0,
-    limit: int = 10,
+    cursor: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100),
     include_inactive: bool = False,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user = Depends(validate_token)
 ):
     """
-    Get all conversations for the current user
+    Get the current user's conversations, most recently updated first
+    
+    Returns summaries (last message preview, message count, last sentiment)
+    a page at a time; pass next_cursor back as cursor for the next page.
     """
     try:
         # Set the user ID from the token
         user_id = current_user["id"]
         
         # Get conversations
-        conversations = await conversation_service.get_conversations(
+        conversations, next_cursor = await conversation_service.get_conversations(
             db,
             user_id,
-            skip=skip,
+            cursor=cursor,
             limit=limit,
             include_inactive=include_inactive
         )
         
-        return conversations
+        return {"items": conversations, "next_cursor": next_cursor}
+    except InvalidCursor as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to get conversations: {str(e)}"
         )
 
+@router.get("/search", response_model=MessageSearchPage)
+async def search_conversations(
+    q: str = Query(..., min_length=1, max_length=200),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_read_db),
+    current_user = Depends(validate_token)
+):
+    """
+    Search the current user's messages, best match first
+    
+    Supports "quoted phrases", or and -excluded words; since/until narrow
+    the search to a time range. Pass next_cursor back as cursor for the
+    next page.
+    """
+    try:
+        # Set the user ID from the token
+        user_id = current_user["id"]
+        
+        results, next_cursor = await conversation_service.search_messages(
+            db,
+            user_id,
+            q,
+            since=since,
+            until=until,
+            cursor=cursor,
+            limit=limit
+        )
+        
+        return {"items": results, "next_cursor": next_cursor}
+    except InvalidCursor as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to search conversations: {str(e)}"
+        )
+
 @router.get("/{conversation_id}", response_model=ConversationDetail)
 async def get_conversation(
     conversation_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user = Depends(validate_token)
 ):
     """
@@ -101,7 +156,10 @@ async def get_conversation(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Conversation not found"
             )
-            
+        
+        # The user is likely to send a message next
+        ContextService.prewarm(user_id, trigger="conversation")
+        
         return conversation
     except HTTPException:
         raise
@@ -137,7 +195,7 @@ async def update_conversation(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Conversation not found"
             )
-            
+        
         # Update conversation
         updated_conversation = await conversation_service.update_conversation(
             db,
@@ -181,7 +239,7 @@ async def delete_conversation(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Conversation not found"
             )
-            
+        
         # Mark conversation as inactive
         await conversation_service.mark_conversation_inactive(
             db,
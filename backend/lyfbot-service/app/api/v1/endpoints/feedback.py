@@ -1,14 +1,18 @@
-from typing import Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, Field
 
-from app.api.dependencies import get_db
+from app.api.dependencies import get_db, get_read_db, require_admin
+from app.core.config import settings
 from app.core.security import validate_token
 from app.services.feedback_service import FeedbackService
+from app.services.job_service import JobService
 
 router = APIRouter()
 feedback_service = FeedbackService()
+job_service = JobService()
 
 class ConversationFeedback(BaseModel):
     conversation_id: int = Field(..., description="ID of the conversation being rated")
@@ -25,7 +29,6 @@ class BotFeedback(BaseModel):
 @router.post("/conversation", response_model=Dict[str, Any])
 async def submit_conversation_feedback(
     feedback: ConversationFeedback,
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
     current_user = Depends(validate_token)
 ):
@@ -46,13 +49,11 @@ async def submit_conversation_feedback(
             improvement_areas=feedback.improvement_areas
         )
         
-        # Process feedback in the background
-        background_tasks.add_task(
-            feedback_service.process_feedback,
-            feedback_id=result["feedback_id"],
-            feedback_type="conversation",
-            user_id=user_id,
-            db=db
+        # Process feedback in the job worker
+        await job_service.enqueue(
+            "feedback.process",
+            {"feedback_id": result["feedback_id"], "feedback_type": "conversation", "user_id": user_id},
+            idempotency_key=f"feedback.process:conversation:{result['feedback_id']}"
         )
         
         return {"status": "success", "message": "Feedback received"}
@@ -65,7 +66,6 @@ async def submit_conversation_feedback(
 @router.post("/bot", response_model=Dict[str, Any])
 async def submit_bot_feedback(
     feedback: BotFeedback,
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
     current_user = Depends(validate_token)
 ):
@@ -86,13 +86,11 @@ async def submit_bot_feedback(
             session_data=feedback.session_data
         )
         
-        # Process feedback in the background
-        background_tasks.add_task(
-            feedback_service.process_feedback,
-            feedback_id=result["feedback_id"],
-            feedback_type="bot",
-            user_id=user_id,
-            db=db
+        # Process feedback in the job worker
+        await job_service.enqueue(
+            "feedback.process",
+            {"feedback_id": result["feedback_id"], "feedback_type": "bot", "user_id": user_id},
+            idempotency_key=f"feedback.process:bot:{result['feedback_id']}"
         )
         
         return {"status": "success", "message": "Feedback received"}
@@ -100,4 +98,48 @@ async def submit_bot_feedback(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to submit feedback: {str(e)}"
-        ) 
\ No newline at end of file
+        )
+
+@router.get("/rollups", response_model=Dict[str, Any])
+async def get_feedback_rollups(
+    since: Optional[date] = Query(None, description="First day (UTC) to include; defaults to 30 days ago"),
+    until: Optional[date] = Query(None, description="Last day (UTC) to include; defaults to today"),
+    feedback_type: Optional[str] = Query(None, description="Only conversation or bot feedback"),
+    model_version: Optional[str] = Query(None, description="Only feedback on this model version"),
+    prompt_version: Optional[str] = Query(None, description="Only feedback on this prompt version"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user = Depends(require_admin)
+):
+    """
+    Get feedback aggregates per day, model version and prompt version
+    
+    Reads the precomputed rollups only; feedback appears here once the job
+    worker has processed it.
+    """
+    try:
+        until = until or datetime.now(timezone.utc).date()
+        since = since or until - timedelta(days=29)
+        
+        if since > until or (until - since).days >= settings.FEEDBACK_ROLLUP_MAX_DAYS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"The range must be between 1 and {settings.FEEDBACK_ROLLUP_MAX_DAYS} days"
+            )
+        
+        rollups = await feedback_service.get_rollups(
+            db,
+            since=since,
+            until=until,
+            feedback_type=feedback_type,
+            model_version=model_version,
+            prompt_version=prompt_version
+        )
+        
+        return {"since": since, "until": until, **rollups}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get feedback rollups: {str(e)}"
+        )
@@ -1,8 +1,8 @@
-from fastapi import APIRouter, Depends
+from typing import Optional
+
+from fastapi import APIRouter
 from pydantic import BaseModel
-from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.dependencies import get_db
 from app.services.health_service import HealthService
 
 router = APIRouter()
@@ -13,11 +13,15 @@ class HealthResponse(BaseModel):
     service: str
     version: str
     dependencies: dict
+    checked_at: Optional[float] = None
+    stale: bool = False
 
 @router.get("", response_model=HealthResponse)
-async def health_check(db: AsyncSession = Depends(get_db)):
+async def health_check():
     """
     Check the health of the service and its dependencies
+    
+    Serves the background prober's last snapshot; dependencies aren't
+    probed per request.
     """
-    health_status = await health_service.check_health(db)
-    return health_status 
\ No newline at end of file
+    return health_service.get_health()
\ No newline at end of file
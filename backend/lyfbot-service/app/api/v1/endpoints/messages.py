@@ -1,9 +1,9 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Response
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.dependencies import get_db
+from app.api.dependencies import get_db, get_read_db
 from app.core.security import validate_token
 from app.schemas.message import (
     MessageRequest,
@@ -13,132 +13,120 @@ from app.schemas.message import (
     MessageFeedback
 )
 from app.services.message_service import MessageService
-from app.services.conversation_service import ConversationService
 from app.services.ai_service import AIService
-from app.services.context_service import ContextService
-from app.services.crisis_service import CrisisService
+from app.services.message_pipeline import MessagePipeline
+from app.services.stream_service import StreamService
+from app.services.rate_limiter import RateLimiter
+from app.services.idempotency_service import IdempotencyService
 
 router = APIRouter()
 message_service = MessageService()
-conversation_service = ConversationService()
 ai_service = AIService()
-context_service = ContextService()
-crisis_service = CrisisService()
+message_pipeline = MessagePipeline()
+stream_service = StreamService()
+rate_limiter = RateLimiter()
+idempotency_service = IdempotencyService()
+
+STREAM_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Ask reverse proxies (nginx) not to buffer the stream
+    "X-Accel-Buffering": "no"
+}
 
 @router.post("", response_model=MessageResponse)
 async def send_message(
     message: MessageRequest,
-    background_tasks: BackgroundTasks,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
     db: AsyncSession = Depends(get_db),
     current_user = Depends(validate_token)
 ):
     """
     Send a message to LyfBot and get a response
+    
+    With an Idempotency-Key header, a retry gets the first attempt's reply
+    (marked Idempotent-Replayed: true) instead of the message being stored
+    and answered again.
     """
     try:
         # Set the user ID from the token
         user_id = current_user["id"]
         
-        # Get or create conversation
-        conversation_id = message.conversation_id
-        if not conversation_id:
-            conversation = await conversation_service.create_conversation(
-                db, 
-                user_id, 
-                initial_message=message.content
-            )
-            conversation_id = conversation.id
-        else:
-            # Verify the conversation belongs to the user
-            conversation = await conversation_service.get_conversation(
-                db, 
-                conversation_id, 
-                user_id
-            )
-            if not conversation:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Conversation not found"
-                )
-                
-        # Get user context from other services
-        context = await context_service.gather_context(
-            user_id=user_id,
-            conversation_id=conversation_id,
-            additional_context=message.context
-        )
-        
-        # Check for crisis indicators
-        is_crisis, crisis_type = await crisis_service.detect_crisis(
-            message.content, 
-            user_id
-        )
-        
-        if is_crisis:
-            # Handle crisis in the background
-            background_tasks.add_task(
-                crisis_service.handle_crisis,
-                user_id=user_id,
-                crisis_type=crisis_type,
-                message_content=message.content,
-                conversation_id=conversation_id
-            )
-        
-        # Save user message
-        user_message = await message_service.create_message(
-            db,
-            conversation_id=conversation_id,
-            role="user",
-            content=message.content,
-            user_id=user_id
-        )
+        fingerprint = None
+        if idempotency_key:
+            fingerprint = idempotency_service.fingerprint(message.model_dump())
+            replay = await idempotency_service.begin(user_id, idempotency_key, fingerprint)
+            if replay is not None:
+                response.headers["Idempotent-Replayed"] = "true"
+                return replay
         
-        # Get response from AI service
-        response_content = await ai_service.generate_response(
-            message=message.content,
-            conversation_id=conversation_id,
-            user_id=user_id,
-            context=context,
-            is_crisis=is_crisis,
-            crisis_type=crisis_type if is_crisis else None
-        )
+        try:
+            assistant_message = await _answer_message(db, message, response, user_id)
+        except BaseException:
+            # Let a retry run the request again
+            if fingerprint:
+                await idempotency_service.release(user_id, idempotency_key)
+            raise
         
-        # Save assistant response
-        assistant_message = await message_service.create_message(
-            db,
-            conversation_id=conversation_id,
-            role="assistant",
-            content=response_content,
-            user_id=user_id
-        )
-        
-        # Update conversation timestamp
-        await conversation_service.update_conversation_timestamp(
-            db,
-            conversation_id=conversation_id
-        )
-        
-        # Analyze message and response in the background
-        background_tasks.add_task(
-            ai_service.analyze_message,
-            message_id=user_message.id,
-            content=message.content,
-            user_id=user_id,
-            db=db
-        )
+        if fingerprint:
+            try:
+                stored = MessageResponse.model_validate(assistant_message).model_dump(mode="json")
+            except Exception:
+                await idempotency_service.release(user_id, idempotency_key)
+                raise
+            await idempotency_service.complete(user_id, idempotency_key, fingerprint, stored)
         
         return assistant_message
-        
+    
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to process message: {str(e)}"
         )
 
+async def _answer_message(
+    db: AsyncSession,
+    message: MessageRequest,
+    response: Response,
+    user_id: str
+):
+    """Store a message and generate the assistant's reply"""
+    await rate_limiter.check(user_id, "messages", message.content)
+    
+    # Resolve the conversation, store the user message, gather context
+    # and check for crisis indicators concurrently
+    turn = await message_pipeline.prepare(
+        db,
+        user_id=user_id,
+        content=message.content,
+        conversation_id=message.conversation_id,
+        additional_context=message.context
+    )
+    
+    # Generate and save the assistant response
+    assistant_message = await message_pipeline.respond(
+        db,
+        turn,
+        user_id=user_id,
+        content=message.content
+    )
+    
+    # Timestamp update and analysis go to the job worker (crises were escalated in prepare)
+    await message_pipeline.defer_followups(
+        turn,
+        user_id=user_id,
+        content=message.content
+    )
+    
+    response.headers["Server-Timing"] = turn.timings.server_timing()
+    
+    return assistant_message
+
 @router.post("/stream", response_model=None)
 async def stream_message(
     message: StreamMessageRequest,
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
     current_user = Depends(validate_token)
 ):
@@ -148,100 +136,110 @@ async def stream_message(
     try:
         # Set the user ID from the token
         user_id = current_user["id"]
+        await rate_limiter.check(user_id, "streams", message.content)
         
-        # Get or create conversation
-        conversation_id = message.conversation_id
-        if not conversation_id:
-            conversation = await conversation_service.create_conversation(
-                db, 
-                user_id, 
-                initial_message=message.content
-            )
-            conversation_id = conversation.id
-        else:
-            # Verify the conversation belongs to the user
-            conversation = await conversation_service.get_conversation(
-                db, 
-                conversation_id, 
-                user_id
-            )
-            if not conversation:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Conversation not found"
-                )
-        
-        # Get user context from other services
-        context = await context_service.gather_context(
+        # Same preparation stages as the non-streaming endpoint
+        turn = await message_pipeline.prepare(
+            db,
             user_id=user_id,
-            conversation_id=conversation_id,
+            content=message.content,
+            conversation_id=message.conversation_id,
             additional_context=message.context
         )
         
-        # Check for crisis indicators
-        is_crisis, crisis_type = await crisis_service.detect_crisis(
-            message.content, 
-            user_id
+        # Timestamp update and analysis go to the job worker (crises were escalated in prepare)
+        await message_pipeline.defer_followups(
+            turn,
+            user_id=user_id,
+            content=message.content
         )
         
-        if is_crisis:
-            # Handle crisis in the background
-            background_tasks.add_task(
-                crisis_service.handle_crisis,
-                user_id=user_id,
-                crisis_type=crisis_type,
-                message_content=message.content,
-                conversation_id=conversation_id
-            )
-        
-        # Save user message
-        user_message = await message_service.create_message(
-            db,
-            conversation_id=conversation_id,
-            role="user",
-            content=message.content,
-            user_id=user_id
+        stream_kwargs = dict(
+            message=message.content,
+            conversation_id=turn.conversation_id,
+            user_id=user_id,
+            context=turn.context,
+            is_crisis=turn.is_crisis,
+            crisis_type=turn.crisis_type,
+            exclude_message_ids=[turn.user_message.id]
         )
         
-        # Update conversation timestamp
-        await conversation_service.update_conversation_timestamp(
-            db,
-            conversation_id=conversation_id
+        # Generate into the replay buffer so a dropped client can resume via
+        # GET /stream/{stream_id}; stream directly if the buffer is unavailable
+        stream_id = turn.user_message.id
+        if await stream_service.start(stream_id, **stream_kwargs):
+            body = stream_service.tail(stream_id)
+        else:
+            body = ai_service.stream_response(db=db, **stream_kwargs)
+        
+        # Return streaming response
+        return StreamingResponse(
+            body,
+            media_type="text/event-stream",
+            headers={
+                **STREAM_HEADERS,
+                "Server-Timing": turn.timings.server_timing(),
+                "X-Stream-ID": str(stream_id)
+            }
         )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to process message: {str(e)}"
+        )
+
+@router.get("/stream/{stream_id}", response_model=None)
+async def resume_stream(
+    stream_id: int,
+    last_event_id: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db),
+    current_user = Depends(validate_token)
+):
+    """
+    Resume a streamed response after a disconnect
+    
+    Frames after the Last-Event-ID header are replayed without generating the
+    response again. Once the stream buffer has expired the completed response
+    is sent from the database.
+    """
+    try:
+        # Set the user ID from the token
+        user_id = current_user["id"]
         
-        # Analyze message in the background
-        background_tasks.add_task(
-            ai_service.analyze_message,
-            message_id=user_message.id,
-            content=message.content,
+        body = await stream_service.resume(
+            db,
+            stream_id=stream_id,
             user_id=user_id,
-            db=db
+            last_event_id=last_event_id
         )
         
-        # Return streaming response
+        if body is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Stream not found"
+            )
+        
         return StreamingResponse(
-            ai_service.stream_response(
-                message=message.content,
-                conversation_id=conversation_id,
-                user_id=user_id,
-                context=context,
-                is_crisis=is_crisis,
-                crisis_type=crisis_type if is_crisis else None,
-                db=db
-            ),
-            media_type="text/event-stream"
+            body,
+            media_type="text/event-stream",
+            headers={**STREAM_HEADERS, "X-Stream-ID": str(stream_id)}
         )
-        
+    
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to process message: {str(e)}"
+            detail=f"Failed to resume stream: {str(e)}"
         )
 
 @router.get("/{message_id}", response_model=MessageWithAnalysis)
 async def get_message(
     message_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user = Depends(validate_token)
 ):
     """
@@ -263,9 +261,9 @@ async def get_message(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Message not found"
             )
-            
-        return message
         
+        return message
+    
     except HTTPException:
         raise
     except Exception as e:
@@ -297,7 +295,12 @@ async def submit_message_feedback(
         )
         
         return {"status": "success", "message": "Feedback saved"}
-        
+    
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Message not found"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -0,0 +1,37 @@
+from typing import Iterable
+
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+class StreamingAwareGZipMiddleware(GZipMiddleware):
+    """
+    GZip compression that leaves event streams alone
+    
+    GZipMiddleware holds back output until minimum_size bytes are available
+    and then compresses in blocks, which delays or batches streamed frames.
+    Requests for excluded path prefixes, or that accept text/event-stream,
+    are passed through uncompressed.
+    """
+    
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 500,
+        compresslevel: int = 9,
+        exclude_paths: Iterable[str] = ()
+    ) -> None:
+        super().__init__(app, minimum_size=minimum_size, compresslevel=compresslevel)
+        self.exclude_paths = tuple(exclude_paths)
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            headers = Headers(scope=scope)
+            if (
+                scope["path"].startswith(self.exclude_paths)
+                or "text/event-stream" in headers.get("accept", "")
+            ):
+                await self.app(scope, receive, send)
+                return
+        
+        await super().__call__(scope, receive, send)
@@ -1,5 +1,8 @@
+import asyncio
 import httpx
 import logging
+import time
+from typing import Optional, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
@@ -11,21 +14,41 @@ logger = logging.getLogger(__name__)
 # Set up HTTP Bearer scheme
 security = HTTPBearer()
 
+# Cached service token and the time it should be refreshed
+_service_token: Optional[Tuple[str, float]] = None
+_service_token_lock: Optional[asyncio.Lock] = None
+
 async def validate_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """
     Validate JWT token by calling the Auth Service
     
     Args:
         credentials: The authorization credentials (JWT token)
-        
+    
     Returns:
         dict: User data from the token if valid
-        
+    
     Raises:
         HTTPException: If token is invalid or Auth Service is unavailable
     """
-    token = credentials.credentials
+    return await verify_token(credentials.credentials)
+
+async def verify_token(token: str):
+    """
+    Validate a raw JWT token with the Auth Service
+    
+    Used directly by connections that authenticate once without a bearer
+    header (WebSocket chat).
     
+    Args:
+        token: The JWT token
+    
+    Returns:
+        dict: User data from the token if valid
+    
+    Raises:
+        HTTPException: If token is invalid or Auth Service is unavailable
+    """
     try:
         # Call Auth Service to validate token
         async with httpx.AsyncClient() as client:
@@ -42,10 +65,10 @@ async def validate_token(credentials: HTTPAuthorizationCredentials = Depends(sec
                     detail="Invalid authentication credentials",
                     headers={"WWW-Authenticate": "Bearer"},
                 )
-                
+            
             user_data = response.json()
             return user_data
-            
+    
     except httpx.RequestError as exc:
         logger.error(f"Auth Service request failed: {str(exc)}")
         raise HTTPException(
@@ -57,12 +80,38 @@ async def get_service_token():
     """
     Get a service token from the Auth Service for service-to-service communication
     
+    The token is cached for SERVICE_TOKEN_TTL seconds (or until shortly
+    before it expires, if the Auth Service says when), so callers on the
+    hot path don't pay for an Auth Service round trip.
+    
     Returns:
         str: Service token
-        
+    
     Raises:
         HTTPException: If Auth Service is unavailable
     """
+    global _service_token, _service_token_lock
+    
+    if _service_token and _service_token[1] > time.monotonic():
+        return _service_token[0]
+    
+    if _service_token_lock is None:
+        _service_token_lock = asyncio.Lock()
+    
+    async with _service_token_lock:
+        # Another caller may have refreshed it while we waited
+        if _service_token and _service_token[1] > time.monotonic():
+            return _service_token[0]
+        
+        token, expires_in = await _request_service_token()
+        ttl = settings.SERVICE_TOKEN_TTL
+        if expires_in:
+            ttl = min(ttl, max(expires_in - 30, 0))
+        _service_token = (token, time.monotonic() + ttl)
+        return token
+
+async def _request_service_token() -> Tuple[str, Optional[int]]:
+    """Request a new service token; returns the token and its lifetime in seconds, if given"""
     try:
         # Call Auth Service to get service token
         async with httpx.AsyncClient() as client:
@@ -78,10 +127,10 @@ async def get_service_token():
                     status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                     detail="Failed to authenticate with Auth Service",
                 )
-                
-            token_data = response.json()
-            return token_data["token"]
             
+            token_data = response.json()
+            return token_data["token"], token_data.get("expires_in")
+    
     except httpx.RequestError as exc:
         logger.error(f"Auth Service request failed: {str(exc)}")
         raise HTTPException(
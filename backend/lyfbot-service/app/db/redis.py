@@ -0,0 +1,9 @@
+import redis.asyncio as redis
+
+from app.core.config import settings
+
+# Shared async Redis client (connections are opened lazily from the pool)
+redis_client = redis.from_url(
+    settings.REDIS_URL,
+    decode_responses=True
+)
@@ -1,17 +1,166 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+import asyncio
+import logging
+import time
+from typing import Any, Optional
+
+from prometheus_client import Gauge, Histogram
+from sqlalchemy import Select, text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.core.config import settings
 
-# Create async engine
-engine = create_async_engine(
-    settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://"),
-    echo=False,
-    future=True
+logger = logging.getLogger(__name__)
+
+POOL_CONNECTIONS = Gauge(
+    "lyfbot_db_pool_connections",
+    "Database pool connections by state",
+    ["engine", "state"]
+)
+POOL_WAIT = Histogram(
+    "lyfbot_db_pool_wait_seconds",
+    "Time spent waiting for a pooled database connection",
+    ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+REPLICA_LAG = Gauge(
+    "lyfbot_db_replica_lag_seconds",
+    "Replication lag of the read replica, as last checked"
+)
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long checkouts wait for a connection"""
+    
+    def _do_get(self) -> Any:
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_WAIT.labels(engine=self._orig_logging_name or "primary").observe(time.perf_counter() - start)
+
+def create_engine(url: str, name: str) -> AsyncEngine:
+    """
+    Create an asyncpg engine with the DB_POOL_* and DB_STATEMENT_CACHE_SIZE settings
+    
+    Args:
+        url: Database URL
+        name: Label for the pool metrics ("primary" or "replica")
+    
+    Returns:
+        The engine
+    """
+    engine = create_async_engine(
+        url.replace("postgresql://", "postgresql+asyncpg://"),
+        echo=False,
+        future=True,
+        poolclass=InstrumentedPool,
+        pool_logging_name=name,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_POOL_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        # Prepared statements kept per connection (0 behind a transaction-mode pgbouncer)
+        connect_args={
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE
+        }
+    )
+    
+    # Read from the engine's current pool, which is replaced on dispose()
+    POOL_CONNECTIONS.labels(engine=name, state="checked_out").set_function(
+        lambda: engine.sync_engine.pool.checkedout()
+    )
+    POOL_CONNECTIONS.labels(engine=name, state="idle").set_function(
+        lambda: engine.sync_engine.pool.checkedin()
+    )
+    return engine
+
+# Create async engines; without DATABASE_REPLICA_URL reads use the primary
+engine = create_engine(settings.DATABASE_URL, "primary")
+replica_engine: Optional[AsyncEngine] = (
+    create_engine(settings.DATABASE_REPLICA_URL, "replica") if settings.DATABASE_REPLICA_URL else None
 )
 
-# Create session factory
+class ReplicaMonitor:
+    """Tracks whether the replica is close enough behind the primary to read from"""
+    
+    healthy = False
+    _task: Optional[asyncio.Task] = None
+    
+    @classmethod
+    def start(cls) -> None:
+        if replica_engine is not None and (cls._task is None or cls._task.done()):
+            cls._task = asyncio.create_task(cls._run())
+    
+    @classmethod
+    async def stop(cls) -> None:
+        if cls._task:
+            cls._task.cancel()
+            try:
+                await cls._task
+            except asyncio.CancelledError:
+                pass
+            cls._task = None
+    
+    @classmethod
+    async def _run(cls) -> None:
+        while True:
+            try:
+                async with replica_engine.connect() as conn:
+                    result = await conn.execute(text(
+                        "SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+                    ))
+                    lag = float(result.scalar())
+                REPLICA_LAG.set(lag)
+                cls.healthy = lag <= settings.DB_REPLICA_MAX_LAG
+            except Exception as e:
+                logger.warning(f"Replica lag check failed, reading from the primary: {str(e)}")
+                cls.healthy = False
+            await asyncio.sleep(settings.DB_REPLICA_CHECK_INTERVAL)
+
+class RoutingSession(Session):
+    """
+    Sends plain SELECTs to the replica while the session only reads
+    
+    Only sessions created with info={"read_only": True} (see ReadSessionLocal)
+    use the replica, and only while it is within DB_REPLICA_MAX_LAG of the
+    primary. Once a session flushes, writes, locks rows or runs raw SQL, it
+    sticks to the primary for the rest of its life, so a request always
+    reads its own writes.
+    """
+    
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if (
+            replica_engine is None
+            or not self.info.get("read_only")
+            or self.info.get("use_primary")
+            or not ReplicaMonitor.healthy
+        ):
+            return engine.sync_engine
+        
+        if self._flushing or not isinstance(clause, Select) or clause._for_update_arg is not None:
+            self.info["use_primary"] = True
+            return engine.sync_engine
+        
+        return replica_engine.sync_engine
+
+def use_primary(session: AsyncSession) -> bool:
+    """
+    Send a read session's remaining queries to the primary, e.g. to retry a
+    miss for a row newer than the replica's last replay
+    
+    Returns:
+        False if the session's reads can't have gone to the replica
+    """
+    if replica_engine is None or not session.info.get("read_only") or session.info.get("use_primary"):
+        return False
+    session.info["use_primary"] = True
+    return True
+
+# Create session factories
 SessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
@@ -20,5 +169,15 @@ SessionLocal = sessionmaker(
     expire_on_commit=False
 )
 
+# For read-mostly requests: routed to the replica until the session writes
+ReadSessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    class_=AsyncSession,
+    sync_session_class=RoutingSession,
+    expire_on_commit=False,
+    info={"read_only": True}
+)
+
 # Create base class for models
-Base = declarative_base() 
\ No newline at end of file
+Base = declarative_base()
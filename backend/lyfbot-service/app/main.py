@@ -1,12 +1,19 @@
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
-from fastapi.middleware.gzip import GZipMiddleware
 from prometheus_client import make_asgi_app
 
 from app.core.config import settings
 from app.api.v1.api import api_router
+from app.api.v1.endpoints import chat
 from app.core.security import validate_token
+from app.core.middleware import StreamingAwareGZipMiddleware
+from app.db.session import ReplicaMonitor
+from app.services.context_events import ContextEventListener
+from app.services.context_service import ContextService
+from app.services.health_service import HealthService
+from app.services.message_writer import MessageWriter
+from app.services.notification_service import notification_outbox
 
 # Create FastAPI app
 app = FastAPI(
@@ -27,8 +34,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Add GZip compression
-app.add_middleware(GZipMiddleware, minimum_size=1000)
+# Add GZip compression (streamed replies are sent uncompressed so frames aren't buffered)
+app.add_middleware(
+    StreamingAwareGZipMiddleware,
+    minimum_size=1000,
+    exclude_paths=["/api/v1/messages/stream"]
+)
 
 # Add metrics endpoint for Prometheus
 metrics_app = make_asgi_app()
@@ -41,6 +52,32 @@ app.include_router(
     dependencies=[Depends(validate_token)],
 )
 
+# WebSocket chat authenticates in its first frame
+app.include_router(chat.router, prefix="/api/v1", tags=["chat"])
+
+# Invalidate cached context when journal/recommender data changes
+context_event_listener = ContextEventListener()
+
+@app.on_event("startup")
+async def start_background_services():
+    context_event_listener.start()
+    ContextService.start()
+    MessageWriter.start()
+    # Sends notifications an earlier process left in the outbox
+    notification_outbox.start()
+    HealthService.start()
+    ReplicaMonitor.start()
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    await context_event_listener.stop()
+    await ContextService.stop()
+    # Write queued messages before exiting
+    await MessageWriter.stop()
+    await notification_outbox.stop()
+    await HealthService.stop()
+    await ReplicaMonitor.stop()
+
 # Health check endpoint
 @app.get("/health", tags=["health"])
 async def health_check():
@@ -0,0 +1,53 @@
+from sqlalchemy import Column, String, DateTime, Boolean, Integer, Text, JSON, Index, text
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+
+from app.db.session import Base
+
+class Conversation(Base):
+    __tablename__ = "conversations"
+    __table_args__ = (
+        # Keyset pagination of a user's conversation list; the included summary
+        # columns make listing an index-only scan
+        Index(
+            "ix_conversations_user_updated",
+            "user_id",
+            "updated_at",
+            "id",
+            postgresql_include=[
+                "title",
+                "is_active",
+                "message_count",
+                "last_message_at",
+                "last_message_preview",
+                "last_sentiment",
+                "created_at"
+            ]
+        ),
+        # Inactive conversations still waiting to be archived
+        Index(
+            "ix_conversations_archive_candidates",
+            "updated_at",
+            postgresql_where=text("NOT is_active AND archived_at IS NULL")
+        ),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(String, nullable=False)
+    title = Column(String)
+    # "metadata" is reserved on declarative models
+    meta = Column("metadata", JSON)
+    system_message = Column(Text)
+    is_active = Column(Boolean, default=True, nullable=False)
+    message_count = Column(Integer, default=0, nullable=False)
+    last_message_at = Column(DateTime(timezone=True))
+    # Summary of the latest messages, refreshed as messages and analyses are written
+    last_message_preview = Column(String)
+    last_sentiment = Column(String)
+    # Set once the messages have been moved to conversation_archives
+    archived_at = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    # Relationships
+    messages = relationship("Message", back_populates="conversation", order_by="Message.id")
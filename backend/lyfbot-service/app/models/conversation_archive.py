@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, DateTime, Integer, LargeBinary, ForeignKey
+from sqlalchemy.sql import func
+
+from app.db.session import Base
+
+class ConversationArchive(Base):
+    __tablename__ = "conversation_archives"
+    
+    # One segment per archived conversation: its messages as JSON, compressed
+    # and then encrypted (see app/services/archive_service.py)
+    conversation_id = Column(Integer, ForeignKey("conversations.id"), primary_key=True)
+    user_id = Column(String, index=True, nullable=False)
+    message_count = Column(Integer, nullable=False)
+    payload = Column(LargeBinary, nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
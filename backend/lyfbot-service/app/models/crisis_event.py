@@ -0,0 +1,40 @@
+from sqlalchemy import Column, String, DateTime, Integer, BigInteger, Float, Index
+from sqlalchemy.sql import func
+
+from app.db.session import Base
+
+class CrisisEvent(Base):
+    __tablename__ = "crisis_events"
+    __table_args__ = (
+        # A user's recent history, newest first
+        Index("ix_crisis_events_user_id_created_at", "user_id", "created_at"),
+        # Retention sweeps
+        Index("ix_crisis_events_created_at", "created_at"),
+    )
+    
+    # Append-only: rows are never updated, only removed by the retention sweeper
+    id = Column(BigInteger, primary_key=True)
+    user_id = Column(String, nullable=False)
+    conversation_id = Column(Integer)
+    # The message that triggered the event; unique so a retried job doesn't record it twice
+    message_id = Column(Integer, unique=True)
+    crisis_type = Column(String, nullable=False)
+    notification_level = Column(String, nullable=False)
+    # The message text isn't kept, only its digest
+    content_sha256 = Column(String(64))
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+class UserRiskSummary(Base):
+    __tablename__ = "user_risk_summaries"
+    
+    # Rolling per-user summary, updated with every event so reads are a primary key lookup
+    user_id = Column(String, primary_key=True)
+    # Sum of event weights, decayed exponentially with CRISIS_RISK_HALF_LIFE_HOURS
+    # up to risk_updated_at
+    risk_score = Column(Float, nullable=False, default=0.0)
+    risk_updated_at = Column(DateTime(timezone=True), nullable=False)
+    # Events within retention; the retention sweep subtracts the ones it deletes
+    event_count = Column(Integer, nullable=False, default=0)
+    last_event_at = Column(DateTime(timezone=True), nullable=False)
+    last_crisis_type = Column(String)
+    last_notification_level = Column(String)
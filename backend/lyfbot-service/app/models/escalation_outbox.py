@@ -0,0 +1,21 @@
+from sqlalchemy import Column, String, DateTime, Integer, BigInteger, Float, Text, JSON, Index
+from sqlalchemy.sql import func
+
+from app.db.session import Base
+
+class EscalationOutbox(Base):
+    __tablename__ = "escalation_outbox"
+    __table_args__ = (
+        Index("ix_escalation_outbox_next_attempt_at", "next_attempt_at"),
+    )
+    
+    # Crisis notifications the Notification Service didn't accept; deleted once delivered
+    id = Column(BigInteger, primary_key=True)
+    path = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    # Epoch seconds at which the crisis was detected, for the end-to-end latency metric
+    detected_at = Column(Float)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,54 @@
+from sqlalchemy import Column, String, DateTime, Date, Integer, BigInteger, Text, JSON, Index
+from sqlalchemy.sql import func
+
+from app.db.session import Base
+
+class Feedback(Base):
+    __tablename__ = "feedback"
+    __table_args__ = (
+        Index("ix_feedback_user_id_created_at", "user_id", "created_at"),
+    )
+    
+    id = Column(BigInteger, primary_key=True)
+    user_id = Column(String, nullable=False)
+    feedback_type = Column(String, nullable=False)  # conversation, bot
+    conversation_id = Column(Integer)
+    rating = Column(Integer, nullable=False)
+    feedback_text = Column(Text)
+    improvement_areas = Column(JSON)
+    session_data = Column(JSON)
+    # The rollout that produced the rated replies, resolved when the feedback is rolled up
+    model_version = Column(String)
+    prompt_version = Column(String)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # Set in the same transaction that adds the feedback to the rollups, so it is counted once
+    rolled_up_at = Column(DateTime(timezone=True))
+
+class FeedbackRollup(Base):
+    __tablename__ = "feedback_rollups"
+    
+    # Incrementally maintained: each feedback adds to one row, and reads never touch raw feedback
+    day = Column(Date, primary_key=True)
+    feedback_type = Column(String, primary_key=True)
+    model_version = Column(String, primary_key=True)
+    prompt_version = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Integer, nullable=False, default=0)
+    # Ratings histogram
+    rating_1 = Column(Integer, nullable=False, default=0)
+    rating_2 = Column(Integer, nullable=False, default=0)
+    rating_3 = Column(Integer, nullable=False, default=0)
+    rating_4 = Column(Integer, nullable=False, default=0)
+    rating_5 = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class FeedbackAreaRollup(Base):
+    __tablename__ = "feedback_area_rollups"
+    
+    # Improvement areas named in feedback, counted per rollup bucket
+    day = Column(Date, primary_key=True)
+    feedback_type = Column(String, primary_key=True)
+    model_version = Column(String, primary_key=True)
+    prompt_version = Column(String, primary_key=True)
+    area = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,33 @@
+from sqlalchemy import Column, String, DateTime, Integer, Text, JSON, ForeignKey, Index, Computed, DDL, event
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred, relationship
+from sqlalchemy.sql import func
+
+from app.db.session import Base
+
+class Message(Base):
+    __tablename__ = "messages"
+    __table_args__ = (
+        # Keyset pagination over a conversation's history
+        Index("ix_messages_conversation_id_id", "conversation_id", "id"),
+        # Full-text search of a user's messages (/conversations/search). With
+        # btree_gin, user_id is in the same GIN index, so a search only reads
+        # the postings of the user's own messages
+        Index("ix_messages_user_id_search_vector", "user_id", "search_vector", postgresql_using="gin"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=False)
+    user_id = Column(String, index=True, nullable=False)
+    role = Column(String, nullable=False)  # user, assistant, system
+    content = Column(Text, nullable=False)
+    meta = Column("metadata", JSON)
+    # Maintained by the database on every insert, including batched ones; not loaded with messages
+    search_vector = deferred(Column(TSVECTOR, Computed("to_tsvector('english', content)", persisted=True)))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Relationships
+    conversation = relationship("Conversation", back_populates="messages")
+
+# GIN operator classes for scalar columns such as user_id
+event.listen(Message.__table__, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS btree_gin"))
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, String, DateTime, Integer, JSON
+from sqlalchemy.sql import func
+
+from app.db.session import Base
+
+class MessageAnalysis(Base):
+    __tablename__ = "message_analyses"
+    
+    # One analysis per message, replaced when a message is analyzed again.
+    # No foreign key: messages may still be queued by the write-behind writer
+    message_id = Column(Integer, primary_key=True)
+    user_id = Column(String, index=True, nullable=False)
+    sentiment = Column(String)
+    emotion = Column(String)
+    topics = Column(JSON)
+    # The full analysis as returned by the AI Service
+    data = Column(JSON)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -1,6 +1,6 @@
 from typing import List, Optional, Dict, Any
 from datetime import datetime
-from pydantic import BaseModel, Field
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field
 
 class MessageBase(BaseModel):
     role: str = Field(..., description="Role of the message sender (user, assistant, system)")
@@ -13,12 +13,16 @@ class Message(MessageBase):
     id: int
     created_at: datetime
     
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class ConversationBase(BaseModel):
     title: Optional[str] = Field(None, description="Title of the conversation")
-    metadata: Optional[Dict[str, Any]] = Field(None, description="Additional metadata")
+    # ORM rows expose the column as "meta" since "metadata" is reserved
+    metadata: Optional[Dict[str, Any]] = Field(
+        None,
+        description="Additional metadata",
+        validation_alias=AliasChoices("meta", "metadata")
+    )
 
 class ConversationCreate(ConversationBase):
     initial_message: Optional[str] = Field(None, description="Initial message to start the conversation")
@@ -38,11 +42,37 @@ class Conversation(ConversationBase):
     message_count: int
     last_message_at: Optional[datetime] = None
     
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+class ConversationSummary(BaseModel):
+    id: int
+    title: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    is_active: bool
+    message_count: int
+    last_message_at: Optional[datetime] = None
+    last_message_preview: Optional[str] = Field(None, description="Start of the latest message")
+    last_sentiment: Optional[str] = Field(None, description="Sentiment of the latest analyzed user message")
+
+class ConversationPage(BaseModel):
+    items: List[ConversationSummary]
+    next_cursor: Optional[str] = Field(None, description="Pass as cursor to get the next page; null on the last page")
+
+class MessageSearchResult(BaseModel):
+    message_id: int
+    conversation_id: int
+    conversation_title: Optional[str] = None
+    role: str
+    created_at: datetime
+    rank: float
+    snippet: str = Field(..., description="HTML excerpt: the message text escaped, with the matching terms wrapped in <mark> tags")
+
+class MessageSearchPage(BaseModel):
+    items: List[MessageSearchResult]
+    next_cursor: Optional[str] = Field(None, description="Pass as cursor to get the next page; null on the last page")
 
 class ConversationDetail(Conversation):
     messages: List[Message] = []
     
-    class Config:
-        orm_mode = True 
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True) 
\ No newline at end of file
@@ -1,6 +1,6 @@
 from typing import List, Optional, Dict, Any
 from datetime import datetime
-from pydantic import BaseModel, Field
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field
 
 class MessageRequest(BaseModel):
     content: str = Field(..., description="Content of the message")
@@ -13,10 +13,10 @@ class MessageResponse(BaseModel):
     content: str
     conversation_id: int
     created_at: datetime
-    metadata: Optional[Dict[str, Any]] = None
+    # ORM rows expose the column as "meta" since "metadata" is reserved
+    metadata: Optional[Dict[str, Any]] = Field(None, validation_alias=AliasChoices("meta", "metadata"))
     
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class MessageWithAnalysis(MessageResponse):
     analysis: Optional[Dict[str, Any]] = Field(None, description="Analysis of the message content")
@@ -24,8 +24,7 @@ class MessageWithAnalysis(MessageResponse):
     detected_sentiment: Optional[str] = Field(None, description="Sentiment detected in the message")
     detected_crisis: Optional[bool] = Field(None, description="Whether a crisis was detected in the message")
     
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class StreamMessageRequest(BaseModel):
     content: str = Field(..., description="Content of the message")
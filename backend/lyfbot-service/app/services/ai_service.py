@@ -3,17 +3,48 @@ import logging
 import httpx
 import asyncio
 import time
-from typing import Dict, Any, List, Tuple, Optional, AsyncGenerator
+from typing import Dict, Any, List, Optional, AsyncGenerator, AsyncIterator
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
 from app.core.security import get_service_token
+from app.services.context_compactor import ContextCompactor
+from app.services.context_service import ContextService
+from app.services.history_service import ConversationHistoryService
+from app.services.message_analysis_service import MessageAnalysisService
+from app.services.message_service import MessageService
 
 logger = logging.getLogger(__name__)
 
+# SSE comment frame, ignored by clients but keeps proxies from timing out the stream
+SSE_HEARTBEAT = ": keep-alive\n\n"
+
+class AIServiceStreamError(Exception):
+    """Raised when the AI Service rejects a streaming request"""
+
 class AIService:
     """Service for interacting with the AI Service for LyfBot"""
     
+    # OpenAI client for the fallback path, shared so its connection pool is reused
+    _openai_client = None
+    
+    def __init__(self):
+        self.history_service = ConversationHistoryService()
+        self.message_service = MessageService()
+        self.analysis_service = MessageAnalysisService()
+        self.context_compactor = ContextCompactor()
+    
+    def _render_context(self, user_id: str, context: Optional[Dict[str, Any]]) -> Optional[str]:
+        """The context as a prompt fragment, cached while the context is"""
+        if not context:
+            return None
+        return self.context_compactor.render(context, ContextService.context_version(user_id, context))
+    
+    @staticmethod
+    def version_metadata() -> Dict[str, Any]:
+        """Metadata recording which rollout wrote a reply, for feedback rollups"""
+        return {"model_version": settings.MODEL_VERSION, "prompt_version": settings.PROMPT_VERSION}
+    
     async def generate_response(
         self,
         message: str,
@@ -21,7 +52,9 @@ class AIService:
         user_id: str,
         context: Dict[str, Any] = None,
         is_crisis: bool = False,
-        crisis_type: str = None
+        crisis_type: str = None,
+        db: AsyncSession = None,
+        exclude_message_ids: List[int] = None
     ) -> str:
         """
         Generate a response to a user message using the AI Service
@@ -33,16 +66,25 @@ class AIService:
             context: Additional context
             is_crisis: Whether the message indicates a crisis
             crisis_type: The type of crisis
+            db: Database session used to load the conversation history
+            exclude_message_ids: Stored messages to leave out of the history (the turn being answered)
             
         Returns:
             The generated response
         """
+        conversation_history = []
+        context_prompt = self._render_context(user_id, context)
+        
         try:
             # Get service token for authentication
             token = await get_service_token()
             
             # Get conversation history
-            conversation_history = await self._get_conversation_history(conversation_id)
+            conversation_history = await self._get_conversation_history(
+                conversation_id,
+                db,
+                exclude_message_ids
+            )
             
             # Prepare request payload
             payload = {
@@ -50,6 +92,8 @@ class AIService:
                 "conversation_id": str(conversation_id),
                 "history": conversation_history,
                 "context": context or {},
+                # Rendered once per context version; the AI Service uses it as is
+                "context_prompt": context_prompt,
                 "user_id": user_id,
                 "is_crisis": is_crisis,
                 "crisis_type": crisis_type
@@ -75,7 +119,7 @@ class AIService:
                         return await self._fallback_generate_response(
                             message, 
                             conversation_history, 
-                            context, 
+                            context_prompt, 
                             is_crisis, 
                             crisis_type
                         )
@@ -93,7 +137,7 @@ class AIService:
                 return await self._fallback_generate_response(
                     message, 
                     conversation_history, 
-                    context, 
+                    context_prompt, 
                     is_crisis, 
                     crisis_type
                 )
@@ -108,10 +152,18 @@ class AIService:
         context: Dict[str, Any] = None,
         is_crisis: bool = False,
         crisis_type: str = None,
-        db: AsyncSession = None
+        db: AsyncSession = None,
+        exclude_message_ids: List[int] = None
     ) -> AsyncGenerator[str, None]:
         """
-        Stream a response to a user message using the AI Service
+        Stream a response to a user message as Server-Sent Events
+        
+        Upstream frames are forwarded as they arrive without being re-encoded.
+        Comment frames are sent as heartbeats while the upstream is idle, and
+        when the client disconnects the upstream request is closed. Once the
+        reply is complete it is stored and a final "done" event carries its ID.
+        If the upstream fails partway, the part that was streamed is stored,
+        marked incomplete, and the final "error" event carries its ID.
         
         Args:
             message: The user message
@@ -121,16 +173,28 @@ class AIService:
             is_crisis: Whether the message indicates a crisis
             crisis_type: The type of crisis
             db: Database session
+            exclude_message_ids: Stored messages to leave out of the history (the turn being answered)
             
         Yields:
-            Chunks of the generated response
+            SSE frames
         """
+        conversation_history = []
+        context_prompt = self._render_context(user_id, context)
+        
+        # Text of the reply, joined once at the end
+        parts: List[str] = []
+        forwarded = False
+        
         try:
             # Get service token for authentication
             token = await get_service_token()
             
             # Get conversation history
-            conversation_history = await self._get_conversation_history(conversation_id)
+            conversation_history = await self._get_conversation_history(
+                conversation_id,
+                db,
+                exclude_message_ids
+            )
             
             # Prepare request payload
             payload = {
@@ -138,165 +202,211 @@ class AIService:
                 "conversation_id": str(conversation_id),
                 "history": conversation_history,
                 "context": context or {},
+                # Rendered once per context version; the AI Service uses it as is
+                "context_prompt": context_prompt,
                 "user_id": user_id,
                 "is_crisis": is_crisis,
                 "crisis_type": crisis_type,
                 "stream": True
             }
             
-            # Initialize full response for storage
-            full_response = ""
-            message_id = None
-            
-            # Setup streaming request to AI Service
-            async with httpx.AsyncClient() as client:
-                async with client.stream(
-                    "POST",
-                    f"{settings.AI_SERVICE_URL}/api/v1/lyfbot/generate",
-                    json=payload,
-                    headers={
-                        "Authorization": f"Bearer {token}",
-                        "X-User-ID": user_id
-                    },
-                    timeout=60.0  # Longer timeout for streaming
-                ) as response:
-                    if response.status_code != 200:
-                        logger.error(f"AI Service streaming failed: {await response.aread()}")
-                        
-                        # Fallback to local generation
-                        if settings.OPENAI_API_KEY:
-                            # For fallback, we can't really stream, so we generate the full response
-                            # and then simulate streaming
-                            full_response = await self._fallback_generate_response(
-                                message, 
-                                conversation_history, 
-                                context, 
-                                is_crisis, 
-                                crisis_type
-                            )
-                            
-                            # Simulate streaming with chunks
-                            words = full_response.split()
-                            chunks = [" ".join(words[i:i+3]) for i in range(0, len(words), 3)]
-                            
-                            for chunk in chunks:
-                                yield json.dumps({
-                                    "message_part": chunk,
-                                    "conversation_id": conversation_id,
-                                    "is_final": False
-                                }) + "\n"
-                                await asyncio.sleep(0.1)
-                                
-                            # Save the message to the database
-                            if db:
-                                from app.services.message_service import MessageService
-                                message_service = MessageService()
-                                assistant_message = await message_service.create_message(
-                                    db,
-                                    conversation_id=conversation_id,
-                                    role="assistant",
-                                    content=full_response,
-                                    user_id=user_id
-                                )
-                                message_id = assistant_message.id
-                                
-                            # Send final chunk
-                            yield json.dumps({
-                                "message_part": "",
-                                "conversation_id": conversation_id,
-                                "message_id": message_id,
-                                "is_final": True
-                            }) + "\n"
-                            
-                            return
-                        
-                        raise Exception(f"AI Service returned status {response.status_code}")
-                    
-                    # Process streaming response
-                    async for line in response.aiter_lines():
-                        if not line.strip():
-                            continue
-                            
-                        try:
-                            data = json.loads(line)
-                            chunk = data.get("message_part", "")
-                            is_final = data.get("is_final", False)
-                            
-                            # Append to full response
-                            full_response += chunk
-                            
-                            # Save the message to the database when we get the final chunk
-                            if is_final and db and not message_id:
-                                from app.services.message_service import MessageService
-                                message_service = MessageService()
-                                assistant_message = await message_service.create_message(
-                                    db,
-                                    conversation_id=conversation_id,
-                                    role="assistant",
-                                    content=full_response,
-                                    user_id=user_id
-                                )
-                                message_id = assistant_message.id
-                                data["message_id"] = message_id
-                                
-                            # Yield the data to the client
-                            yield json.dumps(data) + "\n"
-                            
-                        except json.JSONDecodeError as e:
-                            logger.error(f"Failed to parse streaming response: {str(e)}")
-                            continue
+            async for frame in self._proxy_ai_stream(payload, token, user_id, parts):
+                forwarded = True
+                yield frame
                 
-        except httpx.RequestError as exc:
-            logger.error(f"AI Service streaming request failed: {str(exc)}")
+        except (httpx.RequestError, AIServiceStreamError) as exc:
+            logger.error(f"AI Service streaming failed: {str(exc)}")
             
-            # Fallback to local generation
-            if settings.OPENAI_API_KEY:
-                # For fallback, we can't really stream, so we generate the full response
-                # and then simulate streaming
-                full_response = await self._fallback_generate_response(
-                    message, 
-                    conversation_history, 
-                    context, 
-                    is_crisis, 
-                    crisis_type
-                )
-                
-                # Simulate streaming with chunks
-                words = full_response.split()
-                chunks = [" ".join(words[i:i+3]) for i in range(0, len(words), 3)]
-                
-                for chunk in chunks:
-                    yield json.dumps({
-                        "message_part": chunk,
-                        "conversation_id": conversation_id,
-                        "is_final": False
-                    }) + "\n"
-                    await asyncio.sleep(0.1)
-                    
-                # Save the message to the database
-                if db:
-                    from app.services.message_service import MessageService
-                    message_service = MessageService()
-                    assistant_message = await message_service.create_message(
+            # Frames were already sent, a second answer would be spliced onto the first
+            if forwarded or not settings.OPENAI_API_KEY:
+                message_id = None
+                if db and parts:
+                    # Keep what the client saw, so a resumed stream can be served from the database
+                    partial_message = await self.message_service.create_message(
                         db,
                         conversation_id=conversation_id,
                         role="assistant",
-                        content=full_response,
-                        user_id=user_id
+                        content="".join(parts),
+                        user_id=user_id,
+                        metadata={**self.version_metadata(), "incomplete": True}
                     )
-                    message_id = assistant_message.id
+                    message_id = partial_message.id
+                
+                yield self._sse_frame(
+                    json.dumps({
+                        "error": "Response generation failed",
+                        "conversation_id": conversation_id,
+                        "message_id": message_id
+                    }),
+                    event="error"
+                )
+                return
+            
+            # Fallback to streaming directly from the provider
+            parts.clear()
+            fallback_stream = self._fallback_stream(
+                message, 
+                conversation_history, 
+                context_prompt, 
+                is_crisis, 
+                crisis_type
+            )
+            
+            async for chunk in self._with_heartbeats(fallback_stream):
+                if chunk is None:
+                    yield SSE_HEARTBEAT
+                    continue
                     
-                # Send final chunk
-                yield json.dumps({
-                    "message_part": "",
+                parts.append(chunk)
+                yield self._sse_frame(json.dumps({
+                    "message_part": chunk,
                     "conversation_id": conversation_id,
-                    "message_id": message_id,
-                    "is_final": True
-                }) + "\n"
+                    "is_final": False
+                }))
+        
+        # Save the message to the database
+        message_id = None
+        if db:
+            assistant_message = await self.message_service.create_message(
+                db,
+                conversation_id=conversation_id,
+                role="assistant",
+                content="".join(parts),
+                user_id=user_id,
+                metadata=self.version_metadata()
+            )
+            message_id = assistant_message.id
+            
+        # Send final frame
+        yield self._sse_frame(json.dumps({
+            "message_part": "",
+            "conversation_id": conversation_id,
+            "message_id": message_id,
+            "is_final": True
+        }), event="done")
+    
+    async def _proxy_ai_stream(
+        self,
+        payload: Dict[str, Any],
+        token: str,
+        user_id: str,
+        parts: List[str]
+    ) -> AsyncGenerator[str, None]:
+        """
+        Relay the AI Service's NDJSON stream as SSE frames
+        
+        Each upstream line is decoded once, only to collect the reply text into
+        parts; the frame itself is forwarded verbatim.
+        
+        Args:
+            payload: The generation request
+            token: Service token for authentication
+            user_id: The ID of the user
+            parts: Receives the text of each chunk
+            
+        Yields:
+            SSE frames, including heartbeats
+            
+        Raises:
+            AIServiceStreamError: If the AI Service rejects the request
+        """
+        async with httpx.AsyncClient() as client:
+            async with client.stream(
+                "POST",
+                f"{settings.AI_SERVICE_URL}/api/v1/lyfbot/generate",
+                json=payload,
+                headers={
+                    "Authorization": f"Bearer {token}",
+                    "X-User-ID": user_id
+                },
+                timeout=60.0  # Longer timeout for streaming
+            ) as response:
+                if response.status_code != 200:
+                    raise AIServiceStreamError(
+                        f"AI Service returned status {response.status_code}: {await response.aread()}"
+                    )
                 
-                return
+                async for line in self._with_heartbeats(response.aiter_lines()):
+                    if line is None:
+                        yield SSE_HEARTBEAT
+                        continue
+                    
+                    # Accept SSE framed upstreams as well as bare NDJSON
+                    if line.startswith("data:"):
+                        line = line[5:].lstrip()
+                    if not line.strip():
+                        continue
+                    
+                    try:
+                        chunk = json.loads(line).get("message_part")
+                    except (json.JSONDecodeError, AttributeError) as e:
+                        logger.error(f"Failed to parse streaming response: {str(e)}")
+                        continue
+                    if chunk:
+                        parts.append(chunk)
+                        
+                    yield self._sse_frame(line)
+    
+    async def _with_heartbeats(
+        self,
+        items: AsyncIterator[str]
+    ) -> AsyncGenerator[Optional[str], None]:
+        """
+        Yield items from an async iterator, or None each time it stays idle
+        for STREAM_HEARTBEAT_INTERVAL seconds
+        
+        The iterator is drained by a separate task, which is cancelled when
+        the consumer goes away (e.g. the client disconnected).
+        
+        Args:
+            items: The async iterator to relay
+            
+        Yields:
+            Items, or None as a heartbeat marker
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=64)
+        finished = object()
+        
+        async def pump():
+            try:
+                async for item in items:
+                    await queue.put(item)
+                await queue.put(finished)
+            except Exception as exc:
+                await queue.put(exc)
+        
+        pump_task = asyncio.create_task(pump())
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), settings.STREAM_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
                 
-            raise Exception(f"Failed to connect to AI Service: {str(exc)}")
+                if item is finished:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            pump_task.cancel()
+    
+    @staticmethod
+    def _sse_frame(data: str, event: Optional[str] = None) -> str:
+        """
+        Format a Server-Sent Events frame
+        
+        Args:
+            data: The frame payload (a single line)
+            event: The event name (None for the default "message" event)
+            
+        Returns:
+            The encoded frame
+        """
+        if event:
+            return f"event: {event}\ndata: {data}\n\n"
+        return f"data: {data}\n\n"
     
     async def analyze_message(
         self,
@@ -306,7 +416,7 @@ class AIService:
         db: AsyncSession
     ) -> Dict[str, Any]:
         """
-        Analyze a message for sentiment, topics, etc.
+        Analyze a message for sentiment, topics, etc. and store the result
         
         Args:
             message_id: The ID of the message
@@ -317,103 +427,80 @@ class AIService:
         Returns:
             Dict containing the analysis results
         """
+        item = {"message_id": message_id, "content": content, "user_id": user_id}
         try:
-            # Get service token for authentication
-            token = await get_service_token()
-            
-            # Call AI Service to analyze the message
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{settings.AI_SERVICE_URL}/api/v1/lyfbot/analyze",
-                    json={
-                        "content": content,
-                        "message_id": message_id,
-                        "user_id": user_id
-                    },
-                    headers={
-                        "Authorization": f"Bearer {token}",
-                        "X-User-ID": user_id
-                    },
-                    timeout=15.0
-                )
-                
-                if response.status_code != 200:
-                    logger.error(f"AI Service analysis failed: {response.text}")
-                    return self._create_minimal_analysis(content)
-                    
-                analysis = response.json()
-                
-                # Store analysis in the database
-                from app.models.message_analysis import MessageAnalysis
-                
-                # TODO: Implement storing analysis in the database
-                
-                return analysis
-                
-        except httpx.RequestError as exc:
+            analyses = await self.analyze_messages([item])
+        except Exception as exc:
             logger.error(f"AI Service analysis request failed: {str(exc)}")
             return self._create_minimal_analysis(content)
+        
+        analysis = analyses.get(message_id)
+        if analysis is None:
+            return self._create_minimal_analysis(content)
+        
+        await self.analysis_service.upsert(db, [(item, analysis)])
+        return analysis
     
-    async def detect_crisis(
-        self,
-        content: str,
-        user_id: str
-    ) -> Tuple[bool, Optional[str]]:
+    async def analyze_messages(self, items: List[Dict[str, Any]]) -> Dict[int, Optional[Dict[str, Any]]]:
         """
-        Detect if a message indicates a crisis situation
+        Analyze many messages with one AI Service request
         
         Args:
-            content: The message content
-            user_id: The ID of the user
+            items: Dicts with message_id, content and user_id
             
         Returns:
-            Tuple of (is_crisis, crisis_type)
+            Analysis by message ID (None where the user hasn't consented);
+            messages the AI Service failed to analyze are left out
+            
+        Raises:
+            Exception: If the AI Service is unavailable or rejects the batch
         """
-        try:
-            # Get service token for authentication
-            token = await get_service_token()
+        # Get service token for authentication
+        token = await get_service_token()
+        
+        async with httpx.AsyncClient() as client:
+            response = await client.post(
+                f"{settings.AI_SERVICE_URL}/api/v1/lyfbot/analyze/batch",
+                json={"messages": items},
+                headers={"Authorization": f"Bearer {token}"},
+                timeout=60.0
+            )
             
-            # Call AI Service to detect crisis
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{settings.AI_SERVICE_URL}/api/v1/lyfbot/detect-crisis",
-                    json={
-                        "content": content,
-                        "user_id": user_id
-                    },
-                    headers={
-                        "Authorization": f"Bearer {token}",
-                        "X-User-ID": user_id
-                    },
-                    timeout=10.0
-                )
-                
-                if response.status_code != 200:
-                    logger.error(f"AI Service crisis detection failed: {response.text}")
-                    return self._fallback_detect_crisis(content)
-                    
-                result = response.json()
-                return result["is_crisis"], result.get("crisis_type")
-                
-        except httpx.RequestError as exc:
-            logger.error(f"AI Service crisis detection request failed: {str(exc)}")
-            return self._fallback_detect_crisis(content)
+        if response.status_code != 200:
+            raise Exception(f"AI Service batch analysis failed: {response.text}")
+            
+        return {
+            result["message_id"]: result.get("analysis")
+            for result in response.json()["results"]
+            if not result.get("error")
+        }
     
-    async def _get_conversation_history(self, conversation_id: int) -> List[Dict[str, Any]]:
+    async def _get_conversation_history(
+        self,
+        conversation_id: int,
+        db: AsyncSession = None,
+        exclude_message_ids: List[int] = None
+    ) -> List[Dict[str, Any]]:
         """
-        Get the conversation history for a conversation
+        Get the latest turns of a conversation
         
         Args:
             conversation_id: The ID of the conversation
+            db: Database session
+            exclude_message_ids: Stored messages to leave out
             
         Returns:
-            List of messages in the conversation
+            List of messages in the conversation, oldest first
         """
-        try:
-            # This would typically query the database for messages
-            # but for now we'll return a stub implementation
-            # TODO: Implement this with the database
+        if db is None:
             return []
+            
+        try:
+            return await self.history_service.get_history(
+                db,
+                conversation_id,
+                exclude_message_ids or ()
+            )
         except Exception as e:
             logger.error(f"Failed to get conversation history: {str(e)}")
             return []
@@ -422,7 +509,7 @@ class AIService:
         self,
         message: str,
         conversation_history: List[Dict[str, Any]],
-        context: Dict[str, Any] = None,
+        context_prompt: Optional[str] = None,
         is_crisis: bool = False,
         crisis_type: str = None
     ) -> str:
@@ -432,124 +519,163 @@ class AIService:
         Args:
             message: The user message
             conversation_history: The conversation history
-            context: Additional context
+            context_prompt: The rendered context
             is_crisis: Whether the message indicates a crisis
             crisis_type: The type of crisis
             
         Returns:
             The generated response
         """
-        try:
-            # Only run this if OpenAI API key is configured
-            if not settings.OPENAI_API_KEY:
-                return "I'm sorry, I'm having trouble connecting to my knowledge base right now. Please try again later."
-                
-            import openai
-            
-            # Configure OpenAI
-            openai.api_key = settings.OPENAI_API_KEY
-            
-            # Build the messages array for the OpenAI API
-            messages = []
-            
-            # Add system message
-            system_message = settings.DEFAULT_SYSTEM_MESSAGE
+        parts = []
+        async for chunk in self._fallback_stream(
+            message,
+            conversation_history,
+            context_prompt,
+            is_crisis,
+            crisis_type
+        ):
+            parts.append(chunk)
+        return "".join(parts)
+    
+    async def _fallback_stream(
+        self,
+        message: str,
+        conversation_history: List[Dict[str, Any]],
+        context_prompt: Optional[str] = None,
+        is_crisis: bool = False,
+        crisis_type: str = None
+    ) -> AsyncGenerator[str, None]:
+        """
+        Stream a response directly from an OpenAI-compatible API if AI Service is unavailable
+        
+        Chunks are yielded as the provider produces them. OPENAI_BASE_URL can
+        point the client at any OpenAI-compatible server, e.g. a local stub.
+        
+        Args:
+            message: The user message
+            conversation_history: The conversation history
+            context_prompt: The rendered context
+            is_crisis: Whether the message indicates a crisis
+            crisis_type: The type of crisis
             
-            # If this is a crisis, update the system message
-            if is_crisis and crisis_type in settings.CRISIS_RESPONSE:
-                system_message += f"\n\nIMPORTANT: The user is expressing {crisis_type} thoughts. "
-                system_message += "Respond with empathy and provide appropriate resources. "
-                system_message += "Do not minimize their feelings or use generic platitudes."
-                
-            messages.append({"role": "system", "content": system_message})
-            
-            # Add conversation history
-            for msg in conversation_history:
-                messages.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
-                })
-                
-            # Add any context as a system message
-            if context:
-                context_message = "Context information:\n"
-                for key, value in context.items():
-                    if isinstance(value, dict):
-                        context_message += f"{key}:\n"
-                        for sub_key, sub_value in value.items():
-                            context_message += f"- {sub_key}: {sub_value}\n"
-                    else:
-                        context_message += f"{key}: {value}\n"
-                        
-                messages.append({"role": "system", "content": context_message})
-                
-            # Add the current message
-            messages.append({"role": "user", "content": message})
+        Yields:
+            Chunks of the generated response
+        """
+        # Only run this if OpenAI API key is configured
+        if not settings.OPENAI_API_KEY:
+            yield "I'm sorry, I'm having trouble connecting to my knowledge base right now. Please try again later."
+            return
             
-            # Call OpenAI API
-            response = await openai.ChatCompletion.acreate(
+        produced = False
+        try:
+            stream = await self._get_openai_client().chat.completions.create(
                 model=settings.OPENAI_MODEL,
-                messages=messages,
+                messages=self._build_fallback_messages(
+                    message,
+                    conversation_history,
+                    context_prompt,
+                    is_crisis,
+                    crisis_type
+                ),
                 temperature=0.7,
-                max_tokens=1000
+                max_tokens=1000,
+                stream=True
             )
             
-            # Get the response text
-            response_text = response.choices[0].message.content
-            
-            # If this is a crisis, append resources
-            if is_crisis and crisis_type in settings.CRISIS_RESPONSE:
-                response_text += "\n\n" + settings.CRISIS_RESPONSE[crisis_type]["message"] + "\n\n"
-                response_text += "Resources:\n"
-                
-                for resource in settings.CRISIS_RESPONSE[crisis_type]["resources"]:
-                    response_text += f"- {resource['name']}: {resource['contact']}\n"
+            async for event in stream:
+                if not event.choices:
+                    continue
+                delta = event.choices[0].delta.content
+                if delta:
+                    produced = True
+                    yield delta
                     
-            return response_text
-            
         except Exception as e:
             logger.error(f"Fallback response generation failed: {str(e)}")
             
+            # Part of the answer was already delivered, don't append a canned one
+            if produced:
+                return
+                
             # Return a generic response
             if is_crisis:
-                return "I notice you might be going through a difficult time. If you're in immediate danger, please call emergency services or a crisis helpline like the National Suicide Prevention Lifeline at 1-800-273-8255. They can provide immediate support."
+                yield "I notice you might be going through a difficult time. If you're in immediate danger, please call emergency services or a crisis helpline like the National Suicide Prevention Lifeline at 1-800-273-8255. They can provide immediate support."
             else:
-                return "I'm sorry, I'm having trouble connecting to my knowledge base right now. Please try again later."
+                yield "I'm sorry, I'm having trouble connecting to my knowledge base right now. Please try again later."
+            return
+            
+        # If this is a crisis, append resources
+        if is_crisis and crisis_type in settings.CRISIS_RESPONSE:
+            resources = "\n\n" + settings.CRISIS_RESPONSE[crisis_type]["message"] + "\n\n"
+            resources += "Resources:\n"
+            
+            for resource in settings.CRISIS_RESPONSE[crisis_type]["resources"]:
+                resources += f"- {resource['name']}: {resource['contact']}\n"
+                
+            yield resources
     
-    def _fallback_detect_crisis(self, content: str) -> Tuple[bool, Optional[str]]:
+    def _build_fallback_messages(
+        self,
+        message: str,
+        conversation_history: List[Dict[str, Any]],
+        context_prompt: Optional[str] = None,
+        is_crisis: bool = False,
+        crisis_type: str = None
+    ) -> List[Dict[str, str]]:
         """
-        Fallback method to detect if a message indicates a crisis using simple keyword matching
+        Build the chat messages for a direct OpenAI call
         
         Args:
-            content: The message content
+            message: The user message
+            conversation_history: The conversation history
+            context_prompt: The rendered context
+            is_crisis: Whether the message indicates a crisis
+            crisis_type: The type of crisis
             
         Returns:
-            Tuple of (is_crisis, crisis_type)
+            The messages array for the chat completions API
         """
-        content_lower = content.lower()
+        messages = []
         
-        # Check for suicide keywords
-        suicide_keywords = [
-            "suicide", "kill myself", "end my life", "don't want to live",
-            "better off dead", "no reason to live", "can't go on"
-        ]
+        # Add system message
+        system_message = settings.DEFAULT_SYSTEM_MESSAGE
         
-        for keyword in suicide_keywords:
-            if keyword in content_lower:
-                return True, "suicide"
-                
-        # Check for self-harm keywords
-        self_harm_keywords = [
-            "self-harm", "cut myself", "cutting myself", "hurt myself",
-            "harming myself", "self harm", "self-harming"
-        ]
+        # If this is a crisis, update the system message
+        if is_crisis and crisis_type in settings.CRISIS_RESPONSE:
+            system_message += f"\n\nIMPORTANT: The user is expressing {crisis_type} thoughts. "
+            system_message += "Respond with empathy and provide appropriate resources. "
+            system_message += "Do not minimize their feelings or use generic platitudes."
+            
+        messages.append({"role": "system", "content": system_message})
         
-        for keyword in self_harm_keywords:
-            if keyword in content_lower:
-                return True, "self_harm"
-                
-        # No crisis detected
-        return False, None
+        # Add conversation history
+        for msg in conversation_history:
+            messages.append({
+                "role": msg["role"],
+                "content": msg["content"]
+            })
+            
+        # Add any context as a system message
+        if context_prompt:
+            messages.append({"role": "system", "content": context_prompt})
+            
+        # Add the current message
+        messages.append({"role": "user", "content": message})
+        
+        return messages
+    
+    @classmethod
+    def _get_openai_client(cls):
+        """Get the shared OpenAI client, creating it on first use"""
+        if cls._openai_client is None:
+            from openai import AsyncOpenAI
+            
+            cls._openai_client = AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_BASE_URL,
+                timeout=settings.OPENAI_TIMEOUT
+            )
+        return cls._openai_client
     
     def _create_minimal_analysis(self, content: str) -> Dict[str, Any]:
         """
@@ -0,0 +1,226 @@
+import json
+import logging
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from cryptography.fernet import Fernet, MultiFernet
+from prometheus_client import Counter
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.conversation import Conversation
+from app.models.conversation_archive import ConversationArchive
+from app.models.message import Message
+
+logger = logging.getLogger(__name__)
+
+ARCHIVED_CONVERSATIONS = Counter(
+    "lyfbot_archived_conversations_total",
+    "Conversations whose messages were moved to cold storage"
+)
+ARCHIVED_MESSAGES = Counter(
+    "lyfbot_archived_messages_total",
+    "Messages moved to cold storage"
+)
+ARCHIVE_READS = Counter(
+    "lyfbot_archive_reads_total",
+    "Archived conversations read back, by reason",
+    ["reason"]
+)
+
+# Message fields kept in an archive segment
+ARCHIVED_FIELDS = (
+    Message.id,
+    Message.user_id,
+    Message.role,
+    Message.content,
+    Message.meta,
+    Message.created_at
+)
+
+class ArchiveService:
+    """
+    Cold storage for the messages of long-inactive conversations
+    
+    The worker's sweep moves the messages of every conversation that has
+    been inactive for ARCHIVE_AFTER_DAYS out of the messages table into a
+    single conversation_archives row: the messages as JSON, zlib-compressed,
+    then encrypted with Fernet. Only the conversation row stays in the hot
+    tables, so their indexes only grow with conversations that are in use.
+    Reading an archived conversation decrypts its segment, and reactivating
+    it moves the messages back.
+    """
+    
+    _cipher = None
+    
+    @classmethod
+    def get_cipher(cls) -> MultiFernet:
+        if cls._cipher is None:
+            cls._cipher = MultiFernet([Fernet(key) for key in settings.ARCHIVE_ENCRYPTION_KEYS])
+        return cls._cipher
+    
+    def seal(self, messages: List[Dict[str, Any]]) -> bytes:
+        """Serialize, compress and encrypt messages into a segment"""
+        raw = json.dumps(messages, separators=(",", ":"), default=str).encode("utf-8")
+        return self.get_cipher().encrypt(zlib.compress(raw, 6))
+    
+    def unseal(self, payload: bytes) -> List[Dict[str, Any]]:
+        """Decrypt and decompress a segment"""
+        return json.loads(zlib.decompress(self.get_cipher().decrypt(payload)))
+    
+    async def archived_messages(self, db: AsyncSession, conversation_id: int) -> List[Message]:
+        """
+        The archived messages of a conversation, oldest first
+        
+        The messages are transient: they aren't added to the session and
+        must not be, or they would be written back to the messages table.
+        """
+        archive = await db.get(ConversationArchive, conversation_id)
+        if archive is None:
+            return []
+        
+        ARCHIVE_READS.labels(reason="read").inc()
+        return [
+            Message(
+                id=entry["id"],
+                conversation_id=conversation_id,
+                user_id=entry["user_id"],
+                role=entry["role"],
+                content=entry["content"],
+                meta=entry["meta"],
+                created_at=datetime.fromisoformat(entry["created_at"]) if entry["created_at"] else None
+            )
+            for entry in self.unseal(archive.payload)
+        ]
+    
+    async def archive_conversation(self, conversation_id: int) -> bool:
+        """
+        Move a conversation's messages to cold storage, in one transaction
+        
+        Returns:
+            False if the conversation is active, already archived or being
+            archived by another worker
+        """
+        async with SessionLocal() as db:
+            result = await db.execute(
+                select(Conversation.user_id)
+                .where(
+                    Conversation.id == conversation_id,
+                    Conversation.is_active.is_(False),
+                    Conversation.archived_at.is_(None)
+                )
+                .with_for_update(skip_locked=True)
+            )
+            user_id = result.scalar_one_or_none()
+            if user_id is None:
+                return False
+            
+            result = await db.execute(
+                select(*ARCHIVED_FIELDS)
+                .where(Message.conversation_id == conversation_id)
+                .order_by(Message.id)
+            )
+            messages = [
+                {**row, "created_at": row["created_at"].isoformat() if row["created_at"] else None}
+                for row in result.mappings()
+            ]
+            
+            db.add(ConversationArchive(
+                conversation_id=conversation_id,
+                user_id=user_id,
+                message_count=len(messages),
+                payload=self.seal(messages)
+            ))
+            await db.execute(delete(Message).where(Message.conversation_id == conversation_id))
+            await db.execute(
+                update(Conversation)
+                .where(Conversation.id == conversation_id)
+                # Archiving shouldn't reorder the user's list
+                .values(archived_at=datetime.now(timezone.utc), updated_at=Conversation.updated_at)
+            )
+            await db.commit()
+        
+        ARCHIVED_CONVERSATIONS.inc()
+        ARCHIVED_MESSAGES.inc(len(messages))
+        return True
+    
+    async def restore_conversation(self, db: AsyncSession, conversation_id: int) -> None:
+        """
+        Move an archived conversation's messages back to the messages table
+        
+        Runs in the caller's transaction; the caller commits.
+        """
+        archive = await db.get(ConversationArchive, conversation_id)
+        if archive is not None:
+            ARCHIVE_READS.labels(reason="restore").inc()
+            messages = self.unseal(archive.payload)
+            if messages:
+                # Original IDs are kept, so analyses and crisis events still refer to them
+                await db.execute(
+                    insert(Message).on_conflict_do_nothing(index_elements=["id"]),
+                    [
+                        {
+                            **entry,
+                            "conversation_id": conversation_id,
+                            "created_at": datetime.fromisoformat(entry["created_at"]) if entry["created_at"] else None
+                        }
+                        for entry in messages
+                    ]
+                )
+            await db.delete(archive)
+        
+        await db.execute(
+            update(Conversation)
+            .where(Conversation.id == conversation_id)
+            .values(archived_at=None, updated_at=Conversation.updated_at)
+        )
+    
+    async def sweep(self) -> int:
+        """
+        Archive conversations inactive for ARCHIVE_AFTER_DAYS, in batches
+        
+        Each conversation is archived in its own short transaction.
+        
+        Returns:
+            The number of conversations archived
+        """
+        if not settings.ARCHIVE_ENCRYPTION_KEYS:
+            return 0
+        
+        cutoff = datetime.now(timezone.utc) - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+        archived = 0
+        
+        while True:
+            async with SessionLocal() as db:
+                result = await db.execute(
+                    select(Conversation.id)
+                    .where(
+                        Conversation.is_active.is_(False),
+                        Conversation.archived_at.is_(None),
+                        Conversation.updated_at < cutoff
+                    )
+                    .order_by(Conversation.updated_at)
+                    .limit(settings.ARCHIVE_SWEEP_BATCH)
+                )
+                conversation_ids = result.scalars().all()
+            
+            progressed = 0
+            for conversation_id in conversation_ids:
+                try:
+                    if await self.archive_conversation(conversation_id):
+                        progressed += 1
+                except Exception as e:
+                    logger.error(f"Failed to archive conversation {conversation_id}: {str(e)}")
+            archived += progressed
+            
+            # Stop when done, or when the rest is locked or failing
+            if len(conversation_ids) < settings.ARCHIVE_SWEEP_BATCH or not progressed:
+                break
+        
+        if archived:
+            logger.info(f"Archived {archived} conversations inactive for {settings.ARCHIVE_AFTER_DAYS} days")
+        return archived
@@ -0,0 +1,250 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, Optional, Set
+
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.context_service import ContextService
+from app.services.message_pipeline import MessagePipeline
+from app.services.rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+class ChatConnection:
+    """
+    One authenticated WebSocket chat connection
+    
+    The user is validated once when the connection opens, and conversations
+    whose ownership has been checked are remembered for the rest of the
+    connection. Several conversations can be active at once: every client
+    frame carries a request_id, and every server frame echoes it.
+    
+    Client frames:
+        
+        {"type": "message", "request_id": "r1", "conversation_id": 12, "content": "...", "context": {}}
+        {"type": "cancel", "request_id": "r1"}
+        {"type": "ping"}
+    
+    Server frames:
+        
+        {"type": "accepted", "request_id": "r1", "conversation_id": 12, "message_id": 34}
+        {"type": "message", "request_id": "r1", "data": {"message_part": "...", ...}}
+        {"type": "done", "request_id": "r1", "data": {"message_id": 35, ...}}
+        {"type": "error", "request_id": "r1", "data": {"error": "..."}}
+        {"type": "pong"}
+    
+    Outgoing frames go through a bounded queue with a single writer, so a slow
+    client pauses generation (and the upstream read) instead of growing memory.
+    """
+    
+    def __init__(self, websocket: WebSocket, user: Dict[str, Any], pipeline: MessagePipeline):
+        self.websocket = websocket
+        self.user = user
+        self.user_id = user["id"]
+        self.pipeline = pipeline
+        self.rate_limiter = RateLimiter()
+        self.expires_at = time.monotonic() + settings.WS_SESSION_TTL
+        
+        # Conversations verified to belong to the user on this connection
+        self.conversation_ids: Set[int] = set()
+        self._conversation_locks: Dict[int, asyncio.Lock] = {}
+        
+        self._outbox: asyncio.Queue = asyncio.Queue(maxsize=settings.WS_SEND_QUEUE_SIZE)
+        self._turns: Dict[str, asyncio.Task] = {}
+        self._turn_slots = asyncio.Semaphore(settings.WS_MAX_CONCURRENT_TURNS)
+    
+    async def serve(self) -> None:
+        """Handle client frames until the connection closes"""
+        writer = asyncio.create_task(self._write())
+        ContextService.prewarm(self.user_id, trigger="connection")
+        try:
+            while True:
+                raw = await self.websocket.receive_text()
+                
+                # Make the client re-authenticate periodically
+                if time.monotonic() > self.expires_at:
+                    await self.send({"type": "error", "data": {"error": "Session expired"}})
+                    await self._outbox.join()
+                    await self.websocket.close(code=1008)
+                    return
+                
+                await self._dispatch(raw)
+        
+        except WebSocketDisconnect:
+            pass
+        finally:
+            for task in list(self._turns.values()):
+                task.cancel()
+            writer.cancel()
+    
+    async def send(self, frame: Any) -> None:
+        """
+        Queue a frame for the client, waiting while the queue is full
+        
+        Args:
+            frame: A JSON-serializable frame or an already encoded one
+        """
+        await self._outbox.put(frame if isinstance(frame, str) else json.dumps(frame))
+    
+    async def _write(self) -> None:
+        """Send queued frames in order"""
+        while True:
+            text = await self._outbox.get()
+            try:
+                await self.websocket.send_text(text)
+            except Exception as e:
+                logger.debug(f"WebSocket send failed: {str(e)}")
+                return
+            finally:
+                self._outbox.task_done()
+    
+    async def _dispatch(self, raw: str) -> None:
+        """Route a client frame"""
+        try:
+            frame = json.loads(raw)
+        except json.JSONDecodeError:
+            await self.send({"type": "error", "data": {"error": "Malformed frame"}})
+            return
+        
+        frame_type = frame.get("type")
+        request_id = frame.get("request_id")
+        
+        if frame_type == "ping":
+            await self.send({"type": "pong"})
+        
+        elif frame_type == "cancel":
+            task = self._turns.get(request_id)
+            if task:
+                task.cancel()
+        
+        elif frame_type == "message":
+            if not request_id or request_id in self._turns or not frame.get("content"):
+                await self.send({
+                    "type": "error",
+                    "request_id": request_id,
+                    "data": {"error": "A unique request_id and content are required"}
+                })
+                return
+            
+            task = asyncio.create_task(self._run_turn(
+                request_id,
+                content=frame["content"],
+                conversation_id=frame.get("conversation_id"),
+                context=frame.get("context")
+            ))
+            self._turns[request_id] = task
+            task.add_done_callback(lambda _: self._turns.pop(request_id, None))
+        
+        else:
+            await self.send({
+                "type": "error",
+                "request_id": request_id,
+                "data": {"error": f"Unknown frame type: {frame_type}"}
+            })
+    
+    async def _run_turn(
+        self,
+        request_id: str,
+        content: str,
+        conversation_id: Optional[int] = None,
+        context: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Answer one message, streaming the reply as frames"""
+        # Turns in one conversation run in order so each sees the previous reply
+        lock = self._conversation_locks.setdefault(conversation_id, asyncio.Lock()) if conversation_id else asyncio.Lock()
+        
+        try:
+            # Same budget as /messages/stream; over the limit the turn gets an error frame
+            await self.rate_limiter.check(self.user_id, "streams", content)
+            
+            async with lock, self._turn_slots:
+                # Concurrent turns can't share a session
+                async with SessionLocal() as db:
+                    turn = await self.pipeline.prepare(
+                        db,
+                        user_id=self.user_id,
+                        content=content,
+                        conversation_id=conversation_id,
+                        additional_context=context,
+                        verified_conversation_ids=self.conversation_ids
+                    )
+                    
+                    await self.send({
+                        "type": "accepted",
+                        "request_id": request_id,
+                        "conversation_id": turn.conversation_id,
+                        "message_id": turn.user_message.id
+                    })
+                    
+                    async for frame in self.pipeline.ai_service.stream_response(
+                        message=content,
+                        conversation_id=turn.conversation_id,
+                        user_id=self.user_id,
+                        context=turn.context,
+                        is_crisis=turn.is_crisis,
+                        crisis_type=turn.crisis_type,
+                        db=db,
+                        exclude_message_ids=[turn.user_message.id]
+                    ):
+                        relayed = self._relay_frame(request_id, frame)
+                        if relayed:
+                            await self.send(relayed)
+                    
+                    # Same follow-ups as the REST endpoints
+                    await self.pipeline.defer_followups(
+                        turn,
+                        user_id=self.user_id,
+                        content=content
+                    )
+        
+        except asyncio.CancelledError:
+            self._send_nowait({"type": "error", "request_id": request_id, "data": {"error": "Cancelled"}})
+            raise
+        except HTTPException as e:
+            await self.send({"type": "error", "request_id": request_id, "data": {"error": e.detail}})
+        except Exception as e:
+            logger.error(f"WebSocket turn {request_id} failed: {str(e)}")
+            await self.send({
+                "type": "error",
+                "request_id": request_id,
+                "data": {"error": "Failed to process message"}
+            })
+    
+    def _send_nowait(self, frame: Dict[str, Any]) -> None:
+        """Queue a frame if there is room (used while cancelling)"""
+        try:
+            self._outbox.put_nowait(json.dumps(frame))
+        except asyncio.QueueFull:
+            pass
+    
+    @staticmethod
+    def _relay_frame(request_id: str, frame: str) -> Optional[str]:
+        """
+        Wrap an SSE frame from the AI service as a WebSocket frame
+        
+        The JSON payload is embedded as-is rather than decoded and re-encoded.
+        Heartbeat comments are dropped; WebSocket has its own keep-alive.
+        
+        Args:
+            request_id: The request the frame belongs to
+            frame: The SSE frame
+        
+        Returns:
+            The WebSocket frame, or None for frames without data
+        """
+        event = "message"
+        data = None
+        for line in frame.splitlines():
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: "):
+                data = line[6:]
+        
+        if data is None:
+            return None
+        
+        return f'{{"type": {json.dumps(event)}, "request_id": {json.dumps(request_id)}, "data": {data}}}'
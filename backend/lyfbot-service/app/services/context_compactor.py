@@ -0,0 +1,161 @@
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from prometheus_client import Counter
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_PROMPT_LOOKUPS = Counter(
+    "lyfbot_context_prompt_lookups_total",
+    "Rendered context prompt lookups by cache outcome",
+    ["outcome"]
+)
+
+# Context fields by how much they help a reply, most useful first. Fields not
+# listed (e.g. context sent by the client) follow in the order they were given.
+FIELD_PRIORITIES: List[Tuple[str, str]] = [
+    ("user_profile", "name"),
+    ("user_profile", "mental_health_goals"),
+    ("journal_insights", "mood_trend"),
+    ("journal_insights", "common_emotions"),
+    ("journal_insights", "recent_themes"),
+    ("user_profile", "preferences"),
+    ("recommendations", "activities"),
+    ("user_profile", "interests"),
+    ("journal_insights", "journaling_frequency"),
+    ("user_profile", "joined_at"),
+]
+
+class ContextCompactor:
+    """
+    Renders gathered context into a prompt fragment within a token budget
+
+    Fields are added in FIELD_PRIORITIES order until CONTEXT_PROMPT_TOKEN_BUDGET
+    is used up; a list that doesn't fit loses items from the end, other
+    values are cut short. Rendered fragments are cached by context version
+    (see ContextService.context_version), so turns that reuse cached context
+    don't render it again.
+    """
+
+    # Context version -> rendered fragment, least recently used first
+    _cache: "OrderedDict[Hashable, str]" = OrderedDict()
+
+    HEADER = "Context information:"
+
+    def render(self, context: Optional[Dict[str, Any]], version: Optional[Hashable] = None) -> Optional[str]:
+        """
+        The prompt fragment for a context
+
+        Args:
+            context: Gathered context
+            version: Identifies the context; None renders without caching
+
+        Returns:
+            The fragment, or None if there is nothing to include
+        """
+        if not context:
+            return None
+
+        if version is not None:
+            fragment = self._cache.get(version)
+            if fragment is not None:
+                self._cache.move_to_end(version)
+                CONTEXT_PROMPT_LOOKUPS.labels(outcome="hit").inc()
+                return fragment or None
+
+        fragment = self.compact(context, settings.CONTEXT_PROMPT_TOKEN_BUDGET)
+
+        if version is None:
+            CONTEXT_PROMPT_LOOKUPS.labels(outcome="unversioned").inc()
+        else:
+            CONTEXT_PROMPT_LOOKUPS.labels(outcome="miss").inc()
+            # An empty fragment is cached too, as ""
+            self._cache[version] = fragment
+            while len(self._cache) > settings.CONTEXT_PROMPT_CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+        return fragment or None
+
+    def compact(self, context: Dict[str, Any], budget: int) -> str:
+        """Rank and trim context fields to a token budget and render them"""
+        remaining = budget - self.estimate_tokens(self.HEADER)
+        selected: Dict[str, List[str]] = {}
+
+        for section, field, value in self._ranked_fields(context):
+            if remaining <= 0:
+                break
+            label = f"{field}: " if field else ""
+            line = self._fit(label, value, remaining)
+            if line is None:
+                continue
+            selected.setdefault(section, []).append(line)
+            remaining -= self.estimate_tokens(line)
+
+        if not selected:
+            return ""
+
+        # Sections keep the order they were gathered in, whatever order their fields were picked
+        lines = [self.HEADER]
+        for section in context:
+            if section not in selected:
+                continue
+            if len(selected[section]) == 1 and not isinstance(context[section], dict):
+                lines.append(f"{section}: {selected[section][0]}")
+                continue
+            lines.append(f"{section}:")
+            lines.extend(f"- {line}" for line in selected[section])
+        return "\n".join(lines)
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """Rough token count (about four characters per token for English)"""
+        return len(text) // 4 + 1
+
+    @staticmethod
+    def _ranked_fields(context: Dict[str, Any]) -> List[Tuple[str, str, Any]]:
+        fields = []
+        for section, value in context.items():
+            if isinstance(value, dict):
+                fields.extend((section, field, field_value) for field, field_value in value.items())
+            else:
+                fields.append((section, "", value))
+
+        rank = {key: index for index, key in enumerate(FIELD_PRIORITIES)}
+        ranked = sorted(
+            enumerate(fields),
+            key=lambda item: (rank.get((item[1][0], item[1][1]), len(rank)), item[0])
+        )
+        return [field for _, field in ranked if field[2] not in (None, "", [], {})]
+
+    def _fit(self, label: str, value: Any, budget: int) -> Optional[str]:
+        """Render a field in at most budget tokens, or None if nothing useful fits"""
+        if isinstance(value, list):
+            items = [self._format(item) for item in value]
+            while items:
+                line = label + ", ".join(items)
+                if self.estimate_tokens(line) <= budget:
+                    return line
+                items.pop()
+            return None
+
+        line = label + self._format(value)
+        if self.estimate_tokens(line) <= budget:
+            return line
+
+        # Cut long text to what fits, if that leaves anything after the label
+        cut = budget * 4 - 4
+        if cut <= len(label) + 3:
+            return None
+        return line[:cut].rstrip() + "..."
+
+    @staticmethod
+    def _format(value: Any) -> str:
+        if isinstance(value, dict):
+            # e.g. recommended activities
+            if "title" in value:
+                return str(value["title"])
+            return "; ".join(f"{key}: {item}" for key, item in value.items() if item not in (None, "", [], {}))
+        return str(value)
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import logging
+from typing import Optional
+
+from app.core.config import settings
+from app.db.redis import redis_client
+from app.services.context_service import ContextService
+
+logger = logging.getLogger(__name__)
+
+class ContextEventListener:
+    """
+    Subscribes to context change events published by other services and
+    invalidates the affected users' cached context.
+
+    Events are small JSON documents on the CONTEXT_EVENTS_CHANNEL Redis channel:
+
+        {"source": "journal", "event": "journal.created", "user_id": "..."}
+
+    A missing user_id means the change affects every user (e.g. a new
+    recommendation in the catalog).
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start listening in the background"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop listening"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        ContextService.set_events_connected(False)
+
+    async def _run(self) -> None:
+        """Keep a subscription open, reconnecting with backoff on failure"""
+        backoff = 1
+
+        while True:
+            pubsub = redis_client.pubsub()
+            try:
+                await pubsub.subscribe(settings.CONTEXT_EVENTS_CHANNEL)
+
+                # Events may have been missed while disconnected
+                ContextService.clear()
+                ContextService.set_events_connected(True)
+                backoff = 1
+                logger.info(f"Subscribed to context events on {settings.CONTEXT_EVENTS_CHANNEL}")
+
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self.handle_event(message["data"])
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Context event subscription failed: {str(e)}")
+            finally:
+                ContextService.set_events_connected(False)
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
+
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def handle_event(self, raw_event: str) -> None:
+        """
+        Apply a single change event to the context cache
+
+        Args:
+            raw_event: The JSON encoded event
+        """
+        try:
+            event = json.loads(raw_event)
+        except (TypeError, json.JSONDecodeError):
+            logger.warning(f"Ignoring malformed context event: {raw_event!r}")
+            return
+
+        source = event.get("source")
+        if source not in ContextService.SOURCE_SECTIONS:
+            logger.debug(f"Ignoring context event from unknown source: {source}")
+            return
+
+        ContextService.invalidate(user_id=event.get("user_id"), source=source)
@@ -1,20 +1,69 @@
 import httpx
 import logging
 import json
-from typing import Dict, Any, Optional
+import asyncio
+from typing import Dict, Any, Optional, Set, Tuple
 from datetime import datetime, timedelta
 
+from prometheus_client import Counter
+
 from app.core.config import settings
 from app.core.security import get_service_token
+from app.db.redis import redis_client
 
 logger = logging.getLogger(__name__)
 
+CONTEXT_LOOKUPS = Counter(
+    "lyfbot_context_lookups_total",
+    "Context lookups by how much of the context was cached",
+    ["outcome"]
+)
+CONTEXT_PREWARMS = Counter(
+    "lyfbot_context_prewarms_total",
+    "Background context loads started, by trigger",
+    ["trigger"]
+)
+
+# One set of user IDs per day and hour (UTC) that expires after the
+# prewarm window, so activity only counts for CONTEXT_PREWARM_WINDOW_DAYS
+ACTIVITY_KEY_PREFIX = "lyfbot:context:active-hours"
+
 class ContextService:
     """Service for gathering context from other services for personalized responses"""
     
-    # Cache for context data to avoid excessive API calls
-    _context_cache = {}
-    _cache_ttl = 300  # 5 minutes in seconds
+    # Per-user cache of context sections, shared by every instance of the service.
+    # Entries are invalidated by change events from the owning services (see
+    # app/services/context_events.py), so the TTL is only a safety net.
+    _context_cache: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    
+    # Bumped on every invalidation so in-flight fetches don't store stale data;
+    # _epoch for invalidations of every user, including users not cached yet
+    _generations: Dict[str, int] = {}
+    _epoch: int = 0
+    
+    # Whether the change-event subscription is currently live
+    _events_connected: bool = False
+    
+    # Sections gathered from other services
+    SECTIONS = ("user_profile", "journal_insights", "recommendations")
+    
+    # Context sections owned by each service that publishes change events
+    SOURCE_SECTIONS = {
+        "journal": ["journal_insights"],
+        "recommender": ["recommendations"],
+    }
+    
+    # Sections with an event for every change, which can be cached for
+    # CONTEXT_CACHE_TTL. The auth service publishes nothing, and the
+    # recommender only announces catalog changes, not changes to a user's
+    # recommendations, so the other sections keep CONTEXT_CACHE_FALLBACK_TTL.
+    EVENT_SECTIONS = ("journal_insights",)
+    
+    # Background context loads by user, so a turn that arrives while one is
+    # running waits for it instead of fetching the same sections again
+    _prewarms: Dict[str, asyncio.Task] = {}
+    _background: Set[asyncio.Task] = set()
+    _scheduler: Optional[asyncio.Task] = None
     
     async def gather_context(
         self,
@@ -26,6 +75,9 @@ class ContextService:
         """
         Gather context from various services to personalize LyfBot responses
         
+        Only sections that are missing or expired are fetched; the rest are
+        served from the cache.
+        
         Args:
             user_id: The ID of the user
             conversation_id: The ID of the conversation (optional)
@@ -35,60 +87,305 @@ class ContextService:
         Returns:
             Dict containing context information
         """
-        cache_key = f"{user_id}:{conversation_id or 'none'}"
+        prewarm = self._prewarms.get(user_id)
+        if prewarm is not None and not prewarm.done() and not force_reload:
+            CONTEXT_LOOKUPS.labels(outcome="prewarm_wait").inc()
+            await asyncio.wait([prewarm])
+        
+        context = await self._load(user_id, force_reload)
         
-        # Check cache first if not forcing reload
-        if not force_reload and cache_key in self._context_cache:
-            cached_data = self._context_cache[cache_key]
-            if datetime.now().timestamp() - cached_data["timestamp"] < self._cache_ttl:
-                # Add additional context if provided
-                if additional_context:
-                    merged_context = cached_data["context"].copy()
-                    merged_context.update(additional_context)
-                    return merged_context
-                return cached_data["context"]
+        # Add any additional context provided by the client
+        if additional_context:
+            context.update(additional_context)
+        
+        return context
+    
+    async def _load(self, user_id: str, force_reload: bool = False) -> Dict[str, Any]:
+        """Serve the user's context sections, fetching the missing or expired ones"""
+        loaders = {
+            "user_profile": self._get_user_profile,
+            "journal_insights": self._get_journal_insights,
+            "recommendations": self._get_recommendations,
+        }
+        
+        cached_sections = self._context_cache.get(user_id, {})
+        now = datetime.now().timestamp()
+        
+        if force_reload:
+            stale = list(loaders)
+        else:
+            stale = [
+                name for name in loaders
+                if name not in cached_sections
+                or now - cached_sections[name]["timestamp"] >= self._cache_ttl(name)
+            ]
         
         # Initialize context dictionary
-        context = {}
+        context = {
+            name: cached_sections[name]["data"]
+            for name in loaders
+            if name not in stale
+        }
         
-        # Get token for service-to-service communication
-        token = await get_service_token()
+        CONTEXT_LOOKUPS.labels(
+            outcome="miss" if len(stale) == len(loaders) else "partial" if stale else "hit"
+        ).inc()
         
-        # Gather user profile data
-        try:
-            user_profile = await self._get_user_profile(user_id, token)
-            context["user_profile"] = user_profile
-        except Exception as e:
-            logger.error(f"Failed to get user profile: {str(e)}")
-            context["user_profile"] = {}
+        if stale:
+            generation = self._generation(user_id)
+            
+            # Get token for service-to-service communication
+            token = await get_service_token()
+            
+            results = await asyncio.gather(
+                *[loaders[name](user_id, token) for name in stale],
+                return_exceptions=True
+            )
             
-        # Gather journal insights if available
+            # A failed section is served empty for this turn and not cached
+            fetched = {}
+            for name, result in zip(stale, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Failed to get {name}: {str(result)}")
+                    context[name] = {}
+                    continue
+                context[name] = result
+                fetched[name] = result
+            
+            # Cache the fetched sections unless the user was invalidated meanwhile
+            if fetched and self._generation(user_id) == generation:
+                self._store_sections(user_id, fetched, now)
+        
+        return context
+    
+    @classmethod
+    def prewarm(cls, user_id: str, trigger: str) -> Optional[asyncio.Task]:
+        """
+        Load a user's context in the background ahead of their first message
+        
+        Args:
+            user_id: The ID of the user
+            trigger: What prompted the load, for metrics ("conversation",
+                "connection", "request" or "schedule")
+        
+        Returns:
+            The loading task, or None if prewarming is disabled
+        """
+        if not settings.CONTEXT_PREWARM_ENABLED:
+            return None
+        
+        task = cls._prewarms.get(user_id)
+        if task is not None and not task.done():
+            return task
+        
+        CONTEXT_PREWARMS.labels(trigger=trigger).inc()
+        task = asyncio.create_task(cls._prewarm(user_id))
+        cls._prewarms[user_id] = task
+        task.add_done_callback(
+            lambda done: cls._prewarms.pop(user_id) if cls._prewarms.get(user_id) is done else None
+        )
+        return task
+    
+    @classmethod
+    async def _prewarm(cls, user_id: str) -> None:
         try:
-            journal_insights = await self._get_journal_insights(user_id, token)
-            context["journal_insights"] = journal_insights
+            await cls()._load(user_id)
         except Exception as e:
-            logger.error(f"Failed to get journal insights: {str(e)}")
-            context["journal_insights"] = {}
-            
-        # Gather recommended activities if available
+            logger.warning(f"Failed to prewarm context for user {user_id}: {str(e)}")
+    
+    @classmethod
+    def record_activity(cls, user_id: str) -> None:
+        """
+        Count the current hour (UTC) as one the user chats in
+        
+        Each hour counts once per day, and only for CONTEXT_PREWARM_WINDOW_DAYS.
+        The scheduled prewarm reads these counts; recording happens in the
+        background and never delays a turn.
+        """
+        if not settings.CONTEXT_PREWARM_ENABLED:
+            return
+        
+        task = asyncio.create_task(cls._record_activity(user_id, datetime.utcnow()))
+        cls._background.add(task)
+        task.add_done_callback(cls._background.discard)
+    
+    @classmethod
+    async def _record_activity(cls, user_id: str, now: datetime) -> None:
+        key = cls._activity_key(now)
         try:
-            recommendations = await self._get_recommendations(user_id, token)
-            context["recommendations"] = recommendations
+            async with redis_client.pipeline(transaction=True) as pipe:
+                pipe.sadd(key, user_id)
+                pipe.expire(key, (settings.CONTEXT_PREWARM_WINDOW_DAYS + 1) * 86400)
+                await pipe.execute()
         except Exception as e:
-            logger.error(f"Failed to get recommendations: {str(e)}")
-            context["recommendations"] = {}
+            logger.warning(f"Failed to record chat activity: {str(e)}")
+    
+    @classmethod
+    def start(cls) -> None:
+        """
+        Start the scheduled prewarm
+        
+        Every CONTEXT_PREWARM_INTERVAL seconds, context is loaded for the
+        users who have chatted in the hour starting CONTEXT_PREWARM_LEAD
+        seconds from now on at least CONTEXT_PREWARM_MIN_DAYS of the last
+        CONTEXT_PREWARM_WINDOW_DAYS days. The cache is per process, so every
+        API process runs its own schedule.
+        """
+        if settings.CONTEXT_PREWARM_ENABLED and (cls._scheduler is None or cls._scheduler.done()):
+            cls._scheduler = asyncio.create_task(cls._run_schedule())
+    
+    @classmethod
+    async def stop(cls) -> None:
+        tasks = list(cls._prewarms.values()) + list(cls._background)
+        if cls._scheduler:
+            tasks.append(cls._scheduler)
+            cls._scheduler = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    @classmethod
+    async def _run_schedule(cls) -> None:
+        while True:
+            try:
+                await cls.prewarm_usual_users()
+            except Exception as e:
+                logger.error(f"Scheduled context prewarm failed: {str(e)}")
+            await asyncio.sleep(settings.CONTEXT_PREWARM_INTERVAL)
+    
+    @classmethod
+    async def prewarm_usual_users(cls) -> int:
+        """
+        Load context for the users who usually chat in the coming hour
+        
+        Returns:
+            The number of users whose context was loaded
+        """
+        target = datetime.utcnow() + timedelta(seconds=settings.CONTEXT_PREWARM_LEAD)
+        days = [
+            cls._activity_key(target - timedelta(days=day))
+            for day in range(1, settings.CONTEXT_PREWARM_WINDOW_DAYS + 1)
+        ]
+        # Each user's score in the union is the number of days they chatted in that hour
+        union = f"{cls._activity_key(target)}:days"
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.zunionstore(union, days)
+            pipe.expire(union, settings.CONTEXT_PREWARM_INTERVAL)
+            pipe.zrevrangebyscore(
+                union,
+                "+inf",
+                settings.CONTEXT_PREWARM_MIN_DAYS,
+                start=0,
+                num=settings.CONTEXT_PREWARM_MAX_USERS
+            )
+            _, _, user_ids = await pipe.execute()
+        
+        slots = asyncio.Semaphore(settings.CONTEXT_PREWARM_CONCURRENCY)
+        
+        async def warm(user_id: str) -> None:
+            async with slots:
+                task = cls.prewarm(user_id, trigger="schedule")
+                if task is not None:
+                    await asyncio.wait([task])
+        
+        await asyncio.gather(*(warm(user_id) for user_id in user_ids))
+        return len(user_ids)
+    
+    @staticmethod
+    def _activity_key(moment: datetime) -> str:
+        return f"{ACTIVITY_KEY_PREFIX}:{moment:%Y%m%d}:{moment.hour}"
+    
+    @classmethod
+    def context_version(cls, user_id: str, context: Dict[str, Any]) -> Optional[Tuple]:
+        """
+        Identifies gathered context, for caching what is rendered from it
+        
+        Changes whenever a section is fetched again or invalidated. None if
+        any section of the context isn't the cached one (e.g. after a failed
+        fetch), so such context is never cached.
+        """
+        cached_sections = cls._context_cache.get(user_id)
+        if not cached_sections:
+            return None
+        
+        version = [user_id, *cls._generation(user_id)]
+        additional = {}
+        for name, value in context.items():
+            entry = cached_sections.get(name)
+            if entry is not None and entry["data"] is value:
+                version.append((name, entry["timestamp"]))
+            elif name in cls.SECTIONS:
+                return None
+            else:
+                additional[name] = value
+        
+        if additional:
+            version.append(json.dumps(additional, sort_keys=True, default=str))
+        return tuple(version)
+    
+    @classmethod
+    def invalidate(cls, user_id: Optional[str] = None, source: Optional[str] = None) -> None:
+        """
+        Drop cached context after a change event
+        
+        Args:
+            user_id: The affected user, or None for every user
+            source: The service that changed, or None to drop every section
+        """
+        sections = cls.SOURCE_SECTIONS.get(source) if source else None
+        if user_id:
+            user_ids = [user_id]
+        else:
+            cls._epoch += 1
+            user_ids = list(cls._context_cache)
+        
+        for uid in user_ids:
+            cls._generations[uid] = cls._generations.get(uid, 0) + 1
             
-        # Add any additional context provided by the client
-        if additional_context:
-            context.update(additional_context)
+            if sections is None:
+                cls._context_cache.pop(uid, None)
+                continue
             
-        # Cache the context
-        self._context_cache[cache_key] = {
-            "context": context,
-            "timestamp": datetime.now().timestamp()
-        }
+            cached_sections = cls._context_cache.get(uid)
+            if cached_sections:
+                for name in sections:
+                    cached_sections.pop(name, None)
+    
+    @classmethod
+    def clear(cls) -> None:
+        """Drop the whole context cache, e.g. after missing change events"""
+        cls._context_cache.clear()
+        cls._generations.clear()
+        cls._epoch += 1
+    
+    @classmethod
+    def set_events_connected(cls, connected: bool) -> None:
+        """Record whether change events are being received"""
+        cls._events_connected = connected
+    
+    @classmethod
+    def _generation(cls, user_id: str) -> Tuple[int, int]:
+        return cls._epoch, cls._generations.get(user_id, 0)
+    
+    @classmethod
+    def _cache_ttl(cls, section: str) -> int:
+        """Long TTL for sections kept fresh by change events while they flow, short TTL otherwise"""
+        if cls._events_connected and section in cls.EVENT_SECTIONS:
+            return settings.CONTEXT_CACHE_TTL
+        return settings.CONTEXT_CACHE_FALLBACK_TTL
+    
+    @classmethod
+    def _store_sections(cls, user_id: str, sections: Dict[str, Any], timestamp: float) -> None:
+        """Store fetched sections, evicting the least recently stored users"""
+        cached_sections = cls._context_cache.pop(user_id, {})
+        for name, data in sections.items():
+            cached_sections[name] = {"data": data, "timestamp": timestamp}
+        cls._context_cache[user_id] = cached_sections
         
-        return context
+        while len(cls._context_cache) > settings.CONTEXT_CACHE_MAX_USERS:
+            evicted = next(iter(cls._context_cache))
+            cls._context_cache.pop(evicted)
+            cls._generations.pop(evicted, None)
     
     async def _get_user_profile(self, user_id: str, token: str) -> Dict[str, Any]:
         """
@@ -100,6 +397,9 @@ class ContextService:
             
         Returns:
             Dict containing user profile data
+        
+        Raises:
+            httpx.HTTPError: If the request fails, so the failure isn't cached
         """
         try:
             async with httpx.AsyncClient() as client:
@@ -113,7 +413,7 @@ class ContextService:
                 
                 if response.status_code != 200:
                     logger.error(f"Failed to get user profile: {response.text}")
-                    return {}
+                response.raise_for_status()
                     
                 profile = response.json()
                 
@@ -130,7 +430,7 @@ class ContextService:
                 
         except httpx.RequestError as e:
             logger.error(f"Request to Auth Service failed: {str(e)}")
-            return {}
+            raise
     
     async def _get_journal_insights(self, user_id: str, token: str) -> Dict[str, Any]:
         """
@@ -142,6 +442,9 @@ class ContextService:
             
         Returns:
             Dict containing journal insights
+        
+        Raises:
+            httpx.HTTPError: If the request fails, so the failure isn't cached
         """
         try:
             async with httpx.AsyncClient() as client:
@@ -155,7 +458,7 @@ class ContextService:
                 
                 if response.status_code != 200:
                     logger.error(f"Failed to get journal insights: {response.text}")
-                    return {}
+                response.raise_for_status()
                     
                 insights = response.json()
                 
@@ -171,7 +474,7 @@ class ContextService:
                 
         except httpx.RequestError as e:
             logger.error(f"Request to Journal Service failed: {str(e)}")
-            return {}
+            raise
     
     async def _get_recommendations(self, user_id: str, token: str) -> Dict[str, Any]:
         """
@@ -183,6 +486,9 @@ class ContextService:
             
         Returns:
             Dict containing recommendations
+        
+        Raises:
+            httpx.HTTPError: If the request fails, so the failure isn't cached
         """
         try:
             async with httpx.AsyncClient() as client:
@@ -201,7 +507,7 @@ class ContextService:
                 
                 if response.status_code != 200:
                     logger.error(f"Failed to get recommendations: {response.text}")
-                    return {}
+                response.raise_for_status()
                     
                 recommendations = response.json()
                 
@@ -220,4 +526,4 @@ class ContextService:
                 
         except httpx.RequestError as e:
             logger.error(f"Request to Recommender Service failed: {str(e)}")
-            return {} 
\ No newline at end of file
+            raise 
\ No newline at end of file
@@ -0,0 +1,420 @@
+import base64
+import html
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Update, case, func, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.config import settings
+from app.models.conversation import Conversation
+from app.models.message import Message
+from app.models.message_analysis import MessageAnalysis
+from app.services.archive_service import ArchiveService
+
+logger = logging.getLogger(__name__)
+
+# What the conversation list returns; all of it is in ix_conversations_user_updated
+SUMMARY_COLUMNS = (
+    Conversation.id,
+    Conversation.user_id,
+    Conversation.title,
+    Conversation.is_active,
+    Conversation.message_count,
+    Conversation.last_message_at,
+    Conversation.last_message_preview,
+    Conversation.last_sentiment,
+    Conversation.created_at,
+    Conversation.updated_at
+)
+
+# Text search configuration of messages.search_vector
+SEARCH_CONFIG = "english"
+
+# ts_headline's highlight markers: control characters, removed from the content
+# first, so the snippet can be HTML-escaped before they become <mark> tags
+SNIPPET_START = "\x02"
+SNIPPET_STOP = "\x03"
+
+class InvalidCursor(ValueError):
+    """A list cursor that wasn't issued by get_conversations"""
+
+class ConversationService:
+    """
+    Service for managing LyfBot conversations
+    
+    Each conversation row carries a summary of its messages (count, last
+    message time and preview, last sentiment) that is refreshed whenever
+    messages or analyses are written, so listing conversations never reads
+    the messages table. Messages of long-inactive conversations are kept
+    in cold storage (see ArchiveService) and read back transparently.
+    """
+    
+    def __init__(self):
+        self.archive_service = ArchiveService()
+    
+    async def create_conversation(
+        self,
+        db: AsyncSession,
+        user_id: str,
+        title: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        initial_message: Optional[str] = None,
+        system_message: Optional[str] = None
+    ) -> Conversation:
+        """
+        Create a conversation
+        
+        Args:
+            db: Database session
+            user_id: The ID of the user
+            title: Title of the conversation
+            metadata: Additional metadata
+            initial_message: The message that starts the conversation, used for the default title
+            system_message: Custom system message for this conversation
+        
+        Returns:
+            The new conversation
+        """
+        if not title and initial_message:
+            title = initial_message.strip()[:50]
+        
+        conversation = Conversation(
+            user_id=user_id,
+            title=title or "New conversation",
+            meta=metadata,
+            system_message=system_message
+        )
+        db.add(conversation)
+        await db.commit()
+        await db.refresh(conversation)
+        return conversation
+    
+    async def get_conversation(
+        self,
+        db: AsyncSession,
+        conversation_id: int,
+        user_id: str
+    ) -> Optional[Conversation]:
+        """Get a conversation if it belongs to the user"""
+        result = await db.execute(
+            select(Conversation).where(
+                Conversation.id == conversation_id,
+                Conversation.user_id == user_id
+            )
+        )
+        return result.scalar_one_or_none()
+    
+    async def get_conversation_with_messages(
+        self,
+        db: AsyncSession,
+        conversation_id: int,
+        user_id: str
+    ) -> Optional[Conversation]:
+        """
+        Get a conversation and all of its messages if it belongs to the user
+        
+        An archived conversation is returned detached from the session, with
+        its archived messages followed by any written since.
+        """
+        result = await db.execute(
+            select(Conversation)
+            .options(selectinload(Conversation.messages))
+            .where(
+                Conversation.id == conversation_id,
+                Conversation.user_id == user_id
+            )
+        )
+        conversation = result.scalar_one_or_none()
+        
+        if conversation is not None and conversation.archived_at is not None:
+            archived = await self.archive_service.archived_messages(db, conversation_id)
+            # Detached so the archived messages can never be flushed back
+            db.expunge(conversation)
+            set_committed_value(conversation, "messages", archived + list(conversation.messages))
+        
+        return conversation
+    
+    async def get_conversations(
+        self,
+        db: AsyncSession,
+        user_id: str,
+        cursor: Optional[str] = None,
+        limit: int = 10,
+        include_inactive: bool = False
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Get a page of the user's conversation summaries, most recently updated first
+        
+        Keyset pagination on (user_id, updated_at, id): each page starts
+        right after the previous page's last row, so deep pages cost the
+        same as the first one.
+        
+        Args:
+            db: Database session
+            user_id: The ID of the user
+            cursor: The previous page's next_cursor
+            limit: Maximum number of conversations to return
+            include_inactive: Whether to include deleted conversations
+        
+        Returns:
+            Tuple of (summaries, next_cursor); next_cursor is None on the last page
+        
+        Raises:
+            InvalidCursor: If the cursor can't be decoded
+        """
+        query = select(*SUMMARY_COLUMNS).where(Conversation.user_id == user_id)
+        if not include_inactive:
+            query = query.where(Conversation.is_active.is_(True))
+        if cursor:
+            try:
+                updated_at, conversation_id = self._decode_cursor(cursor)
+                updated_at, conversation_id = datetime.fromisoformat(updated_at), int(conversation_id)
+            except (ValueError, TypeError) as e:
+                raise InvalidCursor("Invalid cursor") from e
+            query = query.where(tuple_(Conversation.updated_at, Conversation.id) < (updated_at, conversation_id))
+        
+        # One extra row tells whether there is another page
+        result = await db.execute(
+            query.order_by(Conversation.updated_at.desc(), Conversation.id.desc()).limit(limit + 1)
+        )
+        rows = [dict(row) for row in result.mappings()]
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self._encode_cursor(rows[-1]["updated_at"].isoformat(), rows[-1]["id"])
+        return rows, next_cursor
+    
+    async def search_messages(
+        self,
+        db: AsyncSession,
+        user_id: str,
+        query: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        limit: int = 10
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Full-text search over the user's messages, best match first
+        
+        Matches messages.search_vector (a stored tsvector, in a GIN index with
+        user_id) against the query in web search syntax ("quoted phrases",
+        or, -not). Pages are keyset-paginated on (rank, id); snippets are
+        only built for the rows of the page, and are HTML-escaped with the
+        matching terms in <mark> tags.
+        
+        Args:
+            db: Database session
+            user_id: The ID of the user
+            query: What to search for
+            since: Only messages created at or after this time
+            until: Only messages created before this time
+            cursor: The previous page's next_cursor
+            limit: Maximum number of results to return
+        
+        Returns:
+            Tuple of (results, next_cursor); next_cursor is None on the last page
+        
+        Raises:
+            InvalidCursor: If the cursor can't be decoded
+        """
+        ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+        score = func.ts_rank_cd(Message.search_vector, ts_query)
+        
+        matches = (
+            select(Message.id, score.label("rank"))
+            .join(Conversation, Conversation.id == Message.conversation_id)
+            .where(
+                Message.user_id == user_id,
+                Message.role != "system",
+                Message.search_vector.op("@@")(ts_query),
+                Conversation.is_active.is_(True)
+            )
+        )
+        if since:
+            matches = matches.where(Message.created_at >= since)
+        if until:
+            matches = matches.where(Message.created_at < until)
+        if cursor:
+            try:
+                last_rank, last_id = self._decode_cursor(cursor)
+                last_rank, last_id = float(last_rank), int(last_id)
+            except (ValueError, TypeError) as e:
+                raise InvalidCursor("Invalid cursor") from e
+            matches = matches.where(tuple_(score, Message.id) < (last_rank, last_id))
+        
+        # One extra row tells whether there is another page
+        page = matches.order_by(score.desc(), Message.id.desc()).limit(limit + 1).subquery()
+        
+        result = await db.execute(
+            select(
+                Message.id.label("message_id"),
+                Message.conversation_id,
+                Conversation.title.label("conversation_title"),
+                Message.role,
+                Message.created_at,
+                page.c.rank,
+                func.ts_headline(
+                    SEARCH_CONFIG,
+                    func.translate(Message.content, SNIPPET_START + SNIPPET_STOP, ""),
+                    ts_query,
+                    f'MaxWords={settings.SEARCH_SNIPPET_WORDS}, MinWords=5, '
+                    f'StartSel="{SNIPPET_START}", StopSel="{SNIPPET_STOP}"'
+                ).label("snippet")
+            )
+            .join(page, page.c.id == Message.id)
+            .join(Conversation, Conversation.id == Message.conversation_id)
+            .order_by(page.c.rank.desc(), Message.id.desc())
+        )
+        rows = [dict(row) for row in result.mappings()]
+        for row in rows:
+            row["snippet"] = (
+                html.escape(row["snippet"])
+                .replace(SNIPPET_START, "<mark>")
+                .replace(SNIPPET_STOP, "</mark>")
+            )
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self._encode_cursor(rows[-1]["rank"], rows[-1]["message_id"])
+        return rows, next_cursor
+    
+    async def update_conversation(
+        self,
+        db: AsyncSession,
+        conversation_id: int,
+        title: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        is_active: Optional[bool] = None
+    ) -> Optional[Conversation]:
+        """Update the given fields of a conversation"""
+        conversation = await db.get(Conversation, conversation_id)
+        if not conversation:
+            return None
+        
+        if title is not None:
+            conversation.title = title
+        if metadata is not None:
+            conversation.meta = metadata
+        if is_active is not None:
+            conversation.is_active = is_active
+        
+        # A reactivated conversation gets its messages back in the hot table
+        if is_active and conversation.archived_at is not None:
+            await self.archive_service.restore_conversation(db, conversation_id)
+        
+        await db.commit()
+        await db.refresh(conversation)
+        return conversation
+    
+    async def mark_conversation_inactive(self, db: AsyncSession, conversation_id: int) -> None:
+        """Mark a conversation as deleted"""
+        await db.execute(
+            update(Conversation)
+            .where(Conversation.id == conversation_id)
+            .values(is_active=False)
+        )
+        await db.commit()
+    
+    async def update_conversation_timestamp(self, db: AsyncSession, conversation_id: int) -> None:
+        """Move a conversation to the top of the user's list"""
+        await db.execute(
+            update(Conversation)
+            .where(Conversation.id == conversation_id)
+            .values(updated_at=func.now())
+        )
+        await db.commit()
+    
+    @staticmethod
+    def summary_update(inserted: Iterable[Tuple[int, datetime]]) -> Update:
+        """
+        UPDATE that adds newly inserted messages to their conversations' summaries
+        
+        message_count and last_message_at are incremented from the inserted
+        rows rather than recounted over the whole conversation, so the cost
+        doesn't grow with its length, and messages moved to the archive stay
+        counted. The preview and sentiment each read the latest row with one
+        probe of (conversation_id, id).
+        
+        Args:
+            inserted: (conversation_id, created_at) of each message actually
+                inserted; a replayed message that was already there would be
+                counted twice
+        """
+        counts: Dict[int, int] = {}
+        latest_at: Dict[int, datetime] = {}
+        for conversation_id, created_at in inserted:
+            counts[conversation_id] = counts.get(conversation_id, 0) + 1
+            if conversation_id not in latest_at or created_at > latest_at[conversation_id]:
+                latest_at[conversation_id] = created_at
+        
+        latest = (
+            select(Message.content)
+            .where(Message.conversation_id == Conversation.id, Message.role != "system")
+            .order_by(Message.id.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+        return (
+            update(Conversation)
+            .where(Conversation.id.in_(list(counts)))
+            .values(
+                message_count=Conversation.message_count + case(counts, value=Conversation.id, else_=0),
+                # GREATEST ignores NULL, the last_message_at of a new conversation
+                last_message_at=func.greatest(
+                    Conversation.last_message_at,
+                    case(latest_at, value=Conversation.id)
+                ),
+                last_message_preview=func.left(latest, settings.CONVERSATION_PREVIEW_LENGTH),
+                last_sentiment=ConversationService._last_sentiment(),
+                updated_at=func.now()
+            )
+        )
+    
+    @staticmethod
+    def sentiment_update(message_ids: Iterable[int]) -> Update:
+        """UPDATE that refreshes last_sentiment of the conversations the messages belong to"""
+        return (
+            update(Conversation)
+            .where(
+                Conversation.id.in_(
+                    select(Message.conversation_id).where(Message.id.in_(list(message_ids)))
+                )
+            )
+            # Analyses arrive after the fact and shouldn't reorder the list
+            .values(last_sentiment=ConversationService._last_sentiment(), updated_at=Conversation.updated_at)
+        )
+    
+    @staticmethod
+    def _last_sentiment():
+        """The sentiment of the conversation's latest analyzed user message"""
+        return (
+            select(MessageAnalysis.sentiment)
+            .join(Message, Message.id == MessageAnalysis.message_id)
+            .where(Message.conversation_id == Conversation.id, Message.role == "user")
+            .order_by(Message.id.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+    
+    @staticmethod
+    def _encode_cursor(*values: Any) -> str:
+        raw = json.dumps(values).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+    
+    @staticmethod
+    def _decode_cursor(cursor: str) -> List[Any]:
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        except ValueError as e:
+            raise InvalidCursor("Invalid cursor") from e
+        if not isinstance(values, list):
+            raise InvalidCursor("Invalid cursor")
+        return values
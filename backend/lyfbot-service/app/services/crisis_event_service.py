@@ -0,0 +1,218 @@
+import hashlib
+import logging
+import math
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import bindparam, delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.crisis_event import CrisisEvent, UserRiskSummary
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_LEVELS = ["low", "medium", "high", "urgent"]
+
+# How much an event adds to the user's risk score
+LEVEL_WEIGHTS = {"low": 0.5, "medium": 1.0, "high": 2.0, "urgent": 3.0}
+
+class CrisisEventService:
+    """
+    Append-only store of crisis events with a rolling risk summary per user
+    
+    Recording an event is one INSERT into crisis_events plus one upsert of
+    the user's summary row, in the same transaction. The summary keeps an
+    exponentially decaying risk score, so escalation decisions read a single
+    row instead of scanning the user's history.
+    """
+    
+    async def record(
+        self,
+        db: AsyncSession,
+        user_id: str,
+        crisis_type: str,
+        notification_level: str,
+        conversation_id: Optional[int] = None,
+        message_id: Optional[int] = None,
+        message_content: Optional[str] = None
+    ) -> bool:
+        """
+        Append a crisis event and fold it into the user's risk summary
+        
+        Args:
+            db: Database session
+            user_id: The ID of the user
+            crisis_type: The type of crisis
+            notification_level: The level the crisis was handled at
+            conversation_id: The ID of the conversation
+            message_id: The message that triggered the event
+            message_content: The message text (only its digest is stored)
+        
+        Returns:
+            False if an event for the message was already recorded
+        """
+        now = datetime.now(timezone.utc)
+        
+        result = await db.execute(
+            insert(CrisisEvent)
+            .values(
+                user_id=user_id,
+                conversation_id=conversation_id,
+                message_id=message_id,
+                crisis_type=crisis_type,
+                notification_level=notification_level,
+                content_sha256=hashlib.sha256(message_content.encode("utf-8")).hexdigest() if message_content else None,
+                created_at=now
+            )
+            .on_conflict_do_nothing(index_elements=[CrisisEvent.message_id])
+            .returning(CrisisEvent.id)
+        )
+        if result.scalar_one_or_none() is None:
+            await db.rollback()
+            return False
+        
+        # Seconds for the score to shrink by a factor of e
+        time_constant = settings.CRISIS_RISK_HALF_LIFE_HOURS * 3600 / math.log(2)
+        
+        statement = insert(UserRiskSummary).values(
+            user_id=user_id,
+            risk_score=LEVEL_WEIGHTS.get(notification_level, 1.0),
+            risk_updated_at=now,
+            event_count=1,
+            last_event_at=now,
+            last_crisis_type=crisis_type,
+            last_notification_level=notification_level
+        )
+        elapsed = func.greatest(
+            func.extract("epoch", statement.excluded.risk_updated_at - UserRiskSummary.risk_updated_at),
+            0
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[UserRiskSummary.user_id],
+            set_={
+                "risk_score": statement.excluded.risk_score
+                + UserRiskSummary.risk_score * func.exp(-elapsed / time_constant),
+                "risk_updated_at": func.greatest(UserRiskSummary.risk_updated_at, statement.excluded.risk_updated_at),
+                "event_count": UserRiskSummary.event_count + 1,
+                "last_event_at": statement.excluded.last_event_at,
+                "last_crisis_type": statement.excluded.last_crisis_type,
+                "last_notification_level": statement.excluded.last_notification_level
+            }
+        )
+        await db.execute(statement)
+        await db.commit()
+        return True
+    
+    async def get_risk_summary(self, db: AsyncSession, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a user's risk summary, with the score decayed to now
+        
+        Args:
+            db: Database session
+            user_id: The ID of the user
+        
+        Returns:
+            The summary, or None if the user has no events within retention
+        """
+        summary = await db.get(UserRiskSummary, user_id)
+        if not summary:
+            return None
+        
+        hours = max((datetime.now(timezone.utc) - summary.risk_updated_at).total_seconds() / 3600, 0)
+        return {
+            "user_id": summary.user_id,
+            "risk_score": summary.risk_score * 0.5 ** (hours / settings.CRISIS_RISK_HALF_LIFE_HOURS),
+            "event_count": summary.event_count,
+            "last_event_at": summary.last_event_at,
+            "last_crisis_type": summary.last_crisis_type,
+            "last_notification_level": summary.last_notification_level
+        }
+    
+    async def get_recent_events(
+        self,
+        db: AsyncSession,
+        user_id: str,
+        since: Optional[datetime] = None,
+        limit: int = 20
+    ) -> List[CrisisEvent]:
+        """Get a user's events, newest first"""
+        query = select(CrisisEvent).where(CrisisEvent.user_id == user_id)
+        if since:
+            query = query.where(CrisisEvent.created_at >= since)
+        
+        result = await db.execute(query.order_by(CrisisEvent.created_at.desc()).limit(limit))
+        return list(result.scalars().all())
+    
+    def escalate(self, notification_level: str, summary: Optional[Dict[str, Any]]) -> str:
+        """
+        Raise a crisis's notification level by one for users at elevated risk
+        
+        Args:
+            notification_level: The level from the crisis response template
+            summary: The user's risk summary before this crisis
+        
+        Returns:
+            The level to notify at
+        """
+        if not summary or summary["risk_score"] < settings.CRISIS_ESCALATION_SCORE:
+            return notification_level
+        
+        if notification_level not in NOTIFICATION_LEVELS:
+            return notification_level
+        index = NOTIFICATION_LEVELS.index(notification_level)
+        return NOTIFICATION_LEVELS[min(index + 1, len(NOTIFICATION_LEVELS) - 1)]
+    
+    async def sweep_expired(self) -> int:
+        """
+        Delete events older than CRISIS_EVENT_RETENTION_DAYS, in batches
+        
+        Each batch lowers the affected summaries' event_count by the events
+        it deleted, in the same transaction. Summaries whose last event is
+        past retention are removed too.
+        
+        Returns:
+            The number of events deleted
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(days=settings.CRISIS_EVENT_RETENTION_DAYS)
+        deleted = 0
+        
+        while True:
+            # Short transactions, so the append path isn't held up by a large sweep
+            async with SessionLocal() as db:
+                result = await db.execute(
+                    delete(CrisisEvent)
+                    .where(
+                        CrisisEvent.id.in_(
+                            select(CrisisEvent.id)
+                            .where(CrisisEvent.created_at < cutoff)
+                            .limit(settings.CRISIS_EVENT_SWEEP_BATCH)
+                        )
+                    )
+                    .returning(CrisisEvent.user_id)
+                )
+                per_user = Counter(result.scalars().all())
+                if per_user:
+                    summaries = UserRiskSummary.__table__
+                    await db.execute(
+                        update(summaries)
+                        .where(summaries.c.user_id == bindparam("summary_user_id"))
+                        .values(event_count=func.greatest(summaries.c.event_count - bindparam("expired"), 0)),
+                        [{"summary_user_id": user_id, "expired": count} for user_id, count in per_user.items()]
+                    )
+                await db.commit()
+            batch = sum(per_user.values())
+            deleted += batch
+            if batch < settings.CRISIS_EVENT_SWEEP_BATCH:
+                break
+        
+        async with SessionLocal() as db:
+            await db.execute(delete(UserRiskSummary).where(UserRiskSummary.last_event_at < cutoff))
+            await db.commit()
+        
+        if deleted:
+            logger.info(f"Deleted {deleted} crisis events older than {settings.CRISIS_EVENT_RETENTION_DAYS} days")
+        return deleted
@@ -0,0 +1,194 @@
+"""
+Local crisis screen, the first stage of crisis detection
+
+Scores a message against phrase rules and weighted risk cues in a few
+microseconds, so the reply doesn't wait on the AI Service for messages
+that are clearly a crisis or plainly small talk. Everything else is
+ambiguous and sent to the remote model.
+
+The rules can't enumerate every way of describing a crisis ("I took 30
+tablets" has no cue word), so the absence of a cue is never a negative:
+only small talk with no cue at all is ruled out locally.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Pattern, Tuple
+
+NEGATIVE = "negative"
+POSITIVE = "positive"
+AMBIGUOUS = "ambiguous"
+
+# First-person statements that are a crisis on their own
+CRISIS_PHRASES: Dict[str, List[str]] = {
+    "suicide": [
+        r"\bkill(?:ing)? my ?self\b",
+        r"\bend(?:ing)? (?:my (?:own )?life|it all)\b",
+        r"\btak(?:e|ing) my (?:own )?life\b",
+        r"\b(?:i'?m|i am|been|feel(?:ing)?) (?:so |really |very )?suicidal\b",
+        r"\b(?:want|wanna|going|plan(?:ning)?|ready) to die\b",
+        r"\bdon'?t want to (?:live|be alive|wake up|exist) any ?more\b",
+        r"\bdon'?t want to (?:live|be alive)\b",
+        r"\bbetter off (?:dead|without me)\b",
+        r"\bno reason to (?:live|go on|keep going)\b",
+        r"\bcan'?t go on (?:any ?more|living|like this)\b",
+        r"\b(?:wrote|writing) (?:a|my) (?:suicide |goodbye )?note\b",
+        r"\boverdos(?:e|ing) on\b",
+        r"\bjump(?:ing)? (?:off|in front of) (?:a |the )?(?:bridge|building|roof|train)\b",
+    ],
+    "self_harm": [
+        r"\b(?:cut|cutting|burn|burning|hurt|hurting|harm|harming|punish(?:ing)?) my ?self\b",
+        r"\bself[- ]?harm(?:ing|ed)?\b",
+        r"\brelaps(?:e|ed|ing) (?:on|into|with) (?:cutting|self[- ]?harm)\b",
+        r"\bstarted cutting again\b",
+    ],
+}
+
+# Idioms that contain crisis words but aren't about the writer's safety
+BENIGN_PHRASES: List[str] = [
+    r"\bkill(?:ing|ed)? it\b",
+    r"\bdying (?:to|for) (?:see|try|know|hear|go|get|meet)\b",
+    r"\bto die for\b",
+    r"\b(?:i'?d|would) kill for\b",
+    r"\bdied (?:of|from) (?:laughter|laughing|embarrassment)\b",
+    r"\bmy (?:phone|battery|laptop|car|plant|plants)\b[^.!?]{0,20}\b(?:died|dead|dying|killing)\b",
+    r"\bsuicide squad\b",
+    r"\bkill(?:ed|ing)? (?:the|a|some) (?:time|mood|bug|process|spider)\b",
+]
+
+# Whole messages that are small talk: greetings, thanks and acknowledgements
+SMALL_TALK = (
+    r"(?:(?:hi|hiya|hello|hey|yo|good (?:morning|afternoon|evening)|how are you(?: doing| today)?"
+    r"|thanks|thank you|thx|ty|cheers|ok|okay|k|sure|yes|yeah|yep|no|nope|got it|sounds good"
+    r"|cool|great|nice|alright|i see|makes sense|will do)"
+    r"(?: (?:there|again|lyfbot|so much|a lot|very much))?[\s!.,?:)(]*)+"
+)
+
+# A negation shortly before a crisis phrase ("I would never kill myself")
+# makes the message ambiguous rather than a clear positive
+NEGATION = re.compile(r"\b(?:not|never|no longer|used to|(?:do|would|wo|could|ca)n'?t)\b[^.!?]{0,25}$")
+
+# Risk cues: name -> (pattern, weight, crisis type)
+RISK_CUES: Dict[str, Tuple[str, float, str]] = {
+    "suicide_word": (r"\bsuicid(?:e|al)\b", 2.5, "suicide"),
+    "death_word": (r"\b(?:die|dying|dead|death)\b", 1.0, "suicide"),
+    "kill_word": (r"\bkill\b", 1.0, "suicide"),
+    "hopeless": (r"\bhopeless(?:ness)?\b", 1.5, "suicide"),
+    "worthless": (r"\bworthless\b", 1.2, "suicide"),
+    "burden": (r"\b(?:a|such a) burden\b", 1.5, "suicide"),
+    "no_point": (r"\bno point\b", 1.5, "suicide"),
+    "giving_up": (r"\bgive up (?:on (?:life|everything)|completely)\b", 2.0, "suicide"),
+    "tired_of_living": (r"\btired of (?:living|life|being alive|everything)\b", 2.0, "suicide"),
+    "cant_take_it": (r"\bcan'?t take (?:it|this) any ?more\b", 2.0, "suicide"),
+    "disappear": (r"\b(?:disappear|vanish) (?:forever|for good)\b", 2.0, "suicide"),
+    "not_being_here": (r"\bnot (?:being|be) (?:here|around) any ?more\b|\bnot being here\b", 2.0, "suicide"),
+    "no_way_out": (r"\bno (?:way out|escape)\b", 2.0, "suicide"),
+    "goodbye": (r"\bgoodbye\b", 0.8, "suicide"),
+    "means": (r"\b(?:pills|overdose|rope|noose|gun)\b", 1.5, "suicide"),
+    "trapped": (r"\btrapped\b", 1.0, "suicide"),
+    "empty": (r"\b(?:empty|numb)\b", 0.6, "suicide"),
+    "alone": (r"\balone\b", 0.5, "suicide"),
+    "blade": (r"\b(?:blade|razor)s?\b", 1.5, "self_harm"),
+    "scars": (r"\bscars?\b", 1.0, "self_harm"),
+    "bleeding": (r"\bbleed(?:ing)?\b", 1.0, "self_harm"),
+    "cutting": (r"\bcut(?:ting)?\b", 0.8, "self_harm"),
+    "urge_to_cut": (r"\b(?:thinking about|urge to|want to) (?:cut|cutting|burn|burning)\b|\bcutting again\b", 2.0, "self_harm"),
+    "hurt": (r"\bhurt\b", 0.6, "self_harm"),
+    "punish": (r"\bpunish\b", 0.8, "self_harm"),
+}
+
+@dataclass
+class ScreenResult:
+    """The screen's verdict on a message"""
+    decision: str
+    # Most likely crisis type, also set for ambiguous messages
+    crisis_type: Optional[str]
+    score: float
+    rules: List[str] = field(default_factory=list)
+    # Whether the message has risk cues (a score of at least cue_threshold or
+    # a negated crisis phrase), rather than being ambiguous for lack of a match
+    cued: bool = False
+    
+    @property
+    def is_crisis(self) -> bool:
+        return self.decision == POSITIVE
+
+class CrisisScreen:
+    """
+    Lexical and weighted-cue screen for crisis messages
+    
+    - A crisis phrase that isn't negated or part of a benign idiom is a
+      clear positive.
+    - Without one, the risk cue weights are summed: at or above
+      positive_above the message is a clear positive.
+    - A message with no cue at all that is entirely small talk is a clear
+      negative.
+    - Anything else is ambiguous. Ambiguous messages scoring at least
+      cue_threshold, or with a negated crisis phrase, are cued.
+    """
+    
+    def __init__(self, cue_threshold: float = 1.0, positive_above: float = 4.5):
+        self.cue_threshold = cue_threshold
+        self.positive_above = positive_above
+        self._small_talk = re.compile(SMALL_TALK)
+        self._phrases: List[Tuple[str, Pattern]] = [
+            (crisis_type, re.compile("|".join(patterns)))
+            for crisis_type, patterns in CRISIS_PHRASES.items()
+        ]
+        self._benign = re.compile("|".join(BENIGN_PHRASES))
+        self._cues: List[Tuple[str, Pattern, float, str]] = [
+            (name, re.compile(pattern), weight, crisis_type)
+            for name, (pattern, weight, crisis_type) in RISK_CUES.items()
+        ]
+    
+    @staticmethod
+    def normalize(content: str) -> str:
+        return content.lower().replace("’", "'").replace("‘", "'")
+    
+    def screen(self, content: str) -> ScreenResult:
+        """
+        Screen a message
+        
+        Args:
+            content: The message content
+        
+        Returns:
+            The screen result
+        """
+        text = self.normalize(content)
+        # Benign idioms are blanked out so their words don't count as cues
+        text, benign = self._benign.subn(" ", text)
+        rules = ["benign_idiom"] if benign else []
+        
+        scores: Dict[str, float] = {}
+        for name, pattern, weight, crisis_type in self._cues:
+            hits = len(pattern.findall(text))
+            if hits:
+                # Repeating a word adds little evidence
+                scores[crisis_type] = scores.get(crisis_type, 0.0) + weight * min(hits, 2)
+                rules.append(f"cue:{name}")
+        score = sum(scores.values(), 0.0)
+        
+        negated_type = None
+        for crisis_type, pattern in self._phrases:
+            for match in pattern.finditer(text):
+                if NEGATION.search(text[max(match.start() - 30, 0):match.start()]):
+                    negated_type = negated_type or crisis_type
+                    rules.append(f"negated_phrase:{crisis_type}")
+                    continue
+                rules.append(f"phrase:{crisis_type}")
+                return ScreenResult(decision=POSITIVE, crisis_type=crisis_type, score=score, rules=rules, cued=True)
+        
+        crisis_type = negated_type or (max(scores, key=scores.get) if scores else None)
+        cued = bool(negated_type) or score >= self.cue_threshold
+        
+        if not negated_type and score >= self.positive_above:
+            decision = POSITIVE
+        elif not negated_type and not score and not benign and self._small_talk.fullmatch(text.strip()):
+            decision = NEGATIVE
+            rules.append("small_talk")
+        else:
+            decision = AMBIGUOUS
+            if not cued:
+                rules.append("uncued")
+        
+        return ScreenResult(decision=decision, crisis_type=crisis_type, score=score, rules=rules, cued=cued)
@@ -1,15 +1,71 @@
+import asyncio
+import hashlib
 import httpx
+import json
 import logging
 import time
-from typing import Tuple, Optional, Dict, Any
+from typing import Tuple, Optional
+
+from prometheus_client import Counter, Histogram
 
 from app.core.config import settings
 from app.core.security import get_service_token
+from app.db.session import SessionLocal
+from app.services.crisis_event_service import CrisisEventService
+from app.services.escalation_service import EscalationDispatcher
+from app.services.crisis_screen import AMBIGUOUS, CrisisScreen, ScreenResult
 
 logger = logging.getLogger(__name__)
+# One JSON record per stage decision, routed to the audit log
+audit_logger = logging.getLogger("lyfbot.crisis.audit")
+
+CRISIS_DECISIONS = Counter(
+    "lyfbot_crisis_decisions_total",
+    "Crisis detection decisions by the stage that made them",
+    ["stage", "decision"]
+)
+CRISIS_STAGE_LATENCY = Histogram(
+    "lyfbot_crisis_stage_seconds",
+    "Latency of each crisis detection stage",
+    ["stage"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.025, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
 
 class CrisisService:
-    """Service for detecting and handling crisis situations"""
+    """
+    Service for detecting and handling crisis situations
+    
+    Detection is a cascade: the local screen (app.services.crisis_screen)
+    decides clear positives and small talk, and every other message is
+    sent to the AI Service, with a CRISIS_REMOTE_TIMEOUT deadline. Each
+    stage's decision is written to the lyfbot.crisis.audit log.
+    """
+    
+    # Shared so crisis checks reuse connections to the AI Service
+    _client: Optional[httpx.AsyncClient] = None
+    _screen: Optional[CrisisScreen] = None
+    
+    def __init__(self):
+        self.event_service = CrisisEventService()
+        self.escalation_dispatcher = EscalationDispatcher()
+    
+    @classmethod
+    def get_screen(cls) -> CrisisScreen:
+        if cls._screen is None:
+            cls._screen = CrisisScreen(
+                cue_threshold=settings.CRISIS_SCREEN_CUE_THRESHOLD,
+                positive_above=settings.CRISIS_SCREEN_POSITIVE_ABOVE
+            )
+        return cls._screen
+    
+    @classmethod
+    def get_client(cls) -> httpx.AsyncClient:
+        if cls._client is None:
+            cls._client = httpx.AsyncClient(
+                base_url=settings.AI_SERVICE_URL,
+                limits=httpx.Limits(max_keepalive_connections=20)
+            )
+        return cls._client
     
     async def detect_crisis(
         self,
@@ -22,31 +78,104 @@ class CrisisService:
         Args:
             content: The message content
             user_id: The ID of the user
-            
+        
         Returns:
             Tuple of (is_crisis, crisis_type)
         """
-        # Use AI Service for crisis detection through the AIService
-        from app.services.ai_service import AIService
-        ai_service = AIService()
+        start = time.perf_counter()
+        screen = self.get_screen().screen(content)
+        self._audit("screen", screen.decision, screen.crisis_type, user_id, content, start, screen)
         
-        return await ai_service.detect_crisis(content, user_id)
+        if screen.decision != AMBIGUOUS:
+            return screen.is_crisis, screen.crisis_type
+        
+        start = time.perf_counter()
+        try:
+            is_crisis, crisis_type = await asyncio.wait_for(
+                self._detect_remote(content, user_id),
+                timeout=settings.CRISIS_REMOTE_TIMEOUT
+            )
+        except Exception as e:
+            # Timeouts included: an unanswered ambiguous message is resolved locally
+            logger.error(f"Remote crisis detection failed: {type(e).__name__}: {str(e)}")
+            is_crisis = settings.CRISIS_FAIL_SAFE if screen.cued else settings.CRISIS_FAIL_SAFE_UNCUED
+            crisis_type = screen.crisis_type if is_crisis else None
+            self._audit("fallback", "positive" if is_crisis else "negative", crisis_type, user_id, content, start, screen)
+            return is_crisis, crisis_type
+        
+        if is_crisis and not crisis_type:
+            crisis_type = screen.crisis_type
+        self._audit("remote", "positive" if is_crisis else "negative", crisis_type, user_id, content, start, screen)
+        return is_crisis, crisis_type if is_crisis else None
+    
+    async def _detect_remote(self, content: str, user_id: str) -> Tuple[bool, Optional[str]]:
+        """Ask the AI Service's crisis model"""
+        token = await get_service_token()
+        response = await self.get_client().post(
+            "/api/v1/lyfbot/detect-crisis",
+            json={
+                "content": content,
+                "user_id": user_id
+            },
+            headers={
+                "Authorization": f"Bearer {token}",
+                "X-User-ID": user_id
+            }
+        )
+        response.raise_for_status()
+        
+        result = response.json()
+        return result["is_crisis"], result.get("crisis_type")
+    
+    def _audit(
+        self,
+        stage: str,
+        decision: str,
+        crisis_type: Optional[str],
+        user_id: str,
+        content: str,
+        start: float,
+        screen: ScreenResult
+    ) -> None:
+        """Record one stage's decision; the message itself is only referenced by digest"""
+        elapsed = time.perf_counter() - start
+        CRISIS_DECISIONS.labels(stage=stage, decision=decision).inc()
+        CRISIS_STAGE_LATENCY.labels(stage=stage).observe(elapsed)
+        audit_logger.info(json.dumps({
+            "stage": stage,
+            "decision": decision,
+            "crisis_type": crisis_type,
+            "user_id": user_id,
+            "content_sha256": hashlib.sha256(content.encode("utf-8")).hexdigest(),
+            "screen_score": round(screen.score, 2),
+            "screen_rules": screen.rules,
+            "latency_ms": round(elapsed * 1000, 3),
+            "timestamp": time.time()
+        }))
     
     async def handle_crisis(
         self,
         user_id: str,
         crisis_type: str,
         message_content: str,
-        conversation_id: int
+        conversation_id: int,
+        message_id: Optional[int] = None,
+        detected_at: Optional[float] = None
     ) -> None:
         """
         Handle a detected crisis situation
         
+        Runs on the escalation lane of the job worker. If the notification
+        can neither be delivered nor put in the escalation outbox, the error
+        is raised so the job is retried.
+        
         Args:
             user_id: The ID of the user
             crisis_type: The type of crisis
             message_content: The message content that triggered the crisis detection
             conversation_id: The ID of the conversation
+            message_id: The ID of the message that triggered the crisis detection
+            detected_at: Epoch seconds at which the crisis was detected
         """
         try:
             # 1. Log the crisis
@@ -65,15 +194,23 @@ class CrisisService:
                 }
             )
             
-            # 3. Send notification to appropriate services based on severity
+            # 3. Send notification to appropriate services based on severity,
+            # raised a level for users with several recent crises
             notification_level = crisis_response.get("notification_level", "medium")
+            try:
+                async with SessionLocal() as db:
+                    summary = await self.event_service.get_risk_summary(db, user_id)
+                notification_level = self.event_service.escalate(notification_level, summary)
+            except Exception as e:
+                logger.error(f"Failed to read risk summary for user {user_id}: {str(e)}")
             
             if notification_level in ["high", "urgent"]:
                 await self._send_crisis_notification(
                     user_id=user_id,
                     crisis_type=crisis_type,
                     notification_level=notification_level,
-                    conversation_id=conversation_id
+                    conversation_id=conversation_id,
+                    detected_at=detected_at
                 )
             
             # 4. Store crisis record for future reference
@@ -82,18 +219,21 @@ class CrisisService:
                 crisis_type=crisis_type,
                 message_content=message_content,
                 conversation_id=conversation_id,
-                notification_level=notification_level
+                notification_level=notification_level,
+                message_id=message_id
             )
-            
+        
         except Exception as e:
             logger.error(f"Failed to handle crisis: {str(e)}")
+            raise
     
     async def _send_crisis_notification(
         self,
         user_id: str,
         crisis_type: str,
         notification_level: str,
-        conversation_id: int
+        conversation_id: int,
+        detected_at: Optional[float] = None
     ) -> None:
         """
         Send a notification about the crisis to the notification service
@@ -103,40 +243,23 @@ class CrisisService:
             crisis_type: The type of crisis
             notification_level: The severity level of the notification
             conversation_id: The ID of the conversation
+            detected_at: Epoch seconds at which the crisis was detected
         """
-        try:
-            # Get service token for authentication
-            token = await get_service_token()
-            
-            # Prepare notification payload
-            payload = {
-                "user_id": user_id,
-                "type": "crisis_alert",
-                "urgency": notification_level,
-                "data": {
-                    "crisis_type": crisis_type,
-                    "conversation_id": conversation_id,
-                    "timestamp": str(int(time.time())),
-                    "source": "lyfbot"
-                }
+        # Prepare notification payload
+        payload = {
+            "user_id": user_id,
+            "type": "crisis_alert",
+            "urgency": notification_level,
+            "data": {
+                "crisis_type": crisis_type,
+                "conversation_id": conversation_id,
+                "timestamp": str(int(detected_at or time.time())),
+                "source": "lyfbot"
             }
-            
-            # Send notification
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{settings.NOTIFICATION_SERVICE_URL}/api/v1/notifications",
-                    json=payload,
-                    headers={
-                        "Authorization": f"Bearer {token}"
-                    },
-                    timeout=5.0
-                )
-                
-                if response.status_code != 200 and response.status_code != 201:
-                    logger.error(f"Failed to send crisis notification: {response.text}")
-                    
-        except Exception as e:
-            logger.error(f"Failed to send crisis notification: {str(e)}")
+        }
+        
+        # Retried, then kept in the escalation outbox if the service is unreachable
+        await self.escalation_dispatcher.deliver("/api/v1/notifications", payload, detected_at)
     
     async def _store_crisis_record(
         self,
@@ -144,7 +267,8 @@ class CrisisService:
         crisis_type: str,
         message_content: str,
         conversation_id: int,
-        notification_level: str
+        notification_level: str,
+        message_id: Optional[int] = None
     ) -> None:
         """
         Store a record of the crisis for future reference
@@ -155,11 +279,21 @@ class CrisisService:
             message_content: The message content that triggered the crisis detection
             conversation_id: The ID of the conversation
             notification_level: The severity level of the notification
+            message_id: The ID of the message that triggered the crisis detection
         """
         try:
-            # This would typically store the crisis record in the database
-            # TODO: Implement this with the database
-            logger.info(f"Storing crisis record for user {user_id}, type {crisis_type}, level {notification_level}")
-            
+            async with SessionLocal() as db:
+                recorded = await self.event_service.record(
+                    db,
+                    user_id=user_id,
+                    crisis_type=crisis_type,
+                    notification_level=notification_level,
+                    conversation_id=conversation_id,
+                    message_id=message_id,
+                    message_content=message_content
+                )
+            if not recorded:
+                logger.info(f"Crisis record for message {message_id} already stored")
+        
         except Exception as e:
-            logger.error(f"Failed to store crisis record: {str(e)}") 
\ No newline at end of file
+            logger.error(f"Failed to store crisis record: {str(e)}")
@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+import httpx
+from prometheus_client import Counter, Histogram
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.security import get_service_token
+from app.db.session import SessionLocal
+from app.models.escalation_outbox import EscalationOutbox
+
+logger = logging.getLogger(__name__)
+
+ESCALATION_LATENCY = Histogram(
+    "lyfbot_crisis_escalation_seconds",
+    "Time from crisis detection to the Notification Service acknowledging the escalation",
+    ["path"],
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+)
+ESCALATION_RESULTS = Counter(
+    "lyfbot_crisis_escalations_total",
+    "Crisis escalation delivery attempts by outcome",
+    ["outcome"]
+)
+
+class EscalationRejected(Exception):
+    """The Notification Service refused an escalation; retrying won't help"""
+
+class EscalationDispatcher:
+    """
+    Delivers crisis notifications to the Notification Service
+    
+    Runs on the escalation lane of the job worker (app.worker). The HTTP
+    connection and the service token are set up before the first crisis and
+    kept warm, each escalation gets ESCALATION_MAX_ATTEMPTS quick attempts
+    with jittered backoff, and whatever still isn't delivered is persisted
+    to the escalation outbox and retried from there.
+    
+    lyfbot_crisis_escalation_seconds measures detection to acknowledgement.
+    """
+    
+    # Shared by every dispatcher in the process, so the warm connection is reused
+    _client: Optional[httpx.AsyncClient] = None
+    
+    @classmethod
+    def get_client(cls) -> httpx.AsyncClient:
+        if cls._client is None:
+            cls._client = httpx.AsyncClient(
+                base_url=settings.NOTIFICATION_SERVICE_URL,
+                timeout=settings.ESCALATION_TIMEOUT,
+                limits=httpx.Limits(
+                    max_keepalive_connections=settings.ESCALATION_WORKER_CONCURRENCY,
+                    keepalive_expiry=settings.ESCALATION_KEEPALIVE_INTERVAL * 3
+                )
+            )
+        return cls._client
+    
+    @classmethod
+    async def warm(cls) -> None:
+        """Open a connection and fetch a service token ahead of the next escalation"""
+        try:
+            await get_service_token()
+        except Exception as e:
+            logger.warning(f"Failed to prefetch service token: {str(e)}")
+        
+        try:
+            await cls.get_client().get("/health")
+        except httpx.HTTPError as e:
+            logger.warning(f"Notification Service unreachable while warming up: {str(e)}")
+    
+    @classmethod
+    async def keep_warm(cls) -> None:
+        """Warm up now, then keep the connection open between escalations"""
+        while True:
+            await cls.warm()
+            await asyncio.sleep(settings.ESCALATION_KEEPALIVE_INTERVAL)
+    
+    async def deliver(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        detected_at: Optional[float] = None
+    ) -> bool:
+        """
+        Send a crisis notification, falling back to the outbox
+        
+        Args:
+            path: The Notification Service endpoint
+            payload: The notification
+            detected_at: Epoch seconds at which the crisis was detected
+        
+        Returns:
+            True if delivered now, False if it was rejected or left in the outbox
+        
+        Raises:
+            Exception: If it couldn't be delivered or stored in the outbox
+        """
+        error = None
+        for attempt in range(settings.ESCALATION_MAX_ATTEMPTS):
+            if attempt:
+                delay = settings.ESCALATION_RETRY_BASE_DELAY * 2 ** (attempt - 1)
+                await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+            
+            try:
+                await self._post(path, payload)
+            except EscalationRejected as e:
+                logger.error(f"Crisis notification rejected: {str(e)}")
+                ESCALATION_RESULTS.labels(outcome="rejected").inc()
+                return False
+            except Exception as e:
+                error = f"{type(e).__name__}: {str(e)}"
+                logger.warning(f"Crisis notification attempt {attempt + 1} failed: {error}")
+                ESCALATION_RESULTS.labels(outcome="retry").inc()
+                continue
+            
+            self._observe(detected_at, "direct")
+            return True
+        
+        async with SessionLocal() as db:
+            db.add(EscalationOutbox(
+                path=path,
+                payload=payload,
+                detected_at=detected_at,
+                attempts=settings.ESCALATION_MAX_ATTEMPTS,
+                last_error=error,
+                next_attempt_at=datetime.now(timezone.utc) + timedelta(seconds=settings.ESCALATION_OUTBOX_INTERVAL)
+            ))
+            await db.commit()
+        
+        logger.error(f"Crisis notification moved to the outbox: {error}")
+        ESCALATION_RESULTS.labels(outcome="outboxed").inc()
+        return False
+    
+    async def drain_outbox(self) -> int:
+        """
+        Retry due escalations from the outbox
+        
+        Returns:
+            The number delivered
+        """
+        delivered = 0
+        now = datetime.now(timezone.utc)
+        
+        async with SessionLocal() as db:
+            # Several escalation workers can drain concurrently without sending twice
+            result = await db.execute(
+                select(EscalationOutbox)
+                .where(EscalationOutbox.next_attempt_at <= now)
+                .order_by(EscalationOutbox.id)
+                .limit(settings.ESCALATION_OUTBOX_BATCH)
+                .with_for_update(skip_locked=True)
+            )
+            
+            for entry in result.scalars().all():
+                try:
+                    await self._post(entry.path, entry.payload)
+                except EscalationRejected as e:
+                    logger.error(f"Crisis notification {entry.id} rejected, dropping it: {str(e)}")
+                    ESCALATION_RESULTS.labels(outcome="rejected").inc()
+                    await db.delete(entry)
+                    continue
+                except Exception as e:
+                    entry.attempts += 1
+                    entry.last_error = f"{type(e).__name__}: {str(e)}"
+                    retries = entry.attempts - settings.ESCALATION_MAX_ATTEMPTS
+                    backoff = min(settings.ESCALATION_OUTBOX_INTERVAL * 2 ** min(max(retries, 0), 6), 300)
+                    entry.next_attempt_at = now + timedelta(seconds=backoff)
+                    continue
+                
+                self._observe(entry.detected_at, "outbox")
+                await db.delete(entry)
+                delivered += 1
+            
+            await db.commit()
+        
+        return delivered
+    
+    @classmethod
+    async def run_outbox(cls) -> None:
+        """Drain the outbox every ESCALATION_OUTBOX_INTERVAL seconds"""
+        dispatcher = cls()
+        while True:
+            try:
+                delivered = await dispatcher.drain_outbox()
+                if delivered:
+                    logger.info(f"Delivered {delivered} crisis notifications from the outbox")
+            except Exception as e:
+                logger.error(f"Failed to drain the escalation outbox: {str(e)}")
+            await asyncio.sleep(settings.ESCALATION_OUTBOX_INTERVAL)
+    
+    async def _post(self, path: str, payload: Dict[str, Any]) -> None:
+        token = await get_service_token()
+        response = await self.get_client().post(
+            path,
+            json=payload,
+            headers={
+                "Authorization": f"Bearer {token}",
+                "X-Service-Name": "lyfbot-service"
+            }
+        )
+        
+        # Client errors other than timeouts and rate limiting won't succeed on retry
+        if 400 <= response.status_code < 500 and response.status_code not in (408, 429):
+            raise EscalationRejected(f"HTTP {response.status_code}: {response.text}")
+        response.raise_for_status()
+    
+    @staticmethod
+    def _observe(detected_at: Optional[float], path: str) -> None:
+        ESCALATION_RESULTS.labels(outcome="delivered").inc()
+        if detected_at:
+            ESCALATION_LATENCY.labels(path=path).observe(max(time.time() - detected_at, 0))
@@ -0,0 +1,280 @@
+import logging
+from collections import Counter
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.feedback import Feedback, FeedbackAreaRollup, FeedbackRollup
+from app.models.message import Message
+
+logger = logging.getLogger(__name__)
+
+RATINGS = (1, 2, 3, 4, 5)
+
+# Columns that identify a rollup bucket
+BUCKET_KEYS = ("day", "feedback_type", "model_version", "prompt_version")
+
+class FeedbackService:
+    """
+    Conversation and bot feedback with incrementally maintained rollups
+    
+    Feedback is stored as submitted and handed to the job worker, which
+    adds it to the rollups for its day, feedback type, model version and
+    prompt version: a count, a rating sum and histogram, and a count per
+    improvement area. Quality queries read only the rollups, so their cost
+    depends on the number of days and rollouts asked for, not on how much
+    feedback there is.
+    """
+    
+    async def store_conversation_feedback(
+        self,
+        db: AsyncSession,
+        user_id: str,
+        conversation_id: int,
+        rating: int,
+        feedback_text: Optional[str] = None,
+        improvement_areas: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Store feedback on a conversation
+        
+        Returns:
+            Dict with the feedback_id to hand to process_feedback
+        """
+        feedback = Feedback(
+            user_id=user_id,
+            feedback_type="conversation",
+            conversation_id=conversation_id,
+            rating=rating,
+            feedback_text=feedback_text,
+            improvement_areas=improvement_areas
+        )
+        db.add(feedback)
+        await db.commit()
+        return {"feedback_id": feedback.id}
+    
+    async def store_bot_feedback(
+        self,
+        db: AsyncSession,
+        user_id: str,
+        rating: int,
+        feedback_text: Optional[str] = None,
+        improvement_areas: Optional[List[str]] = None,
+        session_data: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Store general feedback about LyfBot
+        
+        Returns:
+            Dict with the feedback_id to hand to process_feedback
+        """
+        feedback = Feedback(
+            user_id=user_id,
+            feedback_type="bot",
+            rating=rating,
+            feedback_text=feedback_text,
+            improvement_areas=improvement_areas,
+            session_data=session_data
+        )
+        db.add(feedback)
+        await db.commit()
+        return {"feedback_id": feedback.id}
+    
+    async def process_feedback(
+        self,
+        feedback_id: int,
+        feedback_type: str,
+        user_id: str,
+        db: AsyncSession
+    ) -> bool:
+        """
+        Add stored feedback to the rollups
+        
+        Marking the feedback as rolled up and adding it to the rollups
+        happen in one transaction, so a retried job can't count it twice.
+        
+        Args:
+            feedback_id: The ID returned when the feedback was stored
+            feedback_type: "conversation" or "bot"
+            user_id: The ID of the user
+            db: Database session
+        
+        Returns:
+            False if the feedback doesn't exist or was already rolled up
+        """
+        feedback = await db.get(Feedback, feedback_id)
+        if feedback is None or feedback.rolled_up_at is not None:
+            return False
+        
+        model_version, prompt_version = await self._resolve_versions(db, feedback)
+        
+        result = await db.execute(
+            update(Feedback)
+            .where(Feedback.id == feedback_id, Feedback.rolled_up_at.is_(None))
+            .values(
+                model_version=model_version,
+                prompt_version=prompt_version,
+                rolled_up_at=datetime.now(timezone.utc)
+            )
+        )
+        if not result.rowcount:
+            await db.rollback()
+            return False
+        
+        bucket = {
+            "day": feedback.created_at.astimezone(timezone.utc).date(),
+            "feedback_type": feedback.feedback_type,
+            "model_version": model_version,
+            "prompt_version": prompt_version
+        }
+        
+        row = {
+            **bucket,
+            "count": 1,
+            "rating_sum": feedback.rating,
+            **{f"rating_{rating}": int(feedback.rating == rating) for rating in RATINGS}
+        }
+        stmt = insert(FeedbackRollup).values(row)
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=list(BUCKET_KEYS),
+            set_={
+                **{
+                    name: getattr(FeedbackRollup, name) + getattr(stmt.excluded, name)
+                    for name in row
+                    if name not in BUCKET_KEYS
+                },
+                # onupdate doesn't apply to ON CONFLICT DO UPDATE
+                "updated_at": func.now()
+            }
+        ))
+        
+        areas = self._normalize_areas(feedback.improvement_areas)
+        if areas:
+            stmt = insert(FeedbackAreaRollup).values([{**bucket, "area": area, "count": 1} for area in areas])
+            await db.execute(stmt.on_conflict_do_update(
+                index_elements=[*BUCKET_KEYS, "area"],
+                set_={"count": FeedbackAreaRollup.count + stmt.excluded.count}
+            ))
+        
+        await db.commit()
+        return True
+    
+    async def get_rollups(
+        self,
+        db: AsyncSession,
+        since: date,
+        until: date,
+        feedback_type: Optional[str] = None,
+        model_version: Optional[str] = None,
+        prompt_version: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Read the feedback rollups for a range of days
+        
+        Args:
+            db: Database session
+            since: First day (UTC) to include
+            until: Last day (UTC) to include
+            feedback_type: Only this feedback type
+            model_version: Only this model version
+            prompt_version: Only this prompt version
+        
+        Returns:
+            Dict with a bucket per day and rollout, oldest first, and the
+            totals over all of them
+        """
+        filters = []
+        for model in (FeedbackRollup, FeedbackAreaRollup):
+            conditions = [model.day >= since, model.day <= until]
+            if feedback_type:
+                conditions.append(model.feedback_type == feedback_type)
+            if model_version:
+                conditions.append(model.model_version == model_version)
+            if prompt_version:
+                conditions.append(model.prompt_version == prompt_version)
+            filters.append(conditions)
+        
+        result = await db.execute(
+            select(FeedbackRollup)
+            .where(*filters[0])
+            .order_by(*(getattr(FeedbackRollup, name) for name in BUCKET_KEYS))
+        )
+        rollups = result.scalars().all()
+        
+        result = await db.execute(select(FeedbackAreaRollup).where(*filters[1]))
+        areas: Dict[Tuple, Dict[str, int]] = {}
+        for row in result.scalars():
+            key = tuple(getattr(row, name) for name in BUCKET_KEYS)
+            areas.setdefault(key, {})[row.area] = row.count
+        
+        buckets = []
+        total_ratings = Counter()
+        total_areas = Counter()
+        for row in rollups:
+            key = tuple(getattr(row, name) for name in BUCKET_KEYS)
+            ratings = {str(rating): getattr(row, f"rating_{rating}") for rating in RATINGS}
+            buckets.append({
+                **dict(zip(BUCKET_KEYS, key)),
+                **self._summarize(row.count, row.rating_sum, ratings),
+                "improvement_areas": areas.get(key, {})
+            })
+            total_ratings.update(ratings)
+            total_areas.update(areas.get(key, {}))
+        
+        return {
+            "buckets": buckets,
+            "totals": {
+                **self._summarize(
+                    sum(row.count for row in rollups),
+                    sum(row.rating_sum for row in rollups),
+                    {str(rating): total_ratings[str(rating)] for rating in RATINGS}
+                ),
+                "improvement_areas": dict(total_areas.most_common())
+            }
+        }
+    
+    async def _resolve_versions(self, db: AsyncSession, feedback: Feedback) -> Tuple[str, str]:
+        """
+        The model and prompt version the feedback is about
+        
+        Conversation feedback is attributed to the rollout that wrote the
+        conversation's latest reply; bot feedback to the version in its
+        session data, or else the current deployment's.
+        """
+        versions: Dict[str, Any] = {}
+        
+        if feedback.conversation_id is not None:
+            result = await db.execute(
+                select(Message.meta)
+                .where(Message.conversation_id == feedback.conversation_id, Message.role == "assistant")
+                .order_by(Message.id.desc())
+                .limit(1)
+            )
+            versions = result.scalar_one_or_none() or {}
+        elif feedback.session_data:
+            versions = feedback.session_data
+        
+        return (
+            str(versions.get("model_version") or settings.MODEL_VERSION),
+            str(versions.get("prompt_version") or settings.PROMPT_VERSION)
+        )
+    
+    @staticmethod
+    def _normalize_areas(improvement_areas: Optional[List[Any]]) -> List[str]:
+        """Distinct, lowercased improvement areas, sorted so concurrent upserts lock rows in the same order"""
+        if not improvement_areas:
+            return []
+        areas = {str(area).strip().lower()[:64] for area in improvement_areas if str(area).strip()}
+        return sorted(areas)[:settings.FEEDBACK_MAX_IMPROVEMENT_AREAS]
+    
+    @staticmethod
+    def _summarize(count: int, rating_sum: int, ratings: Dict[str, int]) -> Dict[str, Any]:
+        return {
+            "count": count,
+            "average_rating": round(rating_sum / count, 3) if count else None,
+            "ratings": ratings
+        }
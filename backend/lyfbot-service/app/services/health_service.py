@@ -2,24 +2,109 @@ import httpx
 import logging
 import time
 import asyncio
-from typing import Dict, Any
-from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Any, Optional
+from prometheus_client import Gauge, Histogram
 from sqlalchemy.sql import text
 
 from app.core.config import settings
+from app.db.session import SessionLocal
 
 logger = logging.getLogger(__name__)
 
+PROBE_LATENCY = Histogram(
+    "lyfbot_health_probe_seconds",
+    "Latency of dependency health probes",
+    ["dependency"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0)
+)
+DEPENDENCY_UP = Gauge(
+    "lyfbot_dependency_up",
+    "1 if the dependency's last health probe succeeded",
+    ["dependency"]
+)
+
 class HealthService:
-    """Service for checking the health of the LyfBot service and its dependencies"""
+    """
+    Service for checking the health of the LyfBot service and its dependencies
+    
+    A background prober (started with the app) checks the database and the
+    dependent services concurrently every HEALTH_PROBE_INTERVAL seconds;
+    the health endpoint serves the last snapshot instead of probing on
+    every request.
+    """
+    
+    # Shared by every instance, so the endpoint reads what the prober wrote
+    _snapshot: Optional[Dict[str, Any]] = None
+    _task: Optional[asyncio.Task] = None
+    _client: Optional[httpx.AsyncClient] = None
+    
+    @classmethod
+    def get_client(cls) -> httpx.AsyncClient:
+        if cls._client is None:
+            cls._client = httpx.AsyncClient(timeout=settings.HEALTH_PROBE_TIMEOUT)
+        return cls._client
     
-    async def check_health(self, db: AsyncSession) -> Dict[str, Any]:
+    @classmethod
+    def start(cls) -> None:
+        """Start the background prober"""
+        if cls._task is None or cls._task.done():
+            cls._task = asyncio.create_task(cls()._run())
+    
+    @classmethod
+    async def stop(cls) -> None:
+        if cls._task:
+            cls._task.cancel()
+            try:
+                await cls._task
+            except asyncio.CancelledError:
+                pass
+            cls._task = None
+        if cls._client:
+            await cls._client.aclose()
+            cls._client = None
+    
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.check_health()
+            except Exception as e:
+                logger.error(f"Health probe failed: {str(e)}")
+            await asyncio.sleep(settings.HEALTH_PROBE_INTERVAL)
+    
+    def get_health(self) -> Dict[str, Any]:
         """
-        Check the health of the service and its dependencies
+        Get the last health snapshot
+        
+        A snapshot older than HEALTH_SNAPSHOT_MAX_AGE seconds (the prober
+        has stopped or is stuck) is marked stale and reported as degraded.
+        
+        Returns:
+            Dict containing health status
+        """
+        snapshot = HealthService._snapshot
+        if snapshot is None:
+            return {
+                "status": "degraded",
+                "service": "lyfbot-service",
+                "version": "0.1.0",
+                "dependencies": {},
+                "checked_at": None,
+                "stale": True
+            }
+        
+        if time.time() - snapshot["checked_at"] <= settings.HEALTH_SNAPSHOT_MAX_AGE:
+            return snapshot
+        
+        return {
+            **snapshot,
+            "status": "error" if snapshot["status"] == "error" else "degraded",
+            "stale": True
+        }
+    
+    async def check_health(self) -> Dict[str, Any]:
+        """
+        Probe the service's dependencies concurrently and store the snapshot
         
-        Args:
-            db: Database session
-            
         Returns:
             Dict containing health status
         """
@@ -31,29 +116,21 @@ class HealthService:
             "dependencies": {}
         }
         
-        # Check database connection
-        db_status = await self._check_database(db)
-        health_status["dependencies"]["database"] = db_status
-        
-        # Check auth service
-        auth_status = await self._check_service(settings.AUTH_SERVICE_URL, "auth-service")
-        health_status["dependencies"]["auth_service"] = auth_status
-        
-        # Check AI service
-        ai_status = await self._check_service(settings.AI_SERVICE_URL, "ai-service")
-        health_status["dependencies"]["ai_service"] = ai_status
-        
-        # Check journal service
-        journal_status = await self._check_service(settings.JOURNAL_SERVICE_URL, "journal-service")
-        health_status["dependencies"]["journal_service"] = journal_status
-        
-        # Check recommender service
-        recommender_status = await self._check_service(settings.RECOMMENDER_SERVICE_URL, "recommender-service")
-        health_status["dependencies"]["recommender_service"] = recommender_status
+        probes = {
+            "database": self._check_database(),
+            "auth_service": self._check_service(settings.AUTH_SERVICE_URL, "auth-service"),
+            "ai_service": self._check_service(settings.AI_SERVICE_URL, "ai-service"),
+            "journal_service": self._check_service(settings.JOURNAL_SERVICE_URL, "journal-service"),
+            "recommender_service": self._check_service(settings.RECOMMENDER_SERVICE_URL, "recommender-service"),
+            "notification_service": self._check_service(settings.NOTIFICATION_SERVICE_URL, "notification-service")
+        }
+        results = await asyncio.gather(*probes.values())
         
-        # Check notification service
-        notification_status = await self._check_service(settings.NOTIFICATION_SERVICE_URL, "notification-service")
-        health_status["dependencies"]["notification_service"] = notification_status
+        for dependency, result in zip(probes, results):
+            health_status["dependencies"][dependency] = result
+            DEPENDENCY_UP.labels(dependency=dependency).set(1 if result["status"] == "ok" else 0)
+            if result["response_time"] is not None:
+                PROBE_LATENCY.labels(dependency=dependency).observe(result["response_time"] / 1000)
         
         # Determine overall status
         if any(dep["status"] == "error" for dep in health_status["dependencies"].values()):
@@ -62,22 +139,23 @@ class HealthService:
             else:
                 health_status["status"] = "degraded"
         
+        health_status["checked_at"] = time.time()
+        health_status["stale"] = False
+        HealthService._snapshot = health_status
         return health_status
     
-    async def _check_database(self, db: AsyncSession) -> Dict[str, Any]:
+    async def _check_database(self) -> Dict[str, Any]:
         """
         Check database connection
         
-        Args:
-            db: Database session
-            
         Returns:
             Dict containing database health status
         """
         try:
             # Execute a simple query
             start_time = time.time()
-            result = await db.execute(text("SELECT 1"))
+            async with SessionLocal() as db:
+                await asyncio.wait_for(db.execute(text("SELECT 1")), timeout=settings.HEALTH_PROBE_TIMEOUT)
             response_time = time.time() - start_time
             
             return {
@@ -100,18 +178,14 @@ class HealthService:
         Args:
             url: The base URL of the service
             name: The name of the service
-            
+        
         Returns:
             Dict containing service health status
         """
         try:
             # Make a request to the service's health endpoint
             start_time = time.time()
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{url}/health",
-                    timeout=2.0
-                )
+            response = await self.get_client().get(f"{url}/health")
             response_time = time.time() - start_time
             
             if response.status_code == 200:
@@ -0,0 +1,185 @@
+import logging
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Deque, Dict, Iterable, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.message import Message
+from app.services.message_writer import MessageWriter
+
+logger = logging.getLogger(__name__)
+
+class _HistoryWindow:
+    """The latest MAX_CONVERSATION_HISTORY turns of one conversation"""
+    
+    __slots__ = ("turns", "last_id", "synced_at")
+    
+    def __init__(self, turns: Iterable[Dict[str, Any]], last_id: int, synced_at: datetime):
+        self.turns: Deque[Dict[str, Any]] = deque(turns, maxlen=settings.MAX_CONVERSATION_HISTORY)
+        self.last_id = last_id
+        # When the window was last caught up with the database
+        self.synced_at = synced_at
+
+class ConversationHistoryService:
+    """
+    Windowed, cached reads of conversation history
+    
+    The first read of a conversation loads its latest turns with a keyset
+    query on (conversation_id, id). After that the decoded window is kept in
+    memory and extended by MessageService.create_message as turns are written,
+    so a generation only needs an index probe for turns written by other
+    workers since the window was last seen.
+    
+    IDs are allocated before rows are committed (and by write-behind, well
+    before), so another worker's turn can become visible after turns with
+    higher IDs. Catching up therefore looks back HISTORY_CATCHUP_LOOKBACK
+    seconds by creation time rather than only past the last ID seen, and a
+    window that hasn't caught up for that long is reloaded.
+    """
+    
+    # Shared by every instance of the service, least recently used first
+    _windows: "OrderedDict[int, _HistoryWindow]" = OrderedDict()
+    
+    async def get_history(
+        self,
+        db: AsyncSession,
+        conversation_id: int,
+        exclude_message_ids: Iterable[int] = ()
+    ) -> List[Dict[str, str]]:
+        """
+        Get the latest turns of a conversation, oldest first
+        
+        Args:
+            db: Database session
+            conversation_id: The ID of the conversation
+            exclude_message_ids: Messages to leave out, e.g. the turn being answered
+        
+        Returns:
+            List of {"role", "content"} dicts
+        """
+        limit = settings.MAX_CONVERSATION_HISTORY
+        lookback = timedelta(seconds=settings.HISTORY_CATCHUP_LOOKBACK)
+        now = datetime.now(timezone.utc)
+        window = self._windows.get(conversation_id)
+        
+        if window is not None and now - window.synced_at > lookback:
+            # Turns committed since could be older than the lookback
+            window = None
+        
+        if window is not None:
+            # Catch up with turns committed by other workers since the last read,
+            # including ones with lower IDs than turns already in the window
+            query = select(Message).where(
+                Message.conversation_id == conversation_id,
+                Message.created_at >= window.synced_at - lookback
+            )
+            if len(window.turns) == limit:
+                # Older turns would fall out of a full window anyway
+                query = query.where(Message.id > window.turns[0]["id"])
+            result = await db.execute(query.order_by(Message.id.desc()).limit(limit))
+            
+            self._merge(window, list(result.scalars()) + MessageWriter.pending(conversation_id))
+            window.synced_at = now
+            self._windows.move_to_end(conversation_id)
+        else:
+            rows = await self.get_messages_page(db, conversation_id, limit=limit)
+            rows.reverse()
+            window = _HistoryWindow(
+                (self._decode(row) for row in rows),
+                rows[-1].id if rows else 0,
+                now
+            )
+            
+            # Turns queued for writing aren't in the database yet
+            self._merge(window, MessageWriter.pending(conversation_id))
+            self._store(conversation_id, window)
+        
+        excluded = set(exclude_message_ids)
+        return [
+            {"role": turn["role"], "content": turn["content"]}
+            for turn in window.turns
+            if turn["id"] not in excluded
+        ]
+    
+    async def get_messages_page(
+        self,
+        db: AsyncSession,
+        conversation_id: int,
+        before_id: Optional[int] = None,
+        limit: int = 20
+    ) -> List[Message]:
+        """
+        Get a page of messages, newest first, using keyset pagination
+        
+        Args:
+            db: Database session
+            conversation_id: The ID of the conversation
+            before_id: Only return messages older than this ID (the previous page's last ID)
+            limit: Maximum number of messages to return
+        
+        Returns:
+            List of messages
+        """
+        query = select(Message).where(Message.conversation_id == conversation_id)
+        if before_id is not None:
+            query = query.where(Message.id < before_id)
+        
+        result = await db.execute(query.order_by(Message.id.desc()).limit(limit))
+        return list(result.scalars())
+    
+    @classmethod
+    def append(cls, message: Message) -> None:
+        """
+        Add a newly written turn to its conversation's cached window
+        
+        Conversations that aren't cached are left alone; they are loaded on
+        their next read.
+        
+        Args:
+            message: The stored message
+        """
+        window = cls._windows.get(message.conversation_id)
+        if window is not None:
+            cls._merge(window, [message])
+    
+    @classmethod
+    def forget(cls, conversation_id: int) -> None:
+        """Drop a conversation's cached window"""
+        cls._windows.pop(conversation_id, None)
+    
+    @classmethod
+    def _merge(cls, window: _HistoryWindow, messages: List[Message]) -> None:
+        """Add messages the window doesn't have yet, keeping it ordered by ID"""
+        known = {turn["id"] for turn in window.turns}
+        new = [message for message in messages if message.id not in known]
+        if not new:
+            return
+        
+        if all(message.id > window.last_id for message in new):
+            # The usual case: turns newer than everything in the window
+            window.turns.extend(cls._decode(message) for message in sorted(new, key=lambda message: message.id))
+        else:
+            turns = sorted([*window.turns, *(cls._decode(message) for message in new)], key=lambda turn: turn["id"])
+            window.turns = deque(turns, maxlen=settings.MAX_CONVERSATION_HISTORY)
+        window.last_id = max(window.last_id, *(message.id for message in new))
+    
+    @classmethod
+    def _store(cls, conversation_id: int, window: _HistoryWindow) -> None:
+        """Cache a window, evicting the least recently used conversations"""
+        cls._windows[conversation_id] = window
+        cls._windows.move_to_end(conversation_id)
+        
+        while len(cls._windows) > settings.HISTORY_CACHE_MAX_CONVERSATIONS:
+            cls._windows.popitem(last=False)
+    
+    @staticmethod
+    def _decode(message: Message) -> Dict[str, Any]:
+        """Reduce a message row to what generation needs"""
+        return {
+            "id": message.id,
+            "role": message.role,
+            "content": message.content
+        }
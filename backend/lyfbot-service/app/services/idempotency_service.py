@@ -0,0 +1,140 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException, status
+from prometheus_client import Counter
+
+from app.core.config import settings
+from app.db.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_REQUESTS = Counter(
+    "lyfbot_idempotent_requests_total",
+    "Requests carrying an Idempotency-Key, by outcome",
+    ["outcome"]
+)
+
+class IdempotencyService:
+    """
+    Idempotency-Key handling for message submission
+    
+    The first request with a key claims it in Redis and runs normally; its
+    response is stored for IDEMPOTENCY_TTL seconds. A retry with the same
+    key gets the stored response without storing the message or generating
+    a reply again, and a retry that arrives while the original is still
+    running waits for it. Keys are scoped to the user, and reusing a key
+    for a different message is rejected. If Redis is unavailable, requests
+    run as if they had no key.
+    """
+    
+    def _key(self, user_id: str, idempotency_key: str) -> str:
+        digest = hashlib.sha256(idempotency_key.encode("utf-8")).hexdigest()
+        return f"lyfbot:idempotency:{user_id}:{digest}"
+    
+    @staticmethod
+    def fingerprint(request: Dict[str, Any]) -> str:
+        """Identifies the request body a key was first used with"""
+        return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    
+    async def begin(
+        self,
+        user_id: str,
+        idempotency_key: str,
+        fingerprint: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Claim a key, or get the response of the request that claimed it
+        
+        Args:
+            user_id: The ID of the user
+            idempotency_key: The Idempotency-Key header
+            fingerprint: The request's fingerprint
+        
+        Returns:
+            None if the caller should handle the request (and then call
+            complete or release), otherwise the stored response
+        
+        Raises:
+            HTTPException: 422 if the key was used for a different request,
+                409 if the original request is still running after
+                IDEMPOTENCY_WAIT_TIMEOUT seconds
+        """
+        key = self._key(user_id, idempotency_key)
+        pending = json.dumps({"state": "pending", "fingerprint": fingerprint})
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+        delay = 0.05
+        
+        try:
+            while True:
+                if await redis_client.set(key, pending, nx=True, ex=settings.IDEMPOTENCY_PENDING_TTL):
+                    IDEMPOTENT_REQUESTS.labels(outcome="first").inc()
+                    return None
+                
+                stored = await redis_client.get(key)
+                if stored is None:
+                    # Released or expired between the two calls
+                    continue
+                entry = json.loads(stored)
+                
+                if entry["fingerprint"] != fingerprint:
+                    IDEMPOTENT_REQUESTS.labels(outcome="mismatch").inc()
+                    raise HTTPException(
+                        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                        detail="Idempotency-Key was already used for a different message"
+                    )
+                
+                if entry["state"] == "done":
+                    IDEMPOTENT_REQUESTS.labels(outcome="replayed").inc()
+                    return entry["response"]
+                
+                if time.monotonic() >= deadline:
+                    IDEMPOTENT_REQUESTS.labels(outcome="in_progress").inc()
+                    raise HTTPException(
+                        status_code=status.HTTP_409_CONFLICT,
+                        detail="A request with this Idempotency-Key is still being processed"
+                    )
+                
+                # The original is still running
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.5)
+        
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.warning(f"Idempotency store unavailable, handling request without it: {str(e)}")
+            return None
+    
+    async def complete(
+        self,
+        user_id: str,
+        idempotency_key: str,
+        fingerprint: str,
+        response: Dict[str, Any]
+    ) -> None:
+        """
+        Store the response of a claimed key for replays
+        
+        If it can't be stored, the key is released, so a retry runs the
+        request again instead of waiting on a key that stays pending.
+        """
+        try:
+            await redis_client.set(
+                self._key(user_id, idempotency_key),
+                json.dumps({"state": "done", "fingerprint": fingerprint, "response": response}),
+                ex=settings.IDEMPOTENCY_TTL
+            )
+        except Exception as e:
+            logger.warning(f"Failed to store idempotent response: {str(e)}")
+            await self.release(user_id, idempotency_key)
+    
+    async def release(self, user_id: str, idempotency_key: str) -> None:
+        """Give up a claimed key after a failure, so a retry runs again"""
+        try:
+            await redis_client.delete(self._key(user_id, idempotency_key))
+        except Exception as e:
+            logger.warning(f"Failed to release idempotency key: {str(e)}")
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from mindlyf_shared.job_queue import JobQueue, create_job_queue
+
+from app.core.config import settings
+from app.db.redis import redis_client
+from app.db.session import SessionLocal
+from app.services.ai_service import AIService
+from app.services.conversation_service import ConversationService
+from app.services.crisis_service import CrisisService
+from app.services.feedback_service import FeedbackService
+from app.services.message_analysis_service import MessageAnalysisBatcher
+
+logger = logging.getLogger(__name__)
+
+ai_service = AIService()
+conversation_service = ConversationService()
+crisis_service = CrisisService()
+feedback_service = FeedbackService()
+analysis_batcher = MessageAnalysisBatcher(ai_service.analyze_messages)
+
+# Job type -> handler, run by the worker (app.worker)
+JOB_HANDLERS: Dict[str, Callable[..., Awaitable[Any]]] = {}
+
+# Job types that go to the escalation queue instead of the general one
+ESCALATION_JOB_TYPES = {"crisis.handle"}
+
+def job_handler(job_type: str):
+    """Register a coroutine as the handler of a job type"""
+    def register(handler: Callable[..., Awaitable[Any]]):
+        JOB_HANDLERS[job_type] = handler
+        return handler
+    return register
+
+@job_handler("message.analyze")
+async def analyze_message(message_id: int, content: str, user_id: str) -> None:
+    # Concurrent analysis jobs share one AI Service request and one upsert
+    await analysis_batcher.analyze(message_id=message_id, content=content, user_id=user_id)
+
+@job_handler("conversation.touch")
+async def touch_conversation(conversation_id: int) -> None:
+    # Jobs get their own session; the request's is closed by the time they run
+    async with SessionLocal() as db:
+        await conversation_service.update_conversation_timestamp(db, conversation_id=conversation_id)
+
+@job_handler("crisis.handle")
+async def handle_crisis(
+    user_id: str,
+    crisis_type: str,
+    message_content: str,
+    conversation_id: int,
+    message_id: Optional[int] = None,
+    detected_at: Optional[float] = None
+) -> None:
+    await crisis_service.handle_crisis(
+        user_id=user_id,
+        crisis_type=crisis_type,
+        message_content=message_content,
+        conversation_id=conversation_id,
+        message_id=message_id,
+        detected_at=detected_at
+    )
+
+@job_handler("feedback.process")
+async def process_feedback(feedback_id: Any, feedback_type: str, user_id: str) -> None:
+    async with SessionLocal() as db:
+        await feedback_service.process_feedback(
+            feedback_id=feedback_id,
+            feedback_type=feedback_type,
+            user_id=user_id,
+            db=db
+        )
+
+class JobService:
+    """Enqueues follow-up work for the worker process"""
+    
+    # Jobs run in-process because the queue was unreachable
+    _local_jobs: Set[asyncio.Task] = set()
+    
+    def __init__(self, queue: Optional[JobQueue] = None, escalation_queue: Optional[JobQueue] = None):
+        self.queue = queue or create_job_queue(settings, client=redis_client)
+        self.escalation_queue = escalation_queue or create_job_queue(
+            settings,
+            settings.ESCALATION_QUEUE_STREAM,
+            client=redis_client
+        )
+    
+    async def enqueue(
+        self,
+        job_type: str,
+        payload: Dict[str, Any],
+        idempotency_key: Optional[str] = None
+    ) -> None:
+        """
+        Enqueue a job
+        
+        If the queue is unavailable the job runs in this process instead, so
+        work such as crisis handling isn't dropped.
+        
+        Args:
+            job_type: A type registered with job_handler
+            payload: Keyword arguments for the handler (JSON-serializable)
+            idempotency_key: Key that makes enqueueing the same job twice a no-op
+        """
+        queue = self.escalation_queue if job_type in ESCALATION_JOB_TYPES else self.queue
+        try:
+            await queue.enqueue(job_type, payload, idempotency_key)
+        except Exception as e:
+            logger.error(f"Failed to enqueue {job_type}, running it in-process: {str(e)}")
+            task = asyncio.create_task(JOB_HANDLERS[job_type](**payload))
+            self._local_jobs.add(task)
+            task.add_done_callback(self._local_jobs.discard)
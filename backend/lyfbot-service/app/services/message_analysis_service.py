@@ -0,0 +1,153 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.message_analysis import MessageAnalysis
+from app.services.conversation_service import ConversationService
+
+logger = logging.getLogger(__name__)
+
+class MessageAnalysisService:
+    """Stores and reads message analyses"""
+    
+    async def upsert(
+        self,
+        db: AsyncSession,
+        analyses: List[Tuple[Dict[str, Any], Dict[str, Any]]]
+    ) -> None:
+        """
+        Insert or replace analyses with a single statement
+        
+        The conversations' last_sentiment is refreshed in the same transaction.
+        
+        Args:
+            db: Database session
+            analyses: (message, analysis) pairs; messages have message_id and user_id
+        """
+        if not analyses:
+            return
+        
+        rows = [
+            {
+                "message_id": message["message_id"],
+                "user_id": message["user_id"],
+                "sentiment": analysis.get("sentiment"),
+                "emotion": analysis.get("emotion"),
+                "topics": analysis.get("topics") or [],
+                "data": analysis
+            }
+            for message, analysis in analyses
+        ]
+        
+        statement = insert(MessageAnalysis).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=[MessageAnalysis.message_id],
+            set_={
+                "sentiment": statement.excluded.sentiment,
+                "emotion": statement.excluded.emotion,
+                "topics": statement.excluded.topics,
+                "data": statement.excluded.data,
+                "updated_at": func.now()
+            }
+        )
+        await db.execute(statement)
+        await db.execute(ConversationService.sentiment_update(row["message_id"] for row in rows))
+        await db.commit()
+    
+    async def get_analysis(self, db: AsyncSession, message_id: int) -> Optional[MessageAnalysis]:
+        """Get the stored analysis of a message"""
+        result = await db.execute(
+            select(MessageAnalysis).where(MessageAnalysis.message_id == message_id)
+        )
+        return result.scalar_one_or_none()
+
+class MessageAnalysisBatcher:
+    """
+    Collects analysis requests from concurrent jobs into batches
+    
+    Each caller waits for its own result, so a job is only acknowledged once
+    its analysis is stored; a message the AI Service didn't analyze fails
+    its own job only. A batch is sent when MESSAGE_ANALYSIS_BATCH_SIZE
+    messages are waiting or MESSAGE_ANALYSIS_BATCH_WAIT seconds after the
+    first one arrived, then stored with one upsert.
+    """
+    
+    def __init__(
+        self,
+        analyze_batch: Callable[[List[Dict[str, Any]]], Awaitable[Dict[int, Optional[Dict[str, Any]]]]],
+        analysis_service: Optional[MessageAnalysisService] = None
+    ):
+        self.analyze_batch = analyze_batch
+        self.analysis_service = analysis_service or MessageAnalysisService()
+        self._waiting: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._timer: Optional[asyncio.Task] = None
+        # Batches being processed, referenced so they aren't garbage collected
+        self._batches: Set[asyncio.Task] = set()
+    
+    async def analyze(self, message_id: int, content: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Analyze and store one message as part of a batch
+        
+        Returns:
+            The analysis, or None if the user hasn't consented
+        
+        Raises:
+            Exception: If the batch failed (the job is retried)
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.append(({"message_id": message_id, "content": content, "user_id": user_id}, future))
+        
+        if len(self._waiting) >= settings.MESSAGE_ANALYSIS_BATCH_SIZE:
+            self._send()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._send_later())
+        
+        return await future
+    
+    async def _send_later(self) -> None:
+        await asyncio.sleep(settings.MESSAGE_ANALYSIS_BATCH_WAIT)
+        self._timer = None
+        self._send()
+    
+    def _send(self) -> None:
+        """Start sending the waiting messages as one batch"""
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+        self._timer = None
+        
+        batch, self._waiting = self._waiting, []
+        if batch:
+            task = asyncio.create_task(self._process(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+    
+    async def _process(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]) -> None:
+        try:
+            analyses = await self.analyze_batch([message for message, _ in batch])
+            async with SessionLocal() as db:
+                await self.analysis_service.upsert(db, [
+                    (message, analyses[message["message_id"]])
+                    for message, _ in batch
+                    if analyses.get(message["message_id"]) is not None
+                ])
+        except Exception as e:
+            logger.error(f"Failed to analyze a batch of {len(batch)} messages: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for message, future in batch:
+            if future.done():
+                continue
+            if message["message_id"] in analyses:
+                future.set_result(analyses[message["message_id"]])
+            else:
+                # Not analyzed this time; the job is retried
+                future.set_exception(Exception(f"AI Service didn't analyze message {message['message_id']}"))
@@ -0,0 +1,317 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Dict, Optional, Set, TypeVar
+
+from fastapi import HTTPException, status
+from prometheus_client import Histogram
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.services.message_service import MessageService
+from app.services.conversation_service import ConversationService
+from app.services.ai_service import AIService
+from app.services.context_service import ContextService
+from app.services.crisis_service import CrisisService
+from app.services.job_service import JobService
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+MESSAGE_STAGE_LATENCY = Histogram(
+    "lyfbot_message_stage_seconds",
+    "Latency of each stage of the LyfBot message pipeline",
+    ["stage"]
+)
+
+class StageTimings:
+    """Records how long each pipeline stage took"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.durations: Dict[str, float] = {}
+
+    async def measure(self, stage: str, awaitable: Awaitable[T]) -> T:
+        """
+        Await a stage and record its latency
+
+        Args:
+            stage: The name of the stage
+            awaitable: The stage's coroutine
+
+        Returns:
+            The stage's result
+        """
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            elapsed = time.perf_counter() - start
+            self.durations[stage] = elapsed
+            MESSAGE_STAGE_LATENCY.labels(stage=stage).observe(elapsed)
+
+    def server_timing(self) -> str:
+        """Render the recorded latencies as a Server-Timing header value (ms)"""
+        parts = [
+            f"{stage};dur={duration * 1000:.1f}"
+            for stage, duration in self.durations.items()
+        ]
+        total = time.perf_counter() - self.started_at
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+@dataclass
+class PreparedTurn:
+    """Everything generation needs, produced by the concurrent preparation stages"""
+    conversation_id: int
+    user_message: Any
+    context: Dict[str, Any]
+    is_crisis: bool
+    crisis_type: Optional[str]
+    timings: StageTimings = field(default_factory=StageTimings)
+
+class MessagePipeline:
+    """
+    Runs a chat turn as a small dependency graph instead of a strict sequence:
+
+        conversation lookup -> user message insert ─┐
+        context gathering ──────────────────────────┼─> generation -> assistant insert
+        crisis detection ───────────────────────────┘
+
+    A detected crisis is handed to the escalation lane of the job worker as
+    soon as preparation finishes, without waiting for the reply. The
+    conversation timestamp update and message analysis don't affect the
+    reply and are handed to the job worker afterwards.
+    """
+
+    def __init__(self):
+        self.message_service = MessageService()
+        self.conversation_service = ConversationService()
+        self.ai_service = AIService()
+        self.context_service = ContextService()
+        self.crisis_service = CrisisService()
+        self.job_service = JobService()
+
+    async def prepare(
+        self,
+        db: AsyncSession,
+        user_id: str,
+        content: str,
+        conversation_id: Optional[int] = None,
+        additional_context: Optional[Dict[str, Any]] = None,
+        verified_conversation_ids: Optional[Set[int]] = None
+    ) -> PreparedTurn:
+        """
+        Run the preparation stages concurrently
+
+        Args:
+            db: Database session
+            user_id: The ID of the user
+            content: The user message
+            conversation_id: The conversation to post to (None creates one)
+            additional_context: Additional context provided by the client
+            verified_conversation_ids: Conversations already known to belong to
+                the user; the ownership lookup is skipped for these and the
+                resolved conversation is added
+
+        Returns:
+            The prepared turn
+
+        Raises:
+            HTTPException: If the conversation doesn't belong to the user
+        """
+        timings = StageTimings()
+        ContextService.record_activity(user_id)
+
+        # Neither stage touches the database session, so they can overlap with it
+        context_task = asyncio.create_task(timings.measure(
+            "context",
+            self.context_service.gather_context(
+                user_id=user_id,
+                conversation_id=conversation_id,
+                additional_context=additional_context
+            )
+        ))
+        crisis_task = asyncio.create_task(timings.measure(
+            "crisis",
+            self.crisis_service.detect_crisis(content, user_id)
+        ))
+
+        try:
+            conversation_id = await timings.measure(
+                "conversation",
+                self._resolve_conversation(
+                    db,
+                    user_id,
+                    content,
+                    conversation_id,
+                    verified_conversation_ids
+                )
+            )
+
+            user_message = await timings.measure(
+                "user_message",
+                self.message_service.create_message(
+                    db,
+                    conversation_id=conversation_id,
+                    role="user",
+                    content=content,
+                    user_id=user_id
+                )
+            )
+
+            context, (is_crisis, crisis_type) = await asyncio.gather(context_task, crisis_task)
+
+        except BaseException:
+            context_task.cancel()
+            crisis_task.cancel()
+            raise
+
+        turn = PreparedTurn(
+            conversation_id=conversation_id,
+            user_message=user_message,
+            context=context,
+            is_crisis=is_crisis,
+            crisis_type=crisis_type if is_crisis else None,
+            timings=timings
+        )
+        
+        if is_crisis:
+            await self._escalate(turn, user_id, content, detected_at=time.time())
+        
+        return turn
+
+    async def respond(
+        self,
+        db: AsyncSession,
+        turn: PreparedTurn,
+        user_id: str,
+        content: str
+    ) -> Any:
+        """
+        Generate and store the assistant reply for a prepared turn
+
+        Args:
+            db: Database session
+            turn: The prepared turn
+            user_id: The ID of the user
+            content: The user message
+
+        Returns:
+            The stored assistant message
+        """
+        response_content = await turn.timings.measure(
+            "generate",
+            self.ai_service.generate_response(
+                message=content,
+                conversation_id=turn.conversation_id,
+                user_id=user_id,
+                context=turn.context,
+                is_crisis=turn.is_crisis,
+                crisis_type=turn.crisis_type,
+                db=db,
+                exclude_message_ids=[turn.user_message.id]
+            )
+        )
+
+        return await turn.timings.measure(
+            "assistant_message",
+            self.message_service.create_message(
+                db,
+                conversation_id=turn.conversation_id,
+                role="assistant",
+                content=response_content,
+                user_id=user_id,
+                metadata=self.ai_service.version_metadata()
+            )
+        )
+
+    async def defer_followups(
+        self,
+        turn: PreparedTurn,
+        user_id: str,
+        content: str
+    ) -> None:
+        """
+        Enqueue the work that doesn't affect the reply for the job worker
+
+        Args:
+            turn: The prepared turn
+            user_id: The ID of the user
+            content: The user message
+        """
+        message_id = turn.user_message.id
+        
+        # The write-behind flush updates the conversation along with its messages
+        if not settings.MESSAGE_WRITE_BEHIND:
+            await self.job_service.enqueue(
+                "conversation.touch",
+                {"conversation_id": turn.conversation_id},
+                idempotency_key=f"conversation.touch:{message_id}"
+            )
+
+        await self.job_service.enqueue(
+            "message.analyze",
+            {"message_id": message_id, "content": content, "user_id": user_id},
+            idempotency_key=f"message.analyze:{message_id}"
+        )
+
+    async def _escalate(
+        self,
+        turn: PreparedTurn,
+        user_id: str,
+        content: str,
+        detected_at: float
+    ) -> None:
+        """Hand a detected crisis to the escalation lane"""
+        message_id = turn.user_message.id
+        await self.job_service.enqueue(
+            "crisis.handle",
+            {
+                "user_id": user_id,
+                "crisis_type": turn.crisis_type,
+                "message_content": content,
+                "conversation_id": turn.conversation_id,
+                "message_id": message_id,
+                "detected_at": detected_at
+            },
+            idempotency_key=f"crisis.handle:{message_id}"
+        )
+    
+    async def _resolve_conversation(
+        self,
+        db: AsyncSession,
+        user_id: str,
+        content: str,
+        conversation_id: Optional[int],
+        verified_conversation_ids: Optional[Set[int]] = None
+    ) -> int:
+        """Create a conversation or verify the given one belongs to the user"""
+        verified = verified_conversation_ids if verified_conversation_ids is not None else set()
+        
+        if not conversation_id:
+            conversation = await self.conversation_service.create_conversation(
+                db,
+                user_id,
+                initial_message=content
+            )
+            verified.add(conversation.id)
+            return conversation.id
+
+        if conversation_id in verified:
+            return conversation_id
+        
+        conversation = await self.conversation_service.get_conversation(
+            db,
+            conversation_id,
+            user_id
+        )
+        if not conversation:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Conversation not found"
+            )
+        verified.add(conversation_id)
+        return conversation_id
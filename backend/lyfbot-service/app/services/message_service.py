@@ -0,0 +1,210 @@
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.session import use_primary
+from app.models.conversation import Conversation
+from app.models.message import Message
+from app.models.message_analysis import MessageAnalysis
+from app.services.conversation_service import ConversationService
+from app.services.history_service import ConversationHistoryService
+from app.services.message_writer import MessageWriter
+
+logger = logging.getLogger(__name__)
+
+class MessageService:
+    """Service for storing and retrieving LyfBot messages"""
+    
+    async def create_message(
+        self,
+        db: AsyncSession,
+        conversation_id: int,
+        role: str,
+        content: str,
+        user_id: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Message:
+        """
+        Store a message in a conversation
+        
+        With MESSAGE_WRITE_BEHIND the message gets its ID immediately but the
+        row is written by the next batched flush, together with the
+        conversation's summary (message count, preview and timestamps).
+        
+        Args:
+            db: Database session
+            conversation_id: The ID of the conversation
+            role: Role of the message sender (user, assistant, system)
+            content: The message content
+            user_id: The ID of the user
+            metadata: Additional metadata
+        
+        Returns:
+            The stored message
+        """
+        if settings.MESSAGE_WRITE_BEHIND:
+            message = await MessageWriter.write(
+                conversation_id=conversation_id,
+                role=role,
+                content=content,
+                user_id=user_id,
+                metadata=metadata
+            )
+        else:
+            message = Message(
+                conversation_id=conversation_id,
+                role=role,
+                content=content,
+                user_id=user_id,
+                meta=metadata,
+                created_at=datetime.now(timezone.utc)
+            )
+            db.add(message)
+            await db.flush()
+            await db.execute(ConversationService.summary_update([(conversation_id, message.created_at)]))
+            await db.commit()
+            await db.refresh(message)
+        
+        # Keep the cached history window current without re-reading it
+        ConversationHistoryService.append(message)
+        
+        return message
+    
+    async def get_message_with_analysis(
+        self,
+        db: AsyncSession,
+        message_id: int,
+        user_id: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Get a message belonging to the user, with its analysis
+        
+        Args:
+            db: Database session
+            message_id: The ID of the message
+            user_id: The ID of the user
+        
+        A miss on the replica is retried on the primary, since the message
+        may be newer than the replica. A message still queued by the
+        write-behind writer is served from the queue, without an analysis.
+        One queued by another process isn't visible until it is flushed.
+        
+        Returns:
+            The message, or None if it doesn't exist or belongs to another user
+        """
+        query = (
+            select(Message, MessageAnalysis)
+            .join(Conversation, Conversation.id == Message.conversation_id)
+            .outerjoin(MessageAnalysis, MessageAnalysis.message_id == Message.id)
+            .where(Message.id == message_id, Conversation.user_id == user_id)
+        )
+        row = (await db.execute(query)).first()
+        if not row and use_primary(db):
+            row = (await db.execute(query)).first()
+        if row:
+            message, analysis = row
+        else:
+            message, analysis = MessageWriter.find(message_id), None
+            if message is None or message.user_id != user_id:
+                return None
+        
+        return {
+            "id": message.id,
+            "role": message.role,
+            "content": message.content,
+            "conversation_id": message.conversation_id,
+            "created_at": message.created_at,
+            "metadata": message.meta,
+            "analysis": analysis.data if analysis else None,
+            "detected_topics": analysis.topics if analysis else None,
+            "detected_sentiment": analysis.sentiment if analysis else None
+        }
+    
+    async def get_reply(
+        self,
+        db: AsyncSession,
+        message_id: int,
+        user_id: str
+    ) -> Optional[Message]:
+        """
+        Get the assistant reply to one of the user's messages
+        
+        Args:
+            db: Database session
+            message_id: The ID of the user message
+            user_id: The ID of the user
+        
+        A miss on the replica is retried on the primary, since the reply may
+        be newer than the replica.
+        
+        Returns:
+            The first assistant message after it, or None if there is none yet
+        """
+        question = (
+            select(Message.conversation_id)
+            .join(Conversation, Conversation.id == Message.conversation_id)
+            .where(Message.id == message_id, Conversation.user_id == user_id)
+            .scalar_subquery()
+        )
+        query = (
+            select(Message)
+            .where(
+                Message.conversation_id == question,
+                Message.id > message_id,
+                Message.role == "assistant"
+            )
+            .order_by(Message.id)
+            .limit(1)
+        )
+        reply = (await db.execute(query)).scalar_one_or_none()
+        if reply is None and use_primary(db):
+            reply = (await db.execute(query)).scalar_one_or_none()
+        return reply
+    
+    async def save_message_feedback(
+        self,
+        db: AsyncSession,
+        message_id: int,
+        user_id: str,
+        is_helpful: bool,
+        feedback_text: Optional[str] = None
+    ) -> None:
+        """
+        Record the user's feedback on a message in its metadata
+        
+        Args:
+            db: Database session
+            message_id: The ID of the message
+            user_id: The ID of the user
+            is_helpful: Whether the message was helpful
+            feedback_text: Optional feedback text
+        
+        A message still queued by the write-behind writer is flushed first.
+        
+        Raises:
+            ValueError: If the message doesn't exist or belongs to another user
+        """
+        query = (
+            select(Message)
+            .join(Conversation, Conversation.id == Message.conversation_id)
+            .where(Message.id == message_id, Conversation.user_id == user_id)
+        )
+        message = (await db.execute(query)).scalar_one_or_none()
+        if not message and MessageWriter.find(message_id):
+            await MessageWriter.flush()
+            message = (await db.execute(query)).scalar_one_or_none()
+        if not message:
+            raise ValueError(f"Message {message_id} not found")
+        
+        message.meta = {
+            **(message.meta or {}),
+            "feedback": {
+                "is_helpful": is_helpful,
+                "feedback_text": feedback_text
+            }
+        }
+        await db.commit()
@@ -0,0 +1,322 @@
+import asyncio
+import fcntl
+import glob
+import json
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import settings
+from app.db.session import engine
+from app.models.message import Message
+from app.services.conversation_service import ConversationService
+
+logger = logging.getLogger(__name__)
+
+class MessageQueueFullError(Exception):
+    """Raised when MESSAGE_WRITE_MAX_PENDING messages are queued and can't be written"""
+
+class MessageWriter:
+    """
+    Write-behind persistence for chat messages
+    
+    IDs are taken from the messages sequence when a message is created, so
+    the response can carry them right away, but the rows themselves are
+    queued and written by a background flush: one multi-row INSERT for every
+    queued message and one UPDATE for the conversations they belong to.
+    A flush happens every MESSAGE_WRITE_FLUSH_INTERVAL seconds or as soon as
+    MESSAGE_WRITE_BATCH_SIZE messages are queued.
+    
+    If the database is unavailable and MESSAGE_SPOOL_PATH is set, the batch is
+    appended to a local JSONL spool and fsynced, and replayed before the next
+    flush. Every process on the host shares the spool: appends hold an
+    exclusive lock on it, and a replay first renames it under that lock, so
+    rows appended during a replay go to a new spool instead of being lost.
+    Rows carry their IDs, so a replay never inserts or counts a message twice.
+    Without a spool, failed batches stay queued; once MESSAGE_WRITE_MAX_PENDING
+    messages are queued, writers flush themselves and fail if that fails too.
+    """
+    
+    # Shared by every instance, like the other in-process caches
+    _pending: List[Dict[str, Any]] = []
+    _in_flight: List[Dict[str, Any]] = []
+    _ids: Deque[int] = deque()
+    _id_block_size: int = 1
+    _id_block_fetched: int = 0
+    _id_block_at: float = 0.0
+    _id_lock: Optional[asyncio.Lock] = None
+    _flush_lock: Optional[asyncio.Lock] = None
+    _task: Optional[asyncio.Task] = None
+    _wakeup: Optional[asyncio.Event] = None
+    
+    @classmethod
+    def start(cls) -> None:
+        """Start the background flush loop"""
+        if cls._task is None or cls._task.done():
+            cls._wakeup = asyncio.Event()
+            cls._task = asyncio.create_task(cls._run())
+    
+    @classmethod
+    async def stop(cls) -> None:
+        """Stop the flush loop and write whatever is still queued"""
+        if cls._task:
+            cls._task.cancel()
+            try:
+                await cls._task
+            except asyncio.CancelledError:
+                pass
+            cls._task = None
+        await cls.flush()
+    
+    @classmethod
+    async def allocate_id(cls) -> int:
+        """
+        Take the next message ID from the sequence
+        
+        IDs are fetched in blocks of up to MESSAGE_ID_BLOCK_SIZE, so a busy
+        worker makes one round trip per block rather than per message. The
+        block size follows the load: it doubles while blocks are used up and
+        shrinks to what was used when one expires, so an idle worker doesn't
+        waste IDs.
+        
+        History is ordered by ID, so a block is dropped once it is
+        MESSAGE_ID_BLOCK_MAX_AGE seconds old: a turn written later on another
+        worker could otherwise get a higher ID than this worker's next turn
+        in the same conversation.
+        """
+        if cls._id_lock is None:
+            cls._id_lock = asyncio.Lock()
+        
+        async with cls._id_lock:
+            now = time.monotonic()
+            if now - cls._id_block_at > settings.MESSAGE_ID_BLOCK_MAX_AGE:
+                # Expired: the next block is as large as this one's use
+                cls._id_block_size = max(cls._id_block_fetched - len(cls._ids), 1)
+                cls._ids.clear()
+            elif not cls._ids:
+                # Used up in time: the next block is twice as large
+                cls._id_block_size = cls._id_block_fetched * 2
+            
+            if not cls._ids:
+                size = min(cls._id_block_size, max(settings.MESSAGE_ID_BLOCK_SIZE, 1))
+                async with engine.connect() as conn:
+                    result = await conn.execute(
+                        text("SELECT nextval('messages_id_seq') FROM generate_series(1, :n)"),
+                        {"n": size}
+                    )
+                    cls._ids.extend(row[0] for row in result)
+                cls._id_block_fetched = size
+                cls._id_block_at = now
+            return cls._ids.popleft()
+    
+    @classmethod
+    async def write(
+        cls,
+        conversation_id: int,
+        role: str,
+        content: str,
+        user_id: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Message:
+        """
+        Queue a message for writing
+        
+        Args:
+            conversation_id: The ID of the conversation
+            role: Role of the message sender (user, assistant, system)
+            content: The message content
+            user_id: The ID of the user
+            metadata: Additional metadata
+        
+        Returns:
+            The message, with its final ID and timestamp
+        
+        Raises:
+            MessageQueueFullError: If MESSAGE_WRITE_MAX_PENDING messages are
+                queued and flushing them failed
+        """
+        if len(cls._pending) >= settings.MESSAGE_WRITE_MAX_PENDING:
+            # Backpressure: write the queue before taking more
+            await cls.flush()
+            if len(cls._pending) >= settings.MESSAGE_WRITE_MAX_PENDING:
+                raise MessageQueueFullError(f"{len(cls._pending)} messages are waiting to be written")
+        
+        row = {
+            "id": await cls.allocate_id(),
+            "conversation_id": conversation_id,
+            "user_id": user_id,
+            "role": role,
+            "content": content,
+            "meta": metadata,
+            "created_at": datetime.now(timezone.utc)
+        }
+        cls._pending.append(row)
+        
+        if len(cls._pending) >= settings.MESSAGE_WRITE_BATCH_SIZE and cls._wakeup:
+            cls._wakeup.set()
+        
+        return Message(**row)
+    
+    @classmethod
+    def find(cls, message_id: int) -> Optional[Message]:
+        """A message queued by this process that isn't in the database yet, if there is one"""
+        for row in cls._in_flight + cls._pending:
+            if row["id"] == message_id:
+                return Message(**row)
+        return None
+    
+    @classmethod
+    def pending(cls, conversation_id: int) -> List[Message]:
+        """Queued messages of a conversation that aren't in the database yet, oldest first"""
+        return sorted(
+            (
+                Message(**row)
+                for row in cls._in_flight + cls._pending
+                if row["conversation_id"] == conversation_id
+            ),
+            key=lambda message: message.id
+        )
+    
+    @classmethod
+    async def flush(cls) -> None:
+        """Write the spool and the queued messages"""
+        if cls._flush_lock is None:
+            cls._flush_lock = asyncio.Lock()
+        
+        async with cls._flush_lock:
+            await cls._replay_spool()
+            
+            if not cls._pending:
+                return
+            
+            batch, cls._pending = cls._pending, []
+            cls._in_flight = batch
+            try:
+                await cls._insert(batch)
+            except Exception as e:
+                logger.error(f"Failed to write {len(batch)} messages: {str(e)}")
+                if not cls._spool(batch):
+                    # Keep them queued for the next flush
+                    cls._pending[:0] = batch
+            finally:
+                cls._in_flight = []
+    
+    @classmethod
+    async def _run(cls) -> None:
+        """Flush on a timer, or early when the batch fills up"""
+        while True:
+            try:
+                await asyncio.wait_for(cls._wakeup.wait(), timeout=settings.MESSAGE_WRITE_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            cls._wakeup.clear()
+            
+            try:
+                await cls.flush()
+            except Exception as e:
+                logger.error(f"Message flush failed: {str(e)}")
+    
+    @staticmethod
+    async def _insert(rows: List[Dict[str, Any]]) -> None:
+        """Insert messages and refresh their conversations in one transaction"""
+        # Rows are keyed by attribute name, a Core insert by column key ("meta" is the "metadata" column)
+        column_keys = {attr.key: attr.columns[0].key for attr in Message.__mapper__.column_attrs}
+        
+        async with engine.begin() as conn:
+            # Replayed rows may already be there; only the ones inserted are returned
+            result = await conn.execute(
+                insert(Message)
+                .on_conflict_do_nothing(index_elements=["id"])
+                .returning(Message.conversation_id, Message.created_at),
+                [{column_keys[name]: value for name, value in row.items()} for row in rows]
+            )
+            inserted = result.all()
+            
+            # Message counts, previews and timestamps of the touched conversations
+            if inserted:
+                await conn.execute(ConversationService.summary_update(inserted))
+    
+    @staticmethod
+    def _open_spool(path: str):
+        """Open the spool for appending, holding its lock; reopens if a replay renamed it meanwhile"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        while True:
+            spool = open(path, "a", encoding="utf-8")
+            fcntl.flock(spool.fileno(), fcntl.LOCK_EX)
+            try:
+                if os.fstat(spool.fileno()).st_ino == os.stat(path).st_ino:
+                    return spool
+            except FileNotFoundError:
+                pass
+            spool.close()
+    
+    @classmethod
+    def _spool(cls, rows: List[Dict[str, Any]]) -> bool:
+        """Append rows to the local spool and fsync it; returns False if there is no spool"""
+        path = settings.MESSAGE_SPOOL_PATH
+        if not path:
+            return False
+        
+        try:
+            # Closing the file releases the lock
+            with cls._open_spool(path) as spool:
+                for row in rows:
+                    spool.write(json.dumps({**row, "created_at": row["created_at"].isoformat()}) + "\n")
+                spool.flush()
+                os.fsync(spool.fileno())
+            logger.warning(f"Spooled {len(rows)} messages to {path}")
+            return True
+        except OSError as e:
+            logger.error(f"Failed to spool messages: {str(e)}")
+            return False
+    
+    @classmethod
+    def _claim_spool(cls, path: str) -> None:
+        """Rename the spool to a name no process appends to, under its lock"""
+        if not os.path.exists(path):
+            return
+        with cls._open_spool(path):
+            os.rename(path, f"{path}.replay-{os.getpid()}-{time.time_ns()}")
+    
+    @classmethod
+    async def _replay_spool(cls) -> None:
+        """Write spooled rows, removing each claimed spool once its rows are in the database"""
+        path = settings.MESSAGE_SPOOL_PATH
+        if not path:
+            return
+        
+        try:
+            cls._claim_spool(path)
+        except OSError as e:
+            logger.error(f"Failed to claim message spool: {str(e)}")
+        
+        # Spools claimed by earlier replays that failed, or by processes that
+        # died; replaying one twice is harmless
+        for claimed in sorted(glob.glob(f"{glob.escape(path)}.replay-*")):
+            try:
+                with open(claimed, encoding="utf-8") as spool:
+                    rows = [json.loads(line) for line in spool if line.strip()]
+            except FileNotFoundError:
+                # Replayed by another process meanwhile
+                continue
+            for row in rows:
+                row["created_at"] = datetime.fromisoformat(row["created_at"])
+            
+            if rows:
+                try:
+                    await cls._insert(rows)
+                except Exception as e:
+                    logger.error(f"Failed to replay message spool: {str(e)}")
+                    return
+                logger.info(f"Replayed {len(rows)} spooled messages")
+            
+            try:
+                os.remove(claimed)
+            except FileNotFoundError:
+                pass
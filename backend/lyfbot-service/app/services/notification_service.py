@@ -1,13 +1,18 @@
-import httpx
 import logging
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from enum import Enum
 
+from mindlyf_shared.notification_outbox import NotificationOutbox
+
 from app.core.config import settings
+from app.services.escalation_service import EscalationDispatcher
 
 logger = logging.getLogger(__name__)
 
+# One outbox per process; its dispatcher starts with the first notification
+notification_outbox = NotificationOutbox("lyfbot-service", settings)
+
 class LyfBotNotificationType(str, Enum):
     # Conversation notifications
     CONVERSATION_STARTED = "lyfbot_conversation_started"
@@ -82,7 +87,34 @@ class LyfBotNotificationService:
     def __init__(self):
         self.notification_service_url = settings.NOTIFICATION_SERVICE_URL
         self.timeout = 5.0
+    
+    def build_payload(
+        self,
+        notification_type: LyfBotNotificationType,
+        recipient_id: str,
+        channels: List[str],
+        variables: Dict[str, Any],
+        priority: str = "normal",
+        scheduled_for: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """Build the Notification Service request body"""
+        payload = {
+            "type": notification_type.value,
+            "recipientId": recipient_id,
+            "channels": channels,
+            "variables": {
+                **variables,
+                "timestamp": datetime.utcnow().isoformat(),
+            },
+            "priority": priority,
+            "serviceSource": "lyfbot-service"
+        }
+        
+        if scheduled_for:
+            payload["scheduledFor"] = scheduled_for.isoformat()
         
+        return payload
+    
     async def send_notification(
         self,
         notification_type: LyfBotNotificationType,
@@ -92,43 +124,28 @@ class LyfBotNotificationService:
         priority: str = "normal",
         scheduled_for: Optional[datetime] = None
     ) -> bool:
-        """Send notification to the notification service"""
+        """
+        Queue a notification for the notification service
+        
+        Written to the local outbox and sent in a batch by its dispatcher;
+        returns False only if it couldn't be queued.
+        """
         try:
-            payload = {
-                "type": notification_type.value,
-                "recipientId": recipient_id,
-                "channels": channels,
-                "variables": {
-                    **variables,
-                    "timestamp": datetime.utcnow().isoformat(),
-                },
-                "priority": priority,
-                "serviceSource": "lyfbot-service"
-            }
+            payload = self.build_payload(
+                notification_type,
+                recipient_id,
+                channels,
+                variables,
+                priority=priority,
+                scheduled_for=scheduled_for
+            )
             
-            if scheduled_for:
-                payload["scheduledFor"] = scheduled_for.isoformat()
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.notification_service_url}/api/notification",
-                    json=payload,
-                    headers={
-                        "X-Service-Name": "lyfbot-service",
-                        "Content-Type": "application/json"
-                    },
-                    timeout=self.timeout
-                )
-                
-                if response.status_code == 200:
-                    logger.info(f"LyfBot notification sent: {notification_type.value} to user {recipient_id}")
-                    return True
-                else:
-                    logger.warning(f"Failed to send notification: HTTP {response.status_code}")
-                    return False
-                    
+            if await notification_outbox.add([payload]):
+                logger.info(f"LyfBot notification queued: {notification_type.value} to user {recipient_id}")
+            return True
+        
         except Exception as e:
-            logger.error(f"Failed to send LyfBot notification: {str(e)}")
+            logger.error(f"Failed to queue LyfBot notification: {str(e)}")
             # Don't raise - notifications are non-critical
             return False
     
@@ -163,16 +180,22 @@ class LyfBotNotificationService:
         severity_level: str,
         detected_indicators: List[str],
         immediate_resources: List[Dict[str, str]],
-        professional_contact_made: bool = False
+        professional_contact_made: bool = False,
+        detected_at: Optional[float] = None
     ):
-        """Notify about crisis detection"""
+        """
+        Notify about crisis detection
+        
+        Goes through the escalation dispatcher (retries and the escalation
+        outbox) rather than the best-effort path other notifications use.
+        """
         priority = "high" if severity_level in ["high", "critical"] else "normal"
         channels = ["in_app", "email"]
         
         if severity_level == "critical":
             channels.append("sms")
         
-        await self.send_notification(
+        payload = self.build_payload(
             LyfBotNotificationType.CRISIS_DETECTED,
             user_id,
             channels,
@@ -188,6 +211,7 @@ class LyfBotNotificationService:
             },
             priority=priority
         )
+        await EscalationDispatcher().deliver("/api/notification", payload, detected_at)
     
     async def notify_intervention_triggered(
         self,
@@ -563,11 +587,13 @@ class LyfBotNotificationService:
         reminder_schedule: List[Dict[str, Any]],
         timezone: str = "UTC"
     ):
-        """Schedule wellness and check-in reminders"""
-        for reminder in reminder_schedule:
-            scheduled_time = datetime.fromisoformat(reminder["time"])
-            
-            await self.send_notification(
+        """
+        Schedule wellness and check-in reminders
+        
+        The whole schedule is written to the outbox in one transaction.
+        """
+        payloads = [
+            self.build_payload(
                 LyfBotNotificationType.CHECK_IN_REMINDER,
                 user_id,
                 ["push"],
@@ -578,5 +604,13 @@ class LyfBotNotificationService:
                     "scheduledReminder": True
                 },
                 priority="normal",
-                scheduled_for=scheduled_time
-            ) 
\ No newline at end of file
+                scheduled_for=datetime.fromisoformat(reminder["time"])
+            )
+            for reminder in reminder_schedule
+        ]
+        
+        try:
+            queued = await notification_outbox.add(payloads)
+            logger.info(f"Scheduled {queued} of {len(payloads)} wellness reminders for user {user_id}")
+        except Exception as e:
+            logger.error(f"Failed to schedule wellness reminders: {str(e)}")
@@ -0,0 +1,116 @@
+import logging
+import math
+import time
+import uuid
+from typing import Dict, Tuple
+
+from fastapi import HTTPException, status
+from prometheus_client import Counter
+
+from app.core.config import settings
+from app.db.redis import redis_client
+from app.services.crisis_service import CrisisService
+from app.services.crisis_screen import POSITIVE
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_REJECTIONS = Counter(
+    "lyfbot_rate_limit_rejections_total",
+    "Message requests rejected by the rate limiter",
+    ["budget", "scope"]
+)
+RATE_LIMIT_CRISIS_BYPASSES = Counter(
+    "lyfbot_rate_limit_crisis_bypasses_total",
+    "Message requests let through over the limit because they may indicate a crisis",
+    ["budget"]
+)
+
+# Sliding window over sorted sets of request timestamps. The user and global
+# windows are checked and recorded together, so a rejected request uses neither.
+# Returns {0, 0} if allowed, or {1 for user / 2 for global, ms until a slot frees up}
+SLIDING_WINDOW = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limits = {tonumber(ARGV[3]), tonumber(ARGV[4])}
+for i, key in ipairs(KEYS) do
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+    if redis.call('ZCARD', key) >= limits[i] then
+        local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+        return {i, math.max(tonumber(oldest[2]) + window - now, 1)}
+    end
+end
+for _, key in ipairs(KEYS) do
+    redis.call('ZADD', key, now, ARGV[5])
+    redis.call('PEXPIRE', key, window)
+end
+return {0, 0}
+"""
+
+class RateLimiter:
+    """
+    Per-user and global sliding-window limits on message requests
+    
+    Streaming and non-streaming requests have separate budgets
+    (RATE_LIMIT_BUDGETS), each with a per-user and a global limit per
+    RATE_LIMIT_WINDOW seconds. Over a limit, messages with a crisis signal
+    (a clear positive from the local crisis screen, or risk cues) are still
+    let through; everything else is rejected. If Redis is unavailable,
+    requests are allowed.
+    """
+    
+    _script = None
+    
+    @classmethod
+    def get_script(cls):
+        if cls._script is None:
+            cls._script = redis_client.register_script(SLIDING_WINDOW)
+        return cls._script
+    
+    async def check(self, user_id: str, budget: str, content: str) -> None:
+        """
+        Record a request against the user's and the global limit
+        
+        Args:
+            user_id: The ID of the user
+            budget: "messages" or "streams"
+            content: The message, screened for crisis indicators when over the limit
+        
+        Raises:
+            HTTPException: 429 with Retry-After if a limit is reached
+        """
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        
+        user_limit, global_limit = self._limits(budget)
+        window_ms = settings.RATE_LIMIT_WINDOW * 1000
+        
+        try:
+            scope, retry_ms = await self.get_script()(
+                keys=[f"lyfbot:ratelimit:{budget}:user:{user_id}", f"lyfbot:ratelimit:{budget}:global"],
+                args=[int(time.time() * 1000), window_ms, user_limit, global_limit, uuid.uuid4().hex]
+            )
+        except Exception as e:
+            logger.warning(f"Rate limiter unavailable, allowing request: {str(e)}")
+            return
+        
+        if not scope:
+            return
+        
+        # Someone reaching out in a crisis is never turned away
+        screen = CrisisService.get_screen().screen(content)
+        if screen.decision == POSITIVE or screen.cued:
+            RATE_LIMIT_CRISIS_BYPASSES.labels(budget=budget).inc()
+            return
+        
+        scope = "user" if scope == 1 else "global"
+        RATE_LIMIT_REJECTIONS.labels(budget=budget, scope=scope).inc()
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many messages, please wait a moment" if scope == "user" else "LyfBot is busy, please try again shortly",
+            headers={"Retry-After": str(math.ceil(retry_ms / 1000))}
+        )
+    
+    @staticmethod
+    def _limits(budget: str) -> Tuple[int, int]:
+        limits: Dict[str, int] = settings.RATE_LIMIT_BUDGETS[budget]
+        return limits["user"], limits["global"]
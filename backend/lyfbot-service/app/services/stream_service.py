@@ -0,0 +1,261 @@
+import asyncio
+import json
+import logging
+from typing import Any, AsyncGenerator, Dict, Optional, Set
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.redis import redis_client
+from app.db.session import SessionLocal
+from app.services.ai_service import AIService, SSE_HEARTBEAT
+from app.services.message_service import MessageService
+
+logger = logging.getLogger(__name__)
+
+class StreamReplayBuffer:
+    """
+    Short-lived buffer of the SSE frames of one streamed reply
+    
+    Frames are appended to a Redis stream, so the Redis entry ID doubles as
+    the SSE event ID and a reconnecting client can continue from its
+    Last-Event-ID with XREAD.
+    """
+    
+    def _key(self, stream_id: int) -> str:
+        return f"lyfbot:stream:{stream_id}"
+    
+    def _meta_key(self, stream_id: int) -> str:
+        return f"lyfbot:stream:{stream_id}:meta"
+    
+    async def open(self, stream_id: int, user_id: str, conversation_id: int) -> None:
+        """
+        Register a new stream
+        
+        Args:
+            stream_id: The ID of the user message being answered
+            user_id: The ID of the user who owns the stream
+            conversation_id: The ID of the conversation
+        """
+        meta_key = self._meta_key(stream_id)
+        await redis_client.hset(meta_key, mapping={
+            "user_id": user_id,
+            "conversation_id": conversation_id
+        })
+        await redis_client.expire(meta_key, settings.STREAM_BUFFER_TTL)
+    
+    async def get_meta(self, stream_id: int) -> Dict[str, str]:
+        """Get the owner and conversation of a stream (empty once expired)"""
+        return await redis_client.hgetall(self._meta_key(stream_id))
+    
+    async def append(
+        self,
+        stream_id: int,
+        frame: str,
+        first: bool = False,
+        final: bool = False
+    ) -> str:
+        """
+        Append a frame
+        
+        Args:
+            stream_id: The ID of the stream
+            frame: The encoded SSE frame
+            first: Whether this is the first frame of the stream
+            final: Whether this is the last frame of the stream
+        
+        Returns:
+            The frame's event ID
+        """
+        key = self._key(stream_id)
+        event_id = await redis_client.xadd(key, {"frame": frame, "final": int(final)})
+        
+        # The first frame creates the stream key, which needs a TTL in case the
+        # producer dies; the last frame gives readers the full TTL to catch up
+        if first or final:
+            await redis_client.expire(key, settings.STREAM_BUFFER_TTL)
+            await redis_client.expire(self._meta_key(stream_id), settings.STREAM_BUFFER_TTL)
+        
+        return event_id
+    
+    async def tail(
+        self,
+        stream_id: int,
+        last_event_id: Optional[str] = None
+    ) -> AsyncGenerator[str, None]:
+        """
+        Yield frames after last_event_id, following the stream until its final frame
+        
+        Args:
+            stream_id: The ID of the stream
+            last_event_id: The last event the client received (None from the start)
+        
+        Yields:
+            SSE frames tagged with their event ID, and heartbeats while idle
+        """
+        key = self._key(stream_id)
+        cursor = last_event_id or "0-0"
+        block_ms = int(settings.STREAM_HEARTBEAT_INTERVAL * 1000)
+        
+        while True:
+            response = await redis_client.xread({key: cursor}, count=100, block=block_ms)
+            
+            if not response:
+                # Nothing new; stop if the buffer expired, otherwise keep the client alive
+                if not await redis_client.exists(self._meta_key(stream_id)):
+                    return
+                yield SSE_HEARTBEAT
+                continue
+            
+            for event_id, fields in response[0][1]:
+                cursor = event_id
+                yield f"id: {event_id}\n{fields['frame']}"
+                if fields.get("final") == "1":
+                    return
+
+class StreamService:
+    """
+    Runs streamed replies independently of the client connection so that a
+    client that drops mid-answer can reconnect and resume from its
+    Last-Event-ID instead of asking for a second generation.
+    """
+    
+    # Keep references to running producers so they aren't garbage collected
+    _producers: Set[asyncio.Task] = set()
+    
+    def __init__(self):
+        self.buffer = StreamReplayBuffer()
+        self.ai_service = AIService()
+        self.message_service = MessageService()
+    
+    async def start(
+        self,
+        stream_id: int,
+        user_id: str,
+        conversation_id: int,
+        **stream_kwargs: Any
+    ) -> bool:
+        """
+        Start generating a reply into the replay buffer
+        
+        Args:
+            stream_id: The ID of the user message being answered
+            user_id: The ID of the user
+            conversation_id: The ID of the conversation
+            stream_kwargs: Arguments for AIService.stream_response (without db)
+        
+        Returns:
+            False if the buffer is unavailable and the caller should stream directly
+        """
+        if not settings.STREAM_RESUME_ENABLED:
+            return False
+        
+        try:
+            await self.buffer.open(stream_id, user_id, conversation_id)
+        except Exception as e:
+            logger.error(f"Stream replay buffer unavailable: {str(e)}")
+            return False
+        
+        task = asyncio.create_task(self._produce(
+            stream_id,
+            user_id=user_id,
+            conversation_id=conversation_id,
+            **stream_kwargs
+        ))
+        self._producers.add(task)
+        task.add_done_callback(self._producers.discard)
+        return True
+    
+    def tail(self, stream_id: int, last_event_id: Optional[str] = None) -> AsyncGenerator[str, None]:
+        """Follow a buffered stream from last_event_id"""
+        return self.buffer.tail(stream_id, last_event_id)
+    
+    async def resume(
+        self,
+        db: AsyncSession,
+        stream_id: int,
+        user_id: str,
+        last_event_id: Optional[str] = None
+    ) -> Optional[AsyncGenerator[str, None]]:
+        """
+        Resume a stream for a reconnecting client
+        
+        While the reply is buffered it is replayed from Redis; once the buffer
+        has expired the completed reply is served from the database.
+        
+        Args:
+            db: Database session
+            stream_id: The ID of the user message that was being answered
+            user_id: The ID of the user
+            last_event_id: The last event the client received
+        
+        Returns:
+            The frames to send, or None if the stream is unknown to this user
+        """
+        meta = await self.buffer.get_meta(stream_id)
+        if meta:
+            if meta.get("user_id") != user_id:
+                return None
+            return self.tail(stream_id, last_event_id)
+        
+        reply = await self.message_service.get_reply(db, stream_id, user_id)
+        if not reply:
+            return None
+        return self._replay_stored(reply)
+    
+    async def _replay_stored(self, reply: Any) -> AsyncGenerator[str, None]:
+        """Send a completed reply from the database as a single frame"""
+        yield self.ai_service._sse_frame(json.dumps({
+            "message_part": reply.content,
+            "conversation_id": reply.conversation_id,
+            "is_final": False
+        }))
+        
+        # A reply cut short upstream ends the way the live stream did
+        if (reply.meta or {}).get("incomplete"):
+            yield self.ai_service._sse_frame(json.dumps({
+                "error": "Response generation failed",
+                "conversation_id": reply.conversation_id,
+                "message_id": reply.id
+            }), event="error")
+            return
+        
+        yield self.ai_service._sse_frame(json.dumps({
+            "message_part": "",
+            "conversation_id": reply.conversation_id,
+            "message_id": reply.id,
+            "is_final": True
+        }), event="done")
+    
+    async def _produce(self, stream_id: int, **stream_kwargs: Any) -> None:
+        """Generate a reply into the buffer, with a session of its own"""
+        first = True
+        final_sent = False
+        try:
+            async with SessionLocal() as db:
+                async for frame in self.ai_service.stream_response(db=db, **stream_kwargs):
+                    # Readers generate their own heartbeats
+                    if frame.startswith(":"):
+                        continue
+                    
+                    final = frame.startswith(("event: done", "event: error"))
+                    await self.buffer.append(stream_id, frame, first=first, final=final)
+                    first = False
+                    final_sent = final
+        
+        except Exception as e:
+            logger.error(f"Streamed reply {stream_id} failed: {str(e)}")
+        finally:
+            if not final_sent:
+                try:
+                    await self.buffer.append(
+                        stream_id,
+                        self.ai_service._sse_frame(
+                            json.dumps({"error": "Response generation failed"}),
+                            event="error"
+                        ),
+                        first=first,
+                        final=True
+                    )
+                except Exception as e:
+                    logger.error(f"Failed to close stream {stream_id}: {str(e)}")
@@ -0,0 +1,118 @@
+"""
+Background job worker for the LyfBot service
+
+Runs the jobs enqueued by the API (message analysis, crisis handling,
+feedback processing) in a separate process, along with the crisis event
+retention sweep and the archiving of inactive conversations:
+
+    python -m app.worker [--lane jobs|escalations|all]
+
+Crisis handling has its own lane: a separate queue with its own workers, a
+warm connection to the Notification Service and the escalation outbox.
+Both lanes run by default; in production the escalation lane should run in
+its own process so nothing else shares its event loop.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+
+from mindlyf_shared.job_queue import create_job_queue
+from mindlyf_shared.job_worker import JobWorker, LaneLimits
+from prometheus_client import start_http_server
+
+from app.core.config import settings
+from app.db.redis import redis_client
+from app.services.archive_service import ArchiveService
+from app.services.crisis_event_service import CrisisEventService
+from app.services.escalation_service import EscalationDispatcher
+from app.services.job_service import JOB_HANDLERS
+
+logger = logging.getLogger(__name__)
+
+worker = JobWorker("lyfbot", JOB_HANDLERS, settings)
+
+async def sweep_crisis_events() -> None:
+    """Enforce the crisis event retention window periodically"""
+    event_service = CrisisEventService()
+    while True:
+        try:
+            await event_service.sweep_expired()
+        except Exception as e:
+            logger.error(f"Crisis event retention sweep failed: {str(e)}")
+        await asyncio.sleep(settings.CRISIS_EVENT_SWEEP_INTERVAL)
+
+async def archive_inactive_conversations() -> None:
+    """Move long-inactive conversations to cold storage periodically"""
+    archive_service = ArchiveService()
+    while True:
+        try:
+            await archive_service.sweep()
+        except Exception as e:
+            logger.error(f"Conversation archive sweep failed: {str(e)}")
+        await asyncio.sleep(settings.ARCHIVE_SWEEP_INTERVAL)
+
+async def run_worker(lane: str = "all") -> None:
+    """Run the selected lanes until SIGTERM/SIGINT"""
+    consumer = f"{socket.gethostname()}-{os.getpid()}"
+    
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stopping.set)
+    
+    lanes = []
+    background = []
+    
+    if lane in ("jobs", "all"):
+        queue = create_job_queue(settings, client=redis_client)
+        limits = LaneLimits(
+            max_attempts=settings.JOB_MAX_ATTEMPTS,
+            timeout=settings.JOB_TIMEOUT,
+            retry_base_delay=settings.JOB_RETRY_BASE_DELAY,
+            max_retry_delay=300
+        )
+        lanes.append(worker.run_lane(queue, settings.JOB_WORKER_CONCURRENCY, limits, consumer, stopping))
+        background.append(worker.report_depth("jobs", queue))
+        background.append(sweep_crisis_events())
+        background.append(archive_inactive_conversations())
+    
+    if lane in ("escalations", "all"):
+        # A short visibility timeout, so an escalation claimed by a worker that
+        # crashed is picked up again within seconds
+        queue = create_job_queue(
+            settings,
+            settings.ESCALATION_QUEUE_STREAM,
+            visibility_timeout=settings.ESCALATION_VISIBILITY_TIMEOUT,
+            client=redis_client
+        )
+        limits = LaneLimits(
+            max_attempts=settings.ESCALATION_JOB_MAX_ATTEMPTS,
+            timeout=settings.ESCALATION_JOB_TIMEOUT,
+            retry_base_delay=settings.ESCALATION_RETRY_BASE_DELAY,
+            max_retry_delay=settings.ESCALATION_OUTBOX_INTERVAL
+        )
+        lanes.append(worker.run_lane(queue, settings.ESCALATION_WORKER_CONCURRENCY, limits, consumer, stopping))
+        background.append(worker.report_depth("escalations", queue))
+        background.append(EscalationDispatcher.keep_warm())
+        background.append(EscalationDispatcher.run_outbox())
+    
+    tasks = [asyncio.create_task(coro) for coro in background]
+    logger.info(f"Worker {consumer} started ({lane})")
+    
+    await asyncio.gather(*lanes)
+    
+    for task in tasks:
+        task.cancel()
+    logger.info(f"Worker {consumer} stopped")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LyfBot job worker")
+    parser.add_argument("--lane", choices=["jobs", "escalations", "all"], default="all")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    start_http_server(settings.JOB_WORKER_METRICS_PORT)
+    asyncio.run(run_worker(args.lane))
@@ -0,0 +1,100 @@
+"""
+Compare per-turn latency of REST and WebSocket chat against a running LyfBot service
+
+Usage:
+    python benchmarks/chat_overhead.py --base-url http://localhost:8003 --token <JWT> --turns 20
+
+Both paths post the same messages to one conversation. REST pays for token
+validation and the conversation ownership lookup on every turn, while the
+WebSocket channel authenticates once per connection. The total time of each
+turn includes generation, so run this against a stubbed or fast model
+endpoint to isolate the overhead.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from typing import List
+
+import httpx
+import websockets
+
+def summarize(label: str, samples: List[float]) -> None:
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(
+        f"{label:<10} n={len(samples):<4} "
+        f"median={statistics.median(samples) * 1000:8.1f}ms  "
+        f"p95={p95 * 1000:8.1f}ms  "
+        f"mean={statistics.mean(samples) * 1000:8.1f}ms"
+    )
+
+async def bench_rest(base_url: str, token: str, turns: int, message: str) -> List[float]:
+    samples = []
+    conversation_id = None
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=120.0) as client:
+        for _ in range(turns):
+            start = time.perf_counter()
+            response = await client.post(
+                "/api/v1/messages",
+                json={"content": message, "conversation_id": conversation_id}
+            )
+            response.raise_for_status()
+            samples.append(time.perf_counter() - start)
+            conversation_id = response.json()["conversation_id"]
+    
+    return samples
+
+async def bench_ws(base_url: str, token: str, turns: int, message: str) -> List[float]:
+    samples = []
+    conversation_id = None
+    url = base_url.replace("http", "ws", 1) + "/api/v1/ws/chat"
+    
+    async with websockets.connect(url) as socket:
+        await socket.send(json.dumps({"type": "auth", "token": token}))
+        ready = json.loads(await socket.recv())
+        if ready.get("type") != "ready":
+            raise RuntimeError(f"WebSocket authentication failed: {ready}")
+        
+        for _ in range(turns):
+            request_id = uuid.uuid4().hex
+            start = time.perf_counter()
+            await socket.send(json.dumps({
+                "type": "message",
+                "request_id": request_id,
+                "conversation_id": conversation_id,
+                "content": message
+            }))
+            
+            while True:
+                frame = json.loads(await socket.recv())
+                if frame.get("request_id") != request_id:
+                    continue
+                if frame["type"] == "accepted":
+                    conversation_id = frame["conversation_id"]
+                elif frame["type"] == "done":
+                    break
+                elif frame["type"] == "error":
+                    raise RuntimeError(f"Turn failed: {frame['data']}")
+            
+            samples.append(time.perf_counter() - start)
+    
+    return samples
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8003")
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--message", default="How can I relax before sleeping?")
+    args = parser.parse_args()
+    
+    summarize("REST", await bench_rest(args.base_url, args.token, args.turns, args.message))
+    summarize("WebSocket", await bench_ws(args.base_url, args.token, args.turns, args.message))
+
+if __name__ == "__main__":
+    asyncio.run(main())
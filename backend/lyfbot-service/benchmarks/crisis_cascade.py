@@ -0,0 +1,180 @@
+"""
+Measure the crisis detection cascade on labelled sets of messages
+
+Usage:
+    python -m benchmarks.crisis_cascade
+    python -m benchmarks.crisis_cascade --ai-service-url http://localhost:8000 --token <service token>
+
+crisis_cases.jsonl is the set the screen's rules were tuned on.
+crisis_cases_holdout.jsonl was written separately and must not be used to
+write rules; add new rules only for failures seen in crisis_cases.jsonl,
+or its figures stop saying anything about messages the rules haven't seen.
+
+Reports recall, false positives, the share of messages that need the remote
+model and the latency of the local screen, for each set. Without
+--ai-service-url, ambiguous messages are counted as if the remote model
+always answered correctly (upper bound) and as if it always timed out, with
+the fail-safe applied to cued messages only (CRISIS_FAIL_SAFE) and to all of
+them (CRISIS_FAIL_SAFE_UNCUED as well). Missed crises are listed, since those
+are the errors that matter most.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.crisis_screen import AMBIGUOUS, NEGATIVE, POSITIVE, CrisisScreen
+
+CASES_PATH = os.path.join(os.path.dirname(__file__), "crisis_cases.jsonl")
+HOLDOUT_PATH = os.path.join(os.path.dirname(__file__), "crisis_cases_holdout.jsonl")
+
+def load_cases(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as cases:
+        return [json.loads(line) for line in cases if line.strip()]
+
+def percentile(samples: List[float], fraction: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+async def ask_remote(
+    url: str,
+    token: str,
+    timeout: float,
+    content: str
+) -> Tuple[Optional[bool], float]:
+    """Returns the remote verdict (None on timeout or error) and the time taken"""
+    import httpx
+    
+    start = time.perf_counter()
+    try:
+        async with httpx.AsyncClient(base_url=url) as client:
+            response = await asyncio.wait_for(
+                client.post(
+                    "/api/v1/lyfbot/detect-crisis",
+                    json={"content": content, "user_id": "benchmark"},
+                    headers={"Authorization": f"Bearer {token}", "X-User-ID": "benchmark"}
+                ),
+                timeout=timeout
+            )
+            response.raise_for_status()
+            return response.json()["is_crisis"], time.perf_counter() - start
+    except Exception:
+        return None, time.perf_counter() - start
+
+def rate(hits: int, total: int) -> str:
+    return f"{hits}/{total} ({hits / total * 100:.1f}%)" if total else "n/a"
+
+async def run(args: argparse.Namespace) -> None:
+    screen = CrisisScreen(cue_threshold=args.cue_threshold, positive_above=args.positive_above)
+    for index, path in enumerate(args.cases):
+        if index:
+            print()
+        print(f"== {os.path.basename(path)}")
+        await report(load_cases(path), screen, args)
+
+async def report(cases: List[Dict[str, Any]], screen: CrisisScreen, args: argparse.Namespace) -> None:    
+    # Warm up the regex engine so the first case isn't an outlier
+    for case in cases[:10]:
+        screen.screen(case["text"])
+    
+    latencies = []
+    results = []
+    for case in cases:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            result = screen.screen(case["text"])
+        latencies.append((time.perf_counter() - start) / args.repeat)
+        results.append((case, result))
+    
+    positives = [(case, result) for case, result in results if case["label"] != "none"]
+    negatives = [(case, result) for case, result in results if case["label"] == "none"]
+    ambiguous = [(case, result) for case, result in results if result.decision == AMBIGUOUS]
+    
+    print(f"Cases: {len(cases)} ({len(positives)} crisis, {len(negatives)} not)")
+    print(f"Screen latency: p50={percentile(latencies, 0.5) * 1e6:.1f}us  "
+          f"p99={percentile(latencies, 0.99) * 1e6:.1f}us  max={max(latencies) * 1e6:.1f}us")
+    print(f"Remote call rate: {rate(len(ambiguous), len(cases))}")
+    
+    print("\nScreen decisions by kind:")
+    by_kind: Dict[str, Counter] = {}
+    for case, result in results:
+        by_kind.setdefault(case.get("kind", "-"), Counter())[result.decision] += 1
+    for kind, counts in sorted(by_kind.items()):
+        print(f"  {kind:<14} " + "  ".join(f"{d}={counts[d]}" for d in (NEGATIVE, AMBIGUOUS, POSITIVE)))
+    
+    local_hits = sum(1 for _, result in positives if result.decision == POSITIVE)
+    missed = [(case, result) for case, result in positives if result.decision == NEGATIVE]
+    local_false_positives = sum(1 for _, result in negatives if result.decision == POSITIVE)
+    
+    print(f"\nDecided locally: recall {rate(local_hits, len(positives))}, "
+          f"false positives {rate(local_false_positives, len(negatives))}")
+    
+    if args.ai_service_url:
+        remote_latencies = []
+        remote_hits = remote_false_positives = failures = 0
+        for case, result in ambiguous:
+            verdict, elapsed = await ask_remote(args.ai_service_url, args.token, args.timeout, case["text"])
+            remote_latencies.append(elapsed)
+            if verdict is None:
+                failures += 1
+                # The service falls back to CRISIS_FAIL_SAFE for cued messages only, by default
+                verdict = result.cued
+            if case["label"] != "none" and verdict:
+                remote_hits += 1
+            elif case["label"] == "none" and verdict:
+                remote_false_positives += 1
+        
+        print(f"Cascade: recall {rate(local_hits + remote_hits, len(positives))}, "
+              f"false positives {rate(local_false_positives + remote_false_positives, len(negatives))}")
+        if remote_latencies:
+            print(f"Remote latency: p50={percentile(remote_latencies, 0.5) * 1000:.1f}ms  "
+                  f"p99={percentile(remote_latencies, 0.99) * 1000:.1f}ms  "
+                  f"timeouts/errors={failures}")
+            if percentile(remote_latencies, 0.99) >= args.timeout:
+                print(f"WARNING: remote p99 is over the {args.timeout}s deadline; "
+                      f"the fail-safe is deciding these messages, not the model")
+    else:
+        ambiguous_positives = sum(1 for case, _ in ambiguous if case["label"] != "none")
+        ambiguous_negatives = len(ambiguous) - ambiguous_positives
+        cued_positives = sum(1 for case, result in ambiguous if case["label"] != "none" and result.cued)
+        cued_negatives = sum(1 for case, result in ambiguous if case["label"] == "none" and result.cued)
+        print(f"Cascade, remote always right: recall {rate(local_hits + ambiguous_positives, len(positives))}, "
+              f"false positives {rate(local_false_positives, len(negatives))}")
+        print(f"Cascade, remote always down (fail-safe on cued): recall {rate(local_hits + cued_positives, len(positives))}, "
+              f"false positives {rate(local_false_positives + cued_negatives, len(negatives))}")
+        print(f"Cascade, remote always down (fail-safe on all): recall {rate(local_hits + ambiguous_positives, len(positives))}, "
+              f"false positives {rate(local_false_positives + ambiguous_negatives, len(negatives))}")
+    
+    if missed:
+        print("\nCrises the screen ruled out:")
+        for case, result in missed:
+            print(f"  [{case['label']}] {case['text']!r} score={result.score:.1f}")
+    
+    uncued = [(case, result) for case, result in positives if result.decision == AMBIGUOUS and not result.cued]
+    if uncued:
+        print("\nCrises left to the remote model without cues (missed in an outage unless CRISIS_FAIL_SAFE_UNCUED):")
+        for case, result in uncued:
+            print(f"  [{case['label']}] {case['text']!r}")
+    
+    false_positives = [(case, result) for case, result in negatives if result.decision == POSITIVE]
+    if false_positives:
+        print("\nFalse positives decided locally:")
+        for case, result in false_positives:
+            print(f"  {case['text']!r} rules={result.rules}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", nargs="+", default=[CASES_PATH, HOLDOUT_PATH])
+    parser.add_argument("--cue-threshold", type=float, default=1.0)
+    parser.add_argument("--positive-above", type=float, default=4.5)
+    parser.add_argument("--repeat", type=int, default=200, help="Screen runs per case for the latency figures")
+    parser.add_argument("--ai-service-url")
+    parser.add_argument("--token", default="")
+    parser.add_argument("--timeout", type=float, default=3.0, help="Remote deadline (CRISIS_REMOTE_TIMEOUT)")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import json
+import os
+
+import pytest
+
+from app.services.crisis_screen import AMBIGUOUS, NEGATIVE, POSITIVE, CrisisScreen
+
+BENCHMARKS = os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks")
+
+def load_cases(name: str):
+    with open(os.path.join(BENCHMARKS, name), encoding="utf-8") as cases:
+        return [json.loads(line) for line in cases if line.strip()]
+
+@pytest.mark.parametrize("name", ["crisis_cases.jsonl", "crisis_cases_holdout.jsonl"])
+def test_no_crisis_is_ruled_out_locally(name: str):
+    screen = CrisisScreen()
+    ruled_out = [
+        case["text"] for case in load_cases(name)
+        if case["label"] != "none" and screen.screen(case["text"]).decision == NEGATIVE
+    ]
+    
+    assert ruled_out == []
+
+@pytest.mark.parametrize("text", ["Hi", "ok thank you!", "hey there, how are you?", "Good morning"])
+def test_small_talk_is_negative(text: str):
+    assert CrisisScreen().screen(text).decision == NEGATIVE
+
+@pytest.mark.parametrize("text", ["I took 30 tablets", "Had a good day at work today", "I'm dying to see the new movie"])
+def test_uncued_message_is_ambiguous(text: str):
+    result = CrisisScreen().screen(text)
+    
+    assert result.decision == AMBIGUOUS
+    assert not result.cued
+
+def test_cues_and_phrases():
+    screen = CrisisScreen()
+    
+    assert screen.screen("I want to kill myself").decision == POSITIVE
+    negated = screen.screen("I would never kill myself, but I feel really low")
+    assert negated.decision == AMBIGUOUS
+    assert negated.cued
+    # A crisis word doesn't make a message small talk
+    assert screen.screen("ok thanks, goodbye everyone").decision == AMBIGUOUS
@@ -0,0 +1,128 @@
+import json
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import pytest
+from aiohttp import web
+
+from app.core.config import settings
+from app.services import ai_service as ai_service_module
+from app.services.ai_service import AIService
+
+CHUNKS = ["I'm ", "sorry ", "today ", "was ", "hard."]
+
+def completion_chunk(model: str, delta: Dict[str, Any], finish_reason=None) -> bytes:
+    event = {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion.chunk",
+        "created": 0,
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+    }
+    return f"data: {json.dumps(event)}\n\n".encode("utf-8")
+
+async def chat_completions(request: web.Request) -> web.StreamResponse:
+    """OpenAI-compatible streaming endpoint sending CHUNKS one event at a time"""
+    body = await request.json()
+    request.app["requests"].append(body)
+    
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+    await response.prepare(request)
+    await response.write(completion_chunk(body["model"], {"role": "assistant", "content": ""}))
+    for chunk in CHUNKS:
+        await response.write(completion_chunk(body["model"], {"content": chunk}))
+    await response.write(completion_chunk(body["model"], {}, finish_reason="stop"))
+    await response.write(b"data: [DONE]\n\n")
+    await response.write_eof()
+    return response
+
+async def lyfbot_generate(request: web.Request) -> web.Response:
+    """The AI Service is down, so the reply falls back to the provider"""
+    return web.json_response({"detail": "unavailable"}, status=503)
+
+class RecordingMessageService:
+    def __init__(self):
+        self.created: List[Dict[str, Any]] = []
+    
+    async def create_message(self, db, **fields):
+        self.created.append(fields)
+        return SimpleNamespace(id=len(self.created), **fields)
+
+@pytest.fixture
+async def stub_server():
+    app = web.Application()
+    app["requests"] = []
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    app.router.add_post("/api/v1/lyfbot/generate", lyfbot_generate)
+    
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    yield SimpleNamespace(url=f"http://{host}:{port}", requests=app["requests"])
+    await runner.cleanup()
+
+@pytest.fixture
+def ai_service(stub_server, monkeypatch):
+    async def service_token():
+        return "service-token"
+    
+    async def no_history(*args, **kwargs):
+        return []
+    
+    monkeypatch.setattr(settings, "AI_SERVICE_URL", stub_server.url)
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "OPENAI_BASE_URL", f"{stub_server.url}/v1")
+    monkeypatch.setattr(AIService, "_openai_client", None)
+    monkeypatch.setattr(ai_service_module, "get_service_token", service_token)
+    
+    service = AIService()
+    service.message_service = RecordingMessageService()
+    monkeypatch.setattr(service, "_get_conversation_history", no_history)
+    return service
+
+def parse_frames(frames: List[str]) -> List[Dict[str, Any]]:
+    parsed = []
+    for frame in frames:
+        if frame.startswith(":"):
+            continue
+        event = "message"
+        for line in frame.strip().split("\n"):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                parsed.append({"event": event, **json.loads(line[len("data: "):])})
+    return parsed
+
+async def test_fallback_streams_chunks_in_order_and_stores_the_reply(ai_service, stub_server):
+    frames = [
+        frame
+        async for frame in ai_service.stream_response(
+            message="Today was hard",
+            conversation_id=7,
+            user_id="user-1",
+            db=object()
+        )
+    ]
+    events = parse_frames(frames)
+    
+    # One frame per provider chunk, in the order they were produced, then "done"
+    assert [event["message_part"] for event in events[:-1]] == CHUNKS
+    assert all(event["event"] == "message" and not event["is_final"] for event in events[:-1])
+    assert events[-1]["event"] == "done"
+    assert events[-1]["is_final"] is True
+    assert events[-1]["message_id"] == 1
+    
+    # The stored reply is exactly what was streamed
+    stored = ai_service.message_service.created
+    assert len(stored) == 1
+    assert stored[0]["role"] == "assistant"
+    assert stored[0]["content"] == "".join(CHUNKS)
+    assert stored[0]["conversation_id"] == 7
+    assert stored[0]["metadata"] == AIService.version_metadata()
+    
+    # The provider was asked once, for a stream ending with the user's message
+    assert len(stub_server.requests) == 1
+    assert stub_server.requests[0]["stream"] is True
+    assert stub_server.requests[0]["messages"][-1] == {"role": "user", "content": "Today was hard"}
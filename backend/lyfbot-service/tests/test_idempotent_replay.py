@@ -0,0 +1,105 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+import pytest
+from fastapi import Response
+
+from app.api.v1.endpoints import messages as messages_endpoint
+from app.models.message import Message
+from app.schemas.message import MessageRequest
+from app.services import idempotency_service as idempotency_module
+
+USER = {"id": "user-1"}
+
+class MemoryRedis:
+    """The parts of the Redis client IdempotencyService uses, in memory"""
+    
+    def __init__(self):
+        self.data: Dict[str, str] = {}
+    
+    async def set(self, key: str, value: str, nx: bool = False, ex: Optional[int] = None) -> bool:
+        if nx and key in self.data:
+            return False
+        self.data[key] = value
+        return True
+    
+    async def get(self, key: str) -> Optional[str]:
+        return self.data.get(key)
+    
+    async def delete(self, key: str) -> int:
+        return 1 if self.data.pop(key, None) is not None else 0
+
+@pytest.fixture
+def redis(monkeypatch) -> MemoryRedis:
+    client = MemoryRedis()
+    monkeypatch.setattr(idempotency_module, "redis_client", client)
+    return client
+
+@pytest.fixture
+def answers(monkeypatch) -> list:
+    """Replaces the pipeline: each call stores and returns a new assistant message"""
+    calls = []
+    
+    async def answer_message(db, message: MessageRequest, response: Response, user_id: str) -> Message:
+        calls.append(message.content)
+        return Message(
+            id=len(calls),
+            conversation_id=7,
+            user_id=user_id,
+            role="assistant",
+            content=f"Reply to {message.content}",
+            meta={"model": "stub"},
+            created_at=datetime(2026, 1, 1, tzinfo=timezone.utc)
+        )
+    
+    monkeypatch.setattr(messages_endpoint, "_answer_message", answer_message)
+    return calls
+
+async def send(content: str, key: str) -> Any:
+    response = Response()
+    result = await messages_endpoint.send_message(
+        MessageRequest(content=content, conversation_id=7),
+        response,
+        idempotency_key=key,
+        db=None,
+        current_user=USER
+    )
+    return result, response
+
+async def test_retry_replays_the_first_reply(redis: MemoryRedis, answers: list):
+    first, first_response = await send("Hello", "key-1")
+    replay, replay_response = await send("Hello", "key-1")
+    
+    assert answers == ["Hello"]
+    assert "Idempotent-Replayed" not in first_response.headers
+    assert replay_response.headers["Idempotent-Replayed"] == "true"
+    assert replay == {
+        "id": first.id,
+        "role": "assistant",
+        "content": "Reply to Hello",
+        "conversation_id": 7,
+        "created_at": "2026-01-01T00:00:00Z",
+        "metadata": {"model": "stub"}
+    }
+
+async def test_new_key_runs_again(redis: MemoryRedis, answers: list):
+    await send("Hello", "key-1")
+    await send("Hello", "key-2")
+    
+    assert answers == ["Hello", "Hello"]
+
+async def test_key_is_released_when_the_reply_cant_be_stored(redis: MemoryRedis, answers: list, monkeypatch):
+    original_set = redis.set
+    
+    async def set_pending_only(key: str, value: str, nx: bool = False, ex: Optional[int] = None) -> bool:
+        if not nx:
+            raise ConnectionError("Redis is down")
+        return await original_set(key, value, nx=nx, ex=ex)
+    
+    monkeypatch.setattr(redis, "set", set_pending_only)
+    await send("Hello", "key-1")
+    
+    assert redis.data == {}
+    monkeypatch.setattr(redis, "set", original_set)
+    await send("Hello", "key-1")
+    assert answers == ["Hello", "Hello"]
@@ -0,0 +1,98 @@
+import pytest
+from mindlyf_shared.job_queue import SQLiteJobQueue
+from mindlyf_shared.job_worker import JobWorker, LaneLimits
+
+from app.core.config import settings
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch) -> SQLiteJobQueue:
+    monkeypatch.setattr(settings, "JOB_POLL_INTERVAL", 0)
+    return SQLiteJobQueue(str(tmp_path / "jobs.db"), settings, visibility_timeout=60)
+
+async def test_claims_jobs_in_order_and_hides_claimed_ones(queue: SQLiteJobQueue):
+    assert await queue.enqueue("summary.update", {"n": 1})
+    assert await queue.enqueue("summary.update", {"n": 2})
+    
+    jobs = await queue.claim("worker-1", 10)
+    
+    assert [job.payload["n"] for job in jobs] == [1, 2]
+    assert all(job.attempts == 0 for job in jobs)
+    assert await queue.claim("worker-2", 10) == []
+    assert await queue.depth() == {"waiting": 0, "in_progress": 2, "dead": 0}
+
+async def test_claim_respects_count(queue: SQLiteJobQueue):
+    for n in range(3):
+        await queue.enqueue("summary.update", {"n": n})
+    
+    assert [job.payload["n"] for job in await queue.claim("worker-1", 2)] == [0, 1]
+    assert [job.payload["n"] for job in await queue.claim("worker-1", 2)] == [2]
+
+async def test_idempotency_key_dedupes_enqueues(queue: SQLiteJobQueue):
+    assert await queue.enqueue("crisis.handle", {"n": 1}, idempotency_key="message-1")
+    assert not await queue.enqueue("crisis.handle", {"n": 2}, idempotency_key="message-1")
+    
+    [job] = await queue.claim("worker-1", 10)
+    assert job.payload == {"n": 1}
+    assert job.idempotency_key == "message-1"
+    
+    # The key still applies once the job is done
+    await queue.ack(job)
+    assert not await queue.enqueue("crisis.handle", {"n": 3}, idempotency_key="message-1")
+    assert await queue.claim("worker-1", 10) == []
+    assert await queue.depth() == {"waiting": 0, "in_progress": 0, "dead": 0}
+
+async def test_retry_counts_attempts_and_waits_for_the_delay(queue: SQLiteJobQueue):
+    await queue.enqueue("summary.update", {"n": 1})
+    await queue.enqueue("summary.update", {"n": 2})
+    first, second = await queue.claim("worker-1", 10)
+    
+    await queue.retry(first, 0)
+    await queue.retry(second, 3600)
+    
+    [job] = await queue.claim("worker-1", 10)
+    assert job.payload == {"n": 1}
+    assert job.attempts == 1
+    assert await queue.depth() == {"waiting": 1, "in_progress": 1, "dead": 0}
+
+async def test_unacknowledged_job_is_reclaimed_after_visibility_timeout(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_POLL_INTERVAL", 0)
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.db"), settings, table="escalations", visibility_timeout=0)
+    await queue.enqueue("crisis.handle", {"n": 1})
+    
+    [job] = await queue.claim("worker-1", 10)
+    [reclaimed] = await queue.claim("worker-2", 10)
+    
+    assert reclaimed.id == job.id
+    # The lost delivery counts as a failed attempt
+    assert reclaimed.attempts == 1
+
+async def test_job_that_keeps_killing_its_worker_is_dead_lettered(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_POLL_INTERVAL", 0)
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.db"), settings, visibility_timeout=0)
+    await queue.enqueue("summary.update", {"n": 1})
+    runs = []
+    
+    async def handler(n: int) -> None:
+        runs.append(n)
+    
+    worker = JobWorker("test_lost", {"summary.update": handler}, settings)
+    limits = LaneLimits(max_attempts=3, timeout=1, retry_base_delay=0, max_retry_delay=0)
+    
+    # Three workers claim the job and die without acknowledging it; a fourth claims it
+    for consumer in ("worker-1", "worker-2", "worker-3", "worker-4"):
+        [job] = await queue.claim(consumer, 10)
+    assert job.attempts == 3
+    
+    await worker.run_job(queue, job, limits)
+    
+    assert runs == []
+    assert await queue.depth() == {"waiting": 0, "in_progress": 0, "dead": 1}
+
+async def test_dead_letter_removes_the_job_from_the_queue(queue: SQLiteJobQueue):
+    await queue.enqueue("summary.update", {"n": 1})
+    [job] = await queue.claim("worker-1", 10)
+    
+    await queue.dead_letter(job, "ValueError: bad payload")
+    
+    assert await queue.claim("worker-1", 10) == []
+    assert await queue.depth() == {"waiting": 0, "in_progress": 0, "dead": 1}
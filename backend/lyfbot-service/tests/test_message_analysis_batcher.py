@@ -0,0 +1,54 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from app.core.config import settings
+from app.services import message_analysis_service as analysis_module
+from app.services.message_analysis_service import MessageAnalysisBatcher
+
+class NoSession:
+    async def __aenter__(self) -> "NoSession":
+        return self
+    
+    async def __aexit__(self, *exc: Any) -> None:
+        return None
+
+class RecordingStore:
+    """Stands in for MessageAnalysisService: records what would be upserted"""
+    
+    def __init__(self):
+        self.stored: List[int] = []
+    
+    async def upsert(self, db: Any, analyses: list) -> None:
+        self.stored.extend(message["message_id"] for message, _ in analyses)
+
+@pytest.fixture(autouse=True)
+def batch_settings(monkeypatch):
+    monkeypatch.setattr(settings, "MESSAGE_ANALYSIS_BATCH_SIZE", 3)
+    monkeypatch.setattr(settings, "MESSAGE_ANALYSIS_BATCH_WAIT", 0.01)
+    monkeypatch.setattr(analysis_module, "SessionLocal", NoSession)
+
+async def test_message_the_ai_service_skipped_fails_only_its_own_job():
+    calls = []
+    
+    async def analyze_batch(items: List[Dict[str, Any]]) -> Dict[int, Optional[Dict[str, Any]]]:
+        calls.append([item["message_id"] for item in items])
+        # 2 failed on the AI Service, 3's user hasn't consented
+        return {1: {"sentiment": "positive"}, 3: None}
+    
+    store = RecordingStore()
+    batcher = MessageAnalysisBatcher(analyze_batch, store)
+    
+    first, second, third = await asyncio.gather(
+        batcher.analyze(1, "Good day", "user-1"),
+        batcher.analyze(2, "Bad day", "user-2"),
+        batcher.analyze(3, "A day", "user-3"),
+        return_exceptions=True
+    )
+    
+    assert calls == [[1, 2, 3]]
+    assert first == {"sentiment": "positive"}
+    assert isinstance(second, Exception)
+    assert third is None
+    assert store.stored == [1]
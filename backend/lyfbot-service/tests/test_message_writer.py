@@ -0,0 +1,86 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+import pytest
+
+from app.core.config import settings
+from app.services.message_service import MessageService
+from app.services.message_writer import MessageWriter
+
+def message_row(message_id: int, user_id: str = "user-1") -> Dict[str, Any]:
+    return {
+        "id": message_id,
+        "conversation_id": 7,
+        "user_id": user_id,
+        "role": "user",
+        "content": f"Message {message_id}",
+        "meta": None,
+        "created_at": datetime(2026, 1, 1, tzinfo=timezone.utc)
+    }
+
+@pytest.fixture
+def inserted(tmp_path, monkeypatch) -> List[List[int]]:
+    """Replaces the database: records the IDs of each inserted batch"""
+    monkeypatch.setattr(settings, "MESSAGE_SPOOL_PATH", str(tmp_path / "spool.jsonl"))
+    monkeypatch.setattr(MessageWriter, "_pending", [])
+    batches = []
+    
+    async def insert(rows: List[Dict[str, Any]]) -> None:
+        batches.append([row["id"] for row in rows])
+    
+    monkeypatch.setattr(MessageWriter, "_insert", staticmethod(insert))
+    return batches
+
+async def test_replay_writes_and_removes_the_spool(inserted: list, tmp_path):
+    assert MessageWriter._spool([message_row(1), message_row(2)])
+    
+    await MessageWriter._replay_spool()
+    
+    assert inserted == [[1, 2]]
+    assert list(tmp_path.iterdir()) == []
+
+async def test_rows_spooled_during_a_replay_are_kept(inserted: list, monkeypatch):
+    MessageWriter._spool([message_row(1)])
+    
+    async def insert_while_another_process_spools(rows: List[Dict[str, Any]]) -> None:
+        inserted.append([row["id"] for row in rows])
+        MessageWriter._spool([message_row(2)])
+    
+    monkeypatch.setattr(MessageWriter, "_insert", staticmethod(insert_while_another_process_spools))
+    await MessageWriter._replay_spool()
+    await MessageWriter._replay_spool()
+    
+    assert inserted == [[1], [2]]
+
+async def test_failed_replay_is_retried(inserted: list, monkeypatch):
+    MessageWriter._spool([message_row(1)])
+    
+    async def database_down(rows: List[Dict[str, Any]]) -> None:
+        raise ConnectionError("database is down")
+    
+    with monkeypatch.context() as down:
+        down.setattr(MessageWriter, "_insert", staticmethod(database_down))
+        await MessageWriter._replay_spool()
+    await MessageWriter._replay_spool()
+    
+    assert inserted == [[1]]
+
+class NoRows:
+    def first(self) -> None:
+        return None
+
+class EmptyDatabase:
+    """A session that finds nothing: the message hasn't been flushed yet"""
+    
+    async def execute(self, query: Any) -> NoRows:
+        return NoRows()
+
+async def test_queued_message_is_served_before_it_is_flushed(monkeypatch):
+    monkeypatch.setattr(MessageWriter, "_pending", [message_row(5)])
+    service = MessageService()
+    
+    message = await service.get_message_with_analysis(EmptyDatabase(), message_id=5, user_id="user-1")
+    
+    assert message["id"] == 5
+    assert message["analysis"] is None
+    assert await service.get_message_with_analysis(EmptyDatabase(), message_id=5, user_id="user-2") is None
@@ -0,0 +1,64 @@
+from typing import Dict, List
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.services.rate_limiter import RateLimiter
+
+class WindowScript:
+    """Stands in for the SLIDING_WINDOW script: counts requests per key, never expiring"""
+    
+    def __init__(self):
+        self.requests: Dict[str, List[int]] = {}
+    
+    async def __call__(self, keys: List[str], args: list) -> List[int]:
+        now, window, user_limit, global_limit = args[0], args[1], args[2], args[3]
+        for scope, (key, limit) in enumerate(zip(keys, (user_limit, global_limit)), start=1):
+            stamps = self.requests.setdefault(key, [])
+            if len(stamps) >= limit:
+                return [scope, max(stamps[0] + window - now, 1)]
+        for key in keys:
+            self.requests[key].append(now)
+        return [0, 0]
+
+@pytest.fixture
+def limiter(monkeypatch) -> RateLimiter:
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(settings, "RATE_LIMIT_WINDOW", 60)
+    monkeypatch.setattr(settings, "RATE_LIMIT_BUDGETS", {"messages": {"user": 5, "global": 1000}})
+    monkeypatch.setattr(RateLimiter, "_script", WindowScript())
+    return RateLimiter()
+
+async def test_flood_of_ordinary_messages_gets_429(limiter: RateLimiter):
+    for _ in range(5):
+        await limiter.check("user-1", "messages", "Can you help me plan my week?")
+    
+    with pytest.raises(HTTPException) as rejected:
+        await limiter.check("user-1", "messages", "Can you help me plan my week?")
+    
+    assert rejected.value.status_code == 429
+    assert 1 <= int(rejected.value.headers["Retry-After"]) <= 60
+
+async def test_uncued_messages_are_limited(limiter: RateLimiter):
+    for _ in range(5):
+        await limiter.check("user-1", "messages", "Had a good day at work today")
+    
+    with pytest.raises(HTTPException):
+        await limiter.check("user-1", "messages", "I'm dying to see the new movie")
+
+@pytest.mark.parametrize("content", [
+    "I want to kill myself",
+    "I feel hopeless and worthless, like a burden to everyone",
+])
+async def test_crisis_signal_bypasses_the_limit(limiter: RateLimiter, content: str):
+    for _ in range(5):
+        await limiter.check("user-1", "messages", "Can you help me plan my week?")
+    
+    await limiter.check("user-1", "messages", content)
+
+async def test_limits_are_per_user(limiter: RateLimiter):
+    for _ in range(5):
+        await limiter.check("user-1", "messages", "Can you help me plan my week?")
+    
+    await limiter.check("user-2", "messages", "Can you help me plan my week?")
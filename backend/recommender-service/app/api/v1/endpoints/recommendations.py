@@ -1,8 +1,10 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Query
 from sqlalchemy.orm import Session
+from mindlyf_shared.context_events import ContextEventPublisher
 
 from app.api.dependencies import get_db
+from app.core.config import settings
 from app.core.security import validate_token
 from app.schemas.recommendation import (
     RecommendationRequest,
@@ -17,6 +19,7 @@ router = APIRouter()
 recommendation_service = RecommendationService()
 ai_service = AIService()
 user_service = UserService()
+event_publisher = ContextEventPublisher("recommender", settings)
 
 @router.post("", response_model=List[RecommendationResponse])
 async def get_recommendations(
@@ -161,6 +164,9 @@ async def create_recommendation(
             created_by=user_id
         )
         
+        # The catalog changed for every user, let context caches refresh
+        await event_publisher.publish("recommendation.created", None)
+        
         return recommendation
     except HTTPException:
         raise
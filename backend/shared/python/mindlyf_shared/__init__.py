@@ -0,0 +1 @@
+"""Modules shared by MindLyf's Python services"""
@@ -0,0 +1,67 @@
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import redis.asyncio as redis
+
+logger = logging.getLogger(__name__)
+
+class ContextEventPublisher:
+    """
+    Publishes lightweight change events for services that cache user context
+    
+    Events are small JSON documents on the CONTEXT_EVENTS_CHANNEL Redis channel:
+        
+        {"source": "journal", "event": "journal.created", "user_id": "..."}
+    
+    A user_id of None means the change affects every user. Events carry
+    identifiers only, never user content.
+    """
+    
+    def __init__(self, source: str, settings: Any):
+        """
+        Args:
+            source: The publishing service, e.g. "journal"
+            settings: The service's settings, with REDIS_URL and CONTEXT_EVENTS_CHANNEL
+        """
+        self.source = source
+        self.channel = settings.CONTEXT_EVENTS_CHANNEL
+        self.redis_client = redis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=1.0,
+            socket_connect_timeout=1.0
+        )
+    
+    async def publish(
+        self,
+        event: str,
+        user_id: Optional[str],
+        data: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """
+        Publish a change event
+        
+        Args:
+            event: The event name, e.g. "journal.created"
+            user_id: The affected user (None for every user)
+            data: Optional identifiers describing the change
+            
+        Returns:
+            True if the event was published
+        """
+        payload = {
+            "source": self.source,
+            "event": event,
+            "user_id": user_id,
+            "data": data or {},
+            "occurred_at": datetime.utcnow().isoformat()
+        }
+        
+        try:
+            await self.redis_client.publish(self.channel, json.dumps(payload))
+            return True
+        except Exception as e:
+            # Don't raise - consumers fall back to a short cache TTL
+            logger.error(f"Failed to publish context event {event}: {str(e)}")
+            return False
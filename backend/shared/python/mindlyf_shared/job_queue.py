@@ -0,0 +1,427 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+import redis.asyncio as redis
+from redis.exceptions import ResponseError
+
+logger = logging.getLogger(__name__)
+
+# Adds a job unless its idempotency key was seen, atomically. The key is only
+# set once XADD succeeded, so a failed enqueue can be retried.
+# KEYS: the stream, the idempotency key ("" for none); ARGV: the job, the key's TTL
+ENQUEUE = """
+if KEYS[2] ~= '' and redis.call('EXISTS', KEYS[2]) == 1 then
+    return 0
+end
+redis.call('XADD', KEYS[1], '*', 'job', ARGV[1])
+if KEYS[2] ~= '' then
+    redis.call('SET', KEYS[2], 1, 'EX', ARGV[2])
+end
+return 1
+"""
+
+# Moves due retries from the delayed set back onto the stream, atomically, so
+# a worker dying halfway can't drop a job.
+# KEYS: the delayed set, the stream; ARGV: now, the most to move
+PROMOTE = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], 0, ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, member in ipairs(due) do
+    redis.call('ZREM', KEYS[1], member)
+    redis.call('XADD', KEYS[2], '*', 'job', string.sub(member, string.find(member, '|', 1, true) + 1))
+end
+return #due
+"""
+
+@dataclass
+class Job:
+    """A unit of background work"""
+    type: str
+    payload: Dict[str, Any]
+    idempotency_key: Optional[str] = None
+    # Failed attempts so far, including deliveries to workers that died
+    attempts: int = 0
+    enqueued_at: float = field(default_factory=time.time)
+    # Assigned by the queue when the job is claimed
+    id: Optional[str] = None
+    
+    def encode(self) -> str:
+        data = asdict(self)
+        data.pop("id")
+        return json.dumps(data)
+    
+    @classmethod
+    def decode(cls, raw: str, job_id: Optional[str] = None) -> "Job":
+        return cls(**json.loads(raw), id=job_id)
+
+class JobQueue(ABC):
+    """
+    Durable at-least-once job queue
+    
+    Jobs are claimed for visibility_timeout seconds (JOB_VISIBILITY_TIMEOUT
+    by default); a job that isn't acknowledged in that time (the worker
+    died) is handed to another worker, and the lost delivery counts as a
+    failed attempt. Handlers must therefore tolerate running twice. An
+    idempotency key makes enqueueing the same job twice a no-op.
+    """
+    
+    def __init__(self, settings: Any, visibility_timeout: Optional[float] = None):
+        """
+        Args:
+            settings: The service's settings, with the JOB_* queue options
+            visibility_timeout: Seconds a claimed job stays invisible
+                (JOB_VISIBILITY_TIMEOUT by default)
+        """
+        self.settings = settings
+        self.visibility_timeout = (
+            settings.JOB_VISIBILITY_TIMEOUT if visibility_timeout is None else visibility_timeout
+        )
+    
+    @abstractmethod
+    async def enqueue(
+        self,
+        job_type: str,
+        payload: Dict[str, Any],
+        idempotency_key: Optional[str] = None
+    ) -> bool:
+        """
+        Add a job
+        
+        Returns:
+            False if a job with the same idempotency key was already enqueued
+        """
+    
+    @abstractmethod
+    async def claim(self, consumer: str, count: int) -> List[Job]:
+        """Claim up to count jobs, waiting briefly if there are none"""
+    
+    @abstractmethod
+    async def ack(self, job: Job) -> None:
+        """Mark a claimed job as done"""
+    
+    @abstractmethod
+    async def retry(self, job: Job, delay: float) -> None:
+        """Make a claimed job available again after delay seconds"""
+    
+    @abstractmethod
+    async def dead_letter(self, job: Job, error: str) -> None:
+        """Give up on a claimed job"""
+    
+    @abstractmethod
+    async def depth(self) -> Dict[str, int]:
+        """Number of jobs per state"""
+
+class RedisJobQueue(JobQueue):
+    """
+    Job queue on a Redis stream with a consumer group
+    
+    Retries wait in a sorted set scored by due time and are moved back onto
+    the stream when due; jobs that exhaust their attempts go to a dead-letter
+    stream.
+    """
+    
+    GROUP = "workers"
+    
+    def __init__(
+        self,
+        client: redis.Redis,
+        stream: str,
+        settings: Any,
+        visibility_timeout: Optional[float] = None
+    ):
+        super().__init__(settings, visibility_timeout)
+        self.client = client
+        self.stream = stream
+        self.delayed_key = f"{stream}:delayed"
+        self.dead_key = f"{stream}:dead"
+        self._group_ready = False
+        self._enqueue_script = client.register_script(ENQUEUE)
+        self._promote_script = client.register_script(PROMOTE)
+    
+    async def enqueue(
+        self,
+        job_type: str,
+        payload: Dict[str, Any],
+        idempotency_key: Optional[str] = None
+    ) -> bool:
+        job = Job(type=job_type, payload=payload, idempotency_key=idempotency_key)
+        added = await self._enqueue_script(
+            keys=[self.stream, f"{self.stream}:idem:{idempotency_key}" if idempotency_key else ""],
+            args=[job.encode(), self.settings.JOB_IDEMPOTENCY_TTL]
+        )
+        return bool(added)
+    
+    async def claim(self, consumer: str, count: int) -> List[Job]:
+        await self._ensure_group()
+        await self._promote_script(keys=[self.delayed_key, self.stream], args=[time.time(), 100])
+        
+        # Jobs claimed by a worker that stopped without acknowledging them
+        _, entries, *_ = await self.client.xautoclaim(
+            self.stream,
+            self.GROUP,
+            consumer,
+            min_idle_time=int(self.visibility_timeout * 1000),
+            count=count
+        )
+        entries = [(entry_id, fields) for entry_id, fields in entries if fields]
+        if entries:
+            return await self._count_lost_deliveries(entries)
+        
+        response = await self.client.xreadgroup(
+            self.GROUP,
+            consumer,
+            {self.stream: ">"},
+            count=count,
+            block=int(self.settings.JOB_POLL_INTERVAL * 1000)
+        )
+        return [
+            Job.decode(fields["job"], entry_id)
+            for entry_id, fields in (response[0][1] if response else [])
+            if fields
+        ]
+    
+    async def ack(self, job: Job) -> None:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.xack(self.stream, self.GROUP, job.id)
+            pipe.xdel(self.stream, job.id)
+            await pipe.execute()
+    
+    async def retry(self, job: Job, delay: float) -> None:
+        retried = Job(
+            type=job.type,
+            payload=job.payload,
+            idempotency_key=job.idempotency_key,
+            attempts=job.attempts + 1,
+            enqueued_at=job.enqueued_at
+        )
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.zadd(self.delayed_key, {f"{uuid.uuid4().hex}|{retried.encode()}": time.time() + delay})
+            pipe.xack(self.stream, self.GROUP, job.id)
+            pipe.xdel(self.stream, job.id)
+            await pipe.execute()
+    
+    async def dead_letter(self, job: Job, error: str) -> None:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.xadd(
+                self.dead_key,
+                {"job": job.encode(), "error": error},
+                maxlen=self.settings.JOB_DEAD_LETTER_MAX,
+                approximate=True
+            )
+            pipe.xack(self.stream, self.GROUP, job.id)
+            pipe.xdel(self.stream, job.id)
+            await pipe.execute()
+    
+    async def depth(self) -> Dict[str, int]:
+        await self._ensure_group()
+        waiting = in_progress = 0
+        for group in await self.client.xinfo_groups(self.stream):
+            if group["name"] == self.GROUP:
+                in_progress = group["pending"]
+                waiting = group.get("lag") or 0
+        
+        return {
+            "waiting": waiting,
+            "in_progress": in_progress,
+            "delayed": await self.client.zcard(self.delayed_key),
+            "dead": await self.client.xlen(self.dead_key)
+        }
+    
+    async def _ensure_group(self) -> None:
+        if self._group_ready:
+            return
+        try:
+            await self.client.xgroup_create(self.stream, self.GROUP, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+    
+    async def _count_lost_deliveries(self, entries: List[tuple]) -> List[Job]:
+        """
+        Decode reclaimed entries, adding each delivery before this one to the
+        job's attempts: those workers died without acknowledging it
+        """
+        async with self.client.pipeline(transaction=False) as pipe:
+            for entry_id, _ in entries:
+                pipe.xpending_range(self.stream, self.GROUP, min=entry_id, max=entry_id, count=1)
+            pending = await pipe.execute()
+        
+        jobs = []
+        for (entry_id, fields), info in zip(entries, pending):
+            job = Job.decode(fields["job"], entry_id)
+            # XAUTOCLAIM counted this delivery too
+            job.attempts += max(info[0]["times_delivered"] - 1, 0) if info else 1
+            jobs.append(job)
+        return jobs
+
+class SQLiteJobQueue(JobQueue):
+    """
+    Job queue in a local SQLite file
+    
+    A stand-in for the Redis queue in tests and single-process development;
+    the file is shared by the API and the worker on the same host. Each
+    queue is a table in the file.
+    """
+    
+    def __init__(
+        self,
+        path: str,
+        settings: Any,
+        table: str = "jobs",
+        visibility_timeout: Optional[float] = None
+    ):
+        super().__init__(settings, visibility_timeout)
+        self.path = path
+        self.table = table
+        self._execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                type TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                idempotency_key TEXT UNIQUE,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                enqueued_at REAL NOT NULL,
+                available_at REAL NOT NULL,
+                state TEXT NOT NULL DEFAULT 'queued',
+                claimed_by TEXT,
+                last_error TEXT
+            )
+            """
+        )
+    
+    def _execute(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with sqlite3.connect(self.path, timeout=30) as conn:
+            return conn.execute(sql, params).fetchall()
+    
+    def _claim_sync(self, consumer: str, count: int) -> List[tuple]:
+        now = time.time()
+        with sqlite3.connect(self.path, timeout=30, isolation_level=None) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # A job still 'claimed' here was lost by a worker that died,
+                # which counts as a failed attempt
+                rows = conn.execute(
+                    f"""
+                    SELECT id, type, payload, idempotency_key, attempts + (state = 'claimed'), enqueued_at
+                    FROM {self.table}
+                    WHERE state IN ('queued', 'claimed') AND available_at <= ?
+                    ORDER BY available_at, id LIMIT ?
+                    """,
+                    (now, count)
+                ).fetchall()
+                # available_at doubles as the visibility timeout of claimed jobs
+                conn.executemany(
+                    f"""
+                    UPDATE {self.table} SET state = 'claimed', claimed_by = ?, available_at = ?, attempts = ?
+                    WHERE id = ?
+                    """,
+                    [(consumer, now + self.visibility_timeout, row[4], row[0]) for row in rows]
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return rows
+    
+    async def enqueue(
+        self,
+        job_type: str,
+        payload: Dict[str, Any],
+        idempotency_key: Optional[str] = None
+    ) -> bool:
+        now = time.time()
+        
+        def insert() -> bool:
+            with sqlite3.connect(self.path, timeout=30) as conn:
+                cursor = conn.execute(
+                    f"""
+                    INSERT OR IGNORE INTO {self.table} (type, payload, idempotency_key, enqueued_at, available_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    (job_type, json.dumps(payload), idempotency_key, now, now)
+                )
+                return cursor.rowcount == 1
+        
+        return await asyncio.to_thread(insert)
+    
+    async def claim(self, consumer: str, count: int) -> List[Job]:
+        rows = await asyncio.to_thread(self._claim_sync, consumer, count)
+        if not rows:
+            await asyncio.sleep(self.settings.JOB_POLL_INTERVAL)
+        
+        return [
+            Job(
+                type=job_type,
+                payload=json.loads(payload),
+                idempotency_key=idempotency_key,
+                attempts=attempts,
+                enqueued_at=enqueued_at,
+                id=str(job_id)
+            )
+            for job_id, job_type, payload, idempotency_key, attempts, enqueued_at in rows
+        ]
+    
+    async def ack(self, job: Job) -> None:
+        # Done rows are kept so their idempotency keys still apply
+        await asyncio.to_thread(self._execute, f"UPDATE {self.table} SET state = 'done' WHERE id = ?", (int(job.id),))
+    
+    async def retry(self, job: Job, delay: float) -> None:
+        await asyncio.to_thread(
+            self._execute,
+            f"UPDATE {self.table} SET state = 'queued', attempts = attempts + 1, available_at = ? WHERE id = ?",
+            (time.time() + delay, int(job.id))
+        )
+    
+    async def dead_letter(self, job: Job, error: str) -> None:
+        await asyncio.to_thread(
+            self._execute,
+            f"UPDATE {self.table} SET state = 'dead', last_error = ? WHERE id = ?",
+            (error, int(job.id))
+        )
+    
+    async def depth(self) -> Dict[str, int]:
+        rows = await asyncio.to_thread(self._execute, f"SELECT state, COUNT(*) FROM {self.table} GROUP BY state")
+        counts = dict(rows)
+        return {
+            "waiting": counts.get("queued", 0),
+            "in_progress": counts.get("claimed", 0),
+            "dead": counts.get("dead", 0)
+        }
+
+def create_job_queue(
+    settings: Any,
+    stream: Optional[str] = None,
+    visibility_timeout: Optional[float] = None,
+    client: Optional[redis.Redis] = None
+) -> JobQueue:
+    """
+    Create a queue on the backend configured by JOB_QUEUE_URL (the service's Redis by default)
+    
+    Args:
+        settings: The service's settings, with REDIS_URL and the JOB_* queue options
+        stream: The queue's name (JOB_QUEUE_STREAM by default)
+        visibility_timeout: Seconds a claimed job stays invisible (JOB_VISIBILITY_TIMEOUT by default)
+        client: The service's Redis client, used when JOB_QUEUE_URL isn't set
+            (a new client on REDIS_URL by default)
+    """
+    stream = stream or settings.JOB_QUEUE_STREAM
+    url = settings.JOB_QUEUE_URL
+    if url and url.startswith("sqlite:///"):
+        return SQLiteJobQueue(
+            url[len("sqlite:///"):],
+            settings,
+            table=stream.replace(":", "_"),
+            visibility_timeout=visibility_timeout
+        )
+    
+    if url or client is None:
+        client = redis.from_url(url or settings.REDIS_URL, decode_responses=True)
+    return RedisJobQueue(client, stream, settings, visibility_timeout=visibility_timeout)
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Set
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from mindlyf_shared.job_queue import Job, JobQueue
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class LaneLimits:
+    """How long a lane's jobs may run and how often they are retried"""
+    max_attempts: int
+    timeout: float
+    retry_base_delay: float
+    max_retry_delay: float
+
+class JobWorker:
+    """
+    Runs jobs claimed from a JobQueue with the service's handlers
+    
+    A job is acknowledged when its handler returns, retried with jittered
+    exponential backoff when it raises or times out, and dead-lettered once
+    it has failed max_attempts times. Deliveries to workers that died count
+    as failures, so a job that crashes its worker is dead-lettered too
+    instead of being handed out forever.
+    
+    Metrics are registered under the service's prefix, e.g.
+    lyfbot_job_duration_seconds; create one JobWorker per process.
+    """
+    
+    def __init__(self, metrics_prefix: str, handlers: Dict[str, Callable[..., Awaitable[Any]]], settings: Any):
+        """
+        Args:
+            metrics_prefix: Prefix of the worker's metric names, e.g. "journal"
+            handlers: Job type -> coroutine function run with the job's payload
+            settings: The service's settings, with JOB_POLL_INTERVAL
+        """
+        self.handlers = handlers
+        self.settings = settings
+        self.queue_lag = Histogram(
+            f"{metrics_prefix}_job_queue_lag_seconds",
+            "Time from enqueueing a job to a worker starting it",
+            ["job_type"]
+        )
+        self.duration = Histogram(
+            f"{metrics_prefix}_job_duration_seconds",
+            "Time spent running jobs",
+            ["job_type"]
+        )
+        self.results = Counter(
+            f"{metrics_prefix}_job_results_total",
+            "Finished job attempts by outcome",
+            ["job_type", "outcome"]
+        )
+        self.queue_depth = Gauge(
+            f"{metrics_prefix}_job_queue_depth",
+            "Jobs in the queue by state",
+            ["queue", "state"]
+        )
+    
+    async def run_job(self, queue: JobQueue, job: Job, limits: LaneLimits) -> None:
+        """Run one claimed job, then acknowledge, retry or dead-letter it"""
+        self.queue_lag.labels(job_type=job.type).observe(max(time.time() - job.enqueued_at, 0))
+        
+        handler = self.handlers.get(job.type)
+        if handler is None:
+            logger.error(f"No handler for job type {job.type}")
+            await queue.dead_letter(job, "unknown job type")
+            self.results.labels(job_type=job.type, outcome="dead").inc()
+            return
+        
+        if job.attempts >= limits.max_attempts:
+            # Only lost deliveries get a job here: every earlier worker died running it
+            logger.error(f"Job {job.type} {job.id} was lost by {job.attempts} workers, giving up")
+            await queue.dead_letter(job, "worker lost the job on every attempt")
+            self.results.labels(job_type=job.type, outcome="dead").inc()
+            return
+        
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(handler(**job.payload), timeout=limits.timeout)
+        except Exception as e:
+            error = f"{type(e).__name__}: {str(e)}"
+            if job.attempts + 1 >= limits.max_attempts:
+                logger.error(f"Job {job.type} {job.id} failed permanently: {error}")
+                await queue.dead_letter(job, error)
+                self.results.labels(job_type=job.type, outcome="dead").inc()
+            else:
+                # Exponential backoff with jitter
+                delay = min(limits.retry_base_delay * 2 ** job.attempts, limits.max_retry_delay) * random.uniform(0.5, 1.5)
+                logger.warning(f"Job {job.type} {job.id} failed, retrying in {delay:.1f}s: {error}")
+                await queue.retry(job, delay)
+                self.results.labels(job_type=job.type, outcome="retry").inc()
+            return
+        finally:
+            self.duration.labels(job_type=job.type).observe(time.perf_counter() - start)
+        
+        await queue.ack(job)
+        self.results.labels(job_type=job.type, outcome="success").inc()
+    
+    async def run_lane(
+        self,
+        queue: JobQueue,
+        concurrency: int,
+        limits: LaneLimits,
+        consumer: str,
+        stopping: asyncio.Event
+    ) -> None:
+        """Claim and run jobs from one queue until stopping is set, at most concurrency at a time"""
+        running: Set[asyncio.Task] = set()
+        
+        while not stopping.is_set():
+            free = concurrency - len(running)
+            if free <= 0:
+                await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                continue
+            
+            try:
+                jobs = await queue.claim(consumer, free)
+            except Exception as e:
+                logger.error(f"Failed to claim jobs: {str(e)}")
+                await asyncio.sleep(self.settings.JOB_POLL_INTERVAL)
+                continue
+            
+            for job in jobs:
+                task = asyncio.create_task(self.run_job(queue, job, limits))
+                running.add(task)
+                task.add_done_callback(running.discard)
+        
+        # Unfinished jobs are picked up by another worker after the visibility timeout
+        if running:
+            await asyncio.wait(running, timeout=limits.timeout)
+    
+    async def report_depth(self, name: str, queue: JobQueue) -> None:
+        """Publish the queue depth periodically"""
+        while True:
+            try:
+                for state, count in (await queue.depth()).items():
+                    self.queue_depth.labels(queue=name, state=state).set(count)
+            except Exception as e:
+                logger.error(f"Failed to read job queue depth: {str(e)}")
+            await asyncio.sleep(15)
@@ -0,0 +1,303 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import sqlite3
+import time
+from contextlib import closing
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+class NotificationOutbox:
+    """
+    Local outbox for notifications to the Notification Service
+    
+    Notifications are written to a SQLite file, any number of them in one
+    transaction, and a background dispatcher sends them in batches of up
+    to NOTIFICATION_BATCH_SIZE per request:
+    
+    - A notification identical to one still queued, or sent within
+      NOTIFICATION_DEDUPE_WINDOW seconds, is dropped (same type, recipient,
+      schedule and variables).
+    - Failed sends are retried with jittered backoff, up to
+      NOTIFICATION_MAX_ATTEMPTS.
+    - Requests are limited to NOTIFICATION_RATE_LIMIT per second.
+    
+    If the Notification Service has no bulk endpoint at
+    NOTIFICATION_BATCH_PATH, a batch is sent as concurrent single requests
+    under the same rate limit.
+    
+    The dispatcher starts with the first notification written in a process
+    and also sends whatever an earlier process left in the file.
+    """
+    
+    def __init__(self, service_name: str, settings: Any):
+        """
+        Args:
+            service_name: The sending service, e.g. "journal-service"
+            settings: The service's settings, with NOTIFICATION_SERVICE_URL,
+                NOTIFICATION_OUTBOX_PATH and the NOTIFICATION_* outbox options
+        """
+        self.settings = settings
+        self.path = settings.NOTIFICATION_OUTBOX_PATH
+        self.service_name = service_name
+        self._ready = False
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._batch_supported = True
+        self._tokens = self.settings.NOTIFICATION_RATE_LIMIT
+        self._refilled_at = time.monotonic()
+    
+    def _connect(self) -> sqlite3.Connection:
+        if not self._ready:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        if not self._ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS notification_outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    recipient_id TEXT,
+                    dedupe_key TEXT NOT NULL UNIQUE,
+                    payload TEXT NOT NULL,
+                    state TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    available_at REAL NOT NULL,
+                    finished_at REAL,
+                    last_error TEXT
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_notification_outbox_state ON notification_outbox (state, available_at)"
+            )
+            self._ready = True
+        return conn
+    
+    @staticmethod
+    def dedupe_key(payload: Dict[str, Any]) -> str:
+        """Identifies a notification by type, recipient, schedule and variables (minus the timestamp)"""
+        variables = {
+            key: value
+            for key, value in (payload.get("variables") or {}).items()
+            if key != "timestamp"
+        }
+        identity = [payload.get("type"), payload.get("recipientId"), payload.get("scheduledFor"), variables]
+        return hashlib.sha256(json.dumps(identity, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    
+    def _add_sync(self, payloads: List[Dict[str, Any]]) -> int:
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Keys of notifications finished before the dedupe window can be reused
+                conn.execute(
+                    "DELETE FROM notification_outbox WHERE state IN ('sent', 'dead') AND finished_at < ?",
+                    (now - self.settings.NOTIFICATION_DEDUPE_WINDOW,)
+                )
+                before = conn.total_changes
+                conn.executemany(
+                    """
+                    INSERT OR IGNORE INTO notification_outbox (recipient_id, dedupe_key, payload, available_at)
+                    VALUES (?, ?, ?, ?)
+                    """,
+                    [
+                        (payload.get("recipientId"), self.dedupe_key(payload), json.dumps(payload, default=str), now)
+                        for payload in payloads
+                    ]
+                )
+                added = conn.total_changes - before
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return added
+    
+    def _claim_sync(self, limit: int) -> List[Tuple[int, str, int]]:
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # A batch whose sender died becomes available again when its lease runs out
+                rows = conn.execute(
+                    """
+                    SELECT id, payload, attempts FROM notification_outbox
+                    WHERE state IN ('pending', 'sending') AND available_at <= ?
+                    ORDER BY available_at, id LIMIT ?
+                    """,
+                    (now, limit)
+                ).fetchall()
+                conn.executemany(
+                    "UPDATE notification_outbox SET state = 'sending', available_at = ? WHERE id = ?",
+                    [(now + self.settings.NOTIFICATION_LEASE, row[0]) for row in rows]
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return rows
+    
+    def _finish_sync(self, sent: List[int], failed: List[Tuple[int, int, str]]) -> None:
+        now = time.time()
+        updates = []
+        for notification_id, attempts, error in failed:
+            if attempts + 1 >= self.settings.NOTIFICATION_MAX_ATTEMPTS:
+                updates.append(("dead", attempts + 1, now, now, error, notification_id))
+            else:
+                delay = min(2 ** attempts, 300) * random.uniform(0.5, 1.5)
+                updates.append(("pending", attempts + 1, now + delay, None, error, notification_id))
+        
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "UPDATE notification_outbox SET state = 'sent', finished_at = ? WHERE id = ?",
+                    [(now, notification_id) for notification_id in sent]
+                )
+                conn.executemany(
+                    """
+                    UPDATE notification_outbox
+                    SET state = ?, attempts = ?, available_at = ?, finished_at = ?, last_error = ?
+                    WHERE id = ?
+                    """,
+                    updates
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+    
+    async def add(self, payloads: List[Dict[str, Any]]) -> int:
+        """
+        Write notifications to the outbox
+        
+        Args:
+            payloads: Notification Service request bodies
+        
+        Returns:
+            How many were new (duplicates are dropped)
+        """
+        if not payloads:
+            return 0
+        
+        added = await asyncio.to_thread(self._add_sync, payloads)
+        self.start()
+        if added and self._wakeup:
+            self._wakeup.set()
+        return added
+    
+    def start(self) -> None:
+        """Start the dispatcher in this process"""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        """Stop the dispatcher; unsent notifications stay in the outbox"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+    
+    async def _run(self) -> None:
+        while True:
+            try:
+                dispatched = await self.dispatch()
+            except Exception as e:
+                logger.error(f"Notification dispatch failed: {str(e)}")
+                dispatched = 0
+            
+            # Keep going while there is a backlog
+            if dispatched < self.settings.NOTIFICATION_BATCH_SIZE:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.settings.NOTIFICATION_FLUSH_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+    
+    async def dispatch(self) -> int:
+        """
+        Send one batch of due notifications
+        
+        Returns:
+            The number of notifications in the batch
+        """
+        rows = await asyncio.to_thread(self._claim_sync, self.settings.NOTIFICATION_BATCH_SIZE)
+        if not rows:
+            return 0
+        
+        payloads = [json.loads(payload) for _, payload, _ in rows]
+        sent: List[int] = []
+        failed: List[Tuple[int, int, str]] = []
+        
+        if self._batch_supported:
+            try:
+                await self._acquire()
+                response = await self._get_client().post(
+                    self.settings.NOTIFICATION_BATCH_PATH,
+                    json={"notifications": payloads}
+                )
+                if response.status_code in (404, 405):
+                    logger.warning("Notification Service has no bulk endpoint, sending notifications one by one")
+                    self._batch_supported = False
+                else:
+                    response.raise_for_status()
+                    sent = [notification_id for notification_id, _, _ in rows]
+            except Exception as e:
+                error = f"{type(e).__name__}: {str(e)}"
+                failed = [(notification_id, attempts, error) for notification_id, _, attempts in rows]
+        
+        if not self._batch_supported and not sent and not failed:
+            slots = asyncio.Semaphore(self.settings.NOTIFICATION_CONCURRENCY)
+            
+            async def send_one(row: Tuple[int, str, int], payload: Dict[str, Any]) -> None:
+                notification_id, _, attempts = row
+                async with slots:
+                    try:
+                        await self._acquire()
+                        response = await self._get_client().post("/api/notification", json=payload)
+                        response.raise_for_status()
+                        sent.append(notification_id)
+                    except Exception as e:
+                        failed.append((notification_id, attempts, f"{type(e).__name__}: {str(e)}"))
+            
+            await asyncio.gather(*(send_one(row, payload) for row, payload in zip(rows, payloads)))
+        
+        await asyncio.to_thread(self._finish_sync, sent, failed)
+        if failed:
+            logger.warning(f"Failed to send {len(failed)} of {len(rows)} notifications: {failed[0][2]}")
+        return len(rows)
+    
+    async def _acquire(self) -> None:
+        """Wait for the request rate limit (token bucket)"""
+        rate = self.settings.NOTIFICATION_RATE_LIMIT
+        while True:
+            now = time.monotonic()
+            self._tokens = min(rate, self._tokens + (now - self._refilled_at) * rate)
+            self._refilled_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / rate)
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.settings.NOTIFICATION_SERVICE_URL,
+                headers={"X-Service-Name": self.service_name},
+                timeout=10.0
+            )
+        return self._client